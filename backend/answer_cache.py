@@ -0,0 +1,188 @@
+"""Two-level cache of question results, shared by every session of the same documents.
+
+Level one maps (documents searched, normalized question, top_k) to the
+retrieved chunks and the question language, so a repeated question skips
+detection, translation, embedding and search. Chunks are stored as
+(document content hash, chunk number) pairs rather than session chunk ids,
+so any session holding the same documents can reuse them. Level two maps
+(retrieved chunks, normalized question, answer language) to the generated
+answer, so the LLM is not called again either. Both levels are LRUs whose
+entries also expire after a TTL.
+
+Optionally, a question missing from level one matches a cached question on
+the same documents and in the same language whose query embedding has a
+cosine similarity of at least `similarity`; it then shares that question's
+chunks and answer.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Hashable, Optional
+
+import numpy as np
+
+from translation import normalize_text
+
+ChunkRef = tuple[str, int]  # (document content hash, chunk number)
+
+
+def retrieval_scope(documents: list[tuple[str, str]], config: tuple) -> str:
+    """Cache scope of a search: the (content hash, embedding model) of the documents and the retrieval settings"""
+    return hashlib.sha256(json.dumps([sorted(documents), list(config)]).encode()).hexdigest()
+
+
+@dataclass
+class CachedRetrieval:
+    """Level one entry: what a question retrieved"""
+    question: str  # normalized
+    user_language: str
+    chunks: list[ChunkRef]
+    embedding: Optional[np.ndarray] = None  # normalized query embedding, for near-duplicate matching
+
+
+class TTLCache:
+    """Thread-safe LRU whose entries also expire `ttl` seconds after they were stored (0 = never)"""
+
+    def __init__(self, max_entries: int, ttl: float = 0.0, on_evict: Optional[Callable[[Hashable, object], None]] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, tuple[float, object]]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, key: Hashable):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl > 0 and time.time() - entry[0] > self.ttl:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def peek(self, key: Hashable):
+        """Value of a live entry without counting a lookup or refreshing its recency"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (self.ttl > 0 and time.time() - entry[0] > self.ttl):
+                return None
+            return entry[1]
+
+    def put(self, key: Hashable, value):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.time(), value)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: Hashable):
+        _, value = self._entries.pop(key)
+        if self.on_evict:
+            self.on_evict(key, value)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self),
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class AnswerCache:
+    """Retrieved chunks by question, and answers by retrieved chunks and question"""
+
+    def __init__(self, max_entries: int, ttl: float = 0.0, similarity: float = 0.0, generator: str = ""):
+        self.similarity = similarity
+        self.generator = generator  # LLM the answers come from; part of every answer key
+        self.similar_hits = 0
+        self._lock = threading.Lock()
+        # Level one keys with an embedding, by (scope, top_k, user language), for near-duplicate lookups
+        self._embedded: dict[tuple[str, int, str], set[tuple[str, str, int]]] = {}
+        self.retrievals = TTLCache(max_entries, ttl, on_evict=self._forget_embedding)
+        self.answers = TTLCache(max_entries, ttl)
+
+    def get_retrieval(self, scope: str, question: str, top_k: int) -> Optional[CachedRetrieval]:
+        return self.retrievals.get((scope, normalize_text(question), top_k))
+
+    def find_similar(self, scope: str, top_k: int, user_language: str,
+                     embedding: np.ndarray) -> Optional[CachedRetrieval]:
+        """Best cached question on the same documents in the same language, if similar enough"""
+        if self.similarity <= 0:
+            return None
+        query = _unit(embedding)
+        with self._lock:
+            keys = list(self._embedded.get((scope, top_k, user_language), ()))
+        best, best_score = None, self.similarity
+        for key in keys:
+            retrieval = self.retrievals.peek(key)
+            if retrieval is None or retrieval.embedding is None:
+                continue
+            score = float(np.dot(retrieval.embedding, query))
+            if score >= best_score:
+                best, best_score = key, score
+        if best is None:
+            return None
+        self.similar_hits += 1
+        return self.retrievals.get(best)
+
+    def put_retrieval(self, scope: str, question: str, top_k: int, user_language: str, chunks: list[ChunkRef],
+                      embedding: Optional[np.ndarray] = None) -> CachedRetrieval:
+        retrieval = CachedRetrieval(
+            question=normalize_text(question),
+            user_language=user_language,
+            chunks=chunks,
+            embedding=_unit(embedding) if embedding is not None and self.similarity > 0 else None
+        )
+        key = (scope, retrieval.question, top_k)
+        self.retrievals.put(key, retrieval)
+        if retrieval.embedding is not None:
+            with self._lock:
+                self._embedded.setdefault((scope, top_k, user_language), set()).add(key)
+        return retrieval
+
+    def _answer_key(self, retrieval: CachedRetrieval) -> tuple:
+        return self.generator, tuple(retrieval.chunks), retrieval.question, retrieval.user_language
+
+    def get_answer(self, retrieval: CachedRetrieval) -> Optional[str]:
+        return self.answers.get(self._answer_key(retrieval))
+
+    def put_answer(self, retrieval: CachedRetrieval, answer: str):
+        self.answers.put(self._answer_key(retrieval), answer)
+
+    def _forget_embedding(self, key: tuple[str, str, int], retrieval: CachedRetrieval):
+        if retrieval.embedding is None:
+            return
+        with self._lock:
+            group = (key[0], key[2], retrieval.user_language)
+            keys = self._embedded.get(group)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._embedded[group]
+
+    def stats(self) -> dict:
+        return {
+            "retrievals": self.retrievals.stats(),
+            "answers": self.answers.stats(),
+            "similar_hits": self.similar_hits,
+        }
+
+
+def _unit(vector: np.ndarray) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm > 0 else vector
@@ -0,0 +1,121 @@
+"""Assembly of retrieved chunks into the context block of the LLM prompt.
+
+HybridChunker serializes every chunk with the headings of its section, so
+neighbouring chunks of one document repeat the same heading lines, and the
+merged peers of adjacent chunks can overlap. `pack_context`:
+
+- orders the chunks by position in their document (documents in order of
+  their best ranked chunk), so text that belongs together stays together;
+- drops heading lines a chunk shares with the previous chunk of its document,
+  text a chunk repeats from the end of the chunk just before it, and chunks
+  whose remaining text already appears in the context;
+- keeps the chunks in relevance order until the context reaches a token
+  budget; the most relevant chunk is always kept.
+
+Token counts come from a tokenizer callable, normally the embedding model's.
+"""
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+# Shortest repeated span treated as an overlap between adjacent chunks, in characters
+MIN_OVERLAP_CHARS = 20
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count when no tokenizer is loaded (about 4 characters per token)"""
+    return max(1, len(text) // 4) if text else 0
+
+
+def split_chunk_id(chunk_id: str) -> tuple[str, int]:
+    """Chunk ids are "<document id>:<chunk number>" """
+    document_id, _, number = chunk_id.rpartition(":")
+    return document_id, int(number) if number.isdigit() else 0
+
+
+@dataclass
+class PackedContext:
+    """Context blocks for the prompt, and what packing saved"""
+    chunk_ids: list[str]  # chunks kept, in prompt order
+    chunks: list[str]  # their texts with repeated headings and overlaps removed
+    tokens: int
+    original_tokens: int  # tokens of the retrieved chunks as they were
+
+    @property
+    def saved_tokens(self) -> int:
+        return max(0, self.original_tokens - self.tokens)
+
+
+def _common_lines(previous: list[str], lines: list[str]) -> int:
+    """Number of leading lines two chunks share, leaving at least one line of the second"""
+    shared = 0
+    while shared < min(len(previous), len(lines) - 1) and previous[shared] == lines[shared]:
+        shared += 1
+    return shared
+
+
+def _overlap(previous: str, text: str, min_chars: int) -> int:
+    """Length of the longest end of `previous` that `text` starts with (at least `min_chars`)"""
+    if len(text) < min_chars:
+        return 0
+    probe = text[:min_chars]
+    start = previous.find(probe, max(0, len(previous) - len(text)))
+    while start != -1:
+        if text.startswith(previous[start:]):
+            return len(previous) - start
+        start = previous.find(probe, start + 1)
+    return 0
+
+
+def _assemble(hits: list[tuple[str, str]], document_rank: dict[str, int],
+              min_overlap: int) -> list[tuple[str, str]]:
+    """Deduplicated (chunk id, text) of the given hits, in document order"""
+    ordered = sorted(hits, key=lambda hit: (document_rank[split_chunk_id(hit[0])[0]], split_chunk_id(hit[0])[1]))
+    assembled = []
+    previous: Optional[tuple[str, int, str]] = None  # document, chunk number and original text of the last chunk
+    for chunk_id, text in ordered:
+        document_id, number = split_chunk_id(chunk_id)
+        body = text
+        if previous is not None and previous[0] == document_id:
+            lines = text.split("\n")
+            shared = _common_lines(previous[2].split("\n"), lines)
+            body = "\n".join(lines[shared:]).strip()
+            if previous[1] + 1 == number:
+                body = body[_overlap(previous[2], body, min_overlap):].strip()
+        previous = (document_id, number, text)
+        if not body or any(body in kept for _, kept in assembled):
+            continue
+        assembled.append((chunk_id, body))
+    return assembled
+
+
+def pack_context(hits: list[tuple[str, str]], count_tokens: Callable[[str], int], budget: int,
+                 min_overlap: int = MIN_OVERLAP_CHARS) -> PackedContext:
+    """Pack retrieved (chunk id, text) hits, best first, into at most `budget` tokens (0 = no limit)"""
+    counts: dict[str, int] = {}
+
+    def tokens(text: str) -> int:
+        if text not in counts:
+            counts[text] = count_tokens(text)
+        return counts[text]
+
+    document_rank: dict[str, int] = {}
+    for chunk_id, _ in hits:
+        document_rank.setdefault(split_chunk_id(chunk_id)[0], len(document_rank))
+
+    selected: list[tuple[str, str]] = []
+    assembled: list[tuple[str, str]] = []
+    total = 0
+    for hit in hits:
+        candidate = _assemble(selected + [hit], document_rank, min_overlap)
+        candidate_total = sum(tokens(text) for _, text in candidate)
+        if selected and budget > 0 and candidate_total > budget:
+            continue  # A less relevant, shorter chunk may still fit
+        selected.append(hit)
+        assembled, total = candidate, candidate_total
+
+    return PackedContext(
+        chunk_ids=[chunk_id for chunk_id, _ in assembled],
+        chunks=[text for _, text in assembled],
+        tokens=total,
+        original_tokens=sum(tokens(text) for _, text in hits)
+    )
@@ -0,0 +1,150 @@
+"""Document conversion engine backed by a pool of worker processes.
+
+Every worker process builds a single DocumentConverter when it starts and
+reuses it for all the documents it converts, so Docling's layout and OCR
+pipelines are initialized once per process rather than once per upload.
+Conversions run outside the API process, so they neither hold the GIL
+against the event loop nor serialize behind each other.
+
+Long PDFs can be converted as page-range shards spread over the workers and
+merged back into one DoclingDocument in page order.
+"""
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import TYPE_CHECKING, Callable, Optional
+
+if TYPE_CHECKING:
+    from docling_core.types.doc import DoclingDocument
+
+# Long-lived converter of the current worker process
+_converter = None
+
+
+def _init_worker():
+    """Create and warm the worker's DocumentConverter"""
+    global _converter
+    from docling.datamodel.base_models import InputFormat
+    from docling.document_converter import DocumentConverter
+
+    _converter = DocumentConverter()
+    if hasattr(_converter, "initialize_pipeline"):
+        # Load the PDF layout/OCR models now instead of on the first upload
+        _converter.initialize_pipeline(InputFormat.PDF)
+
+
+def _ping() -> bool:
+    return _converter is not None
+
+
+def _convert(file_path: str) -> str:
+    """Convert a file and return the DoclingDocument serialized as JSON"""
+    result = _converter.convert(file_path)
+    return result.document.model_dump_json()
+
+
+def _convert_pages(file_path: str, first: int, last: int) -> str:
+    """Convert pages first..last (1-based, inclusive) of a PDF, split out with pypdf"""
+    from pypdf import PdfReader, PdfWriter
+
+    reader = PdfReader(file_path)
+    writer = PdfWriter()
+    for index in range(first - 1, last):
+        writer.add_page(reader.pages[index])
+    fd, shard_path = tempfile.mkstemp(prefix="docling-rag-shard-", suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            writer.write(f)
+        return _convert(shard_path)
+    finally:
+        os.unlink(shard_path)
+
+
+def page_ranges(num_pages: int, shard_pages: int) -> list[tuple[int, int]]:
+    """Split pages 1..num_pages into consecutive (first, last) ranges of at most shard_pages"""
+    return [(first, min(first + shard_pages - 1, num_pages)) for first in range(1, num_pages + 1, shard_pages)]
+
+
+def can_merge_documents() -> bool:
+    """Whether the installed docling-core can concatenate documents (needed for sharded conversion)"""
+    from docling_core.types.doc import DoclingDocument
+
+    return hasattr(DoclingDocument, "concatenate")
+
+
+class ConversionEngine:
+    """Pool of warmed Docling converters running in separate processes"""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._pool = self._new_pool()
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        # spawn rather than fork: forking a process that already runs torch threads can deadlock
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+
+    def warm_up(self):
+        """Start every worker process and wait until its converter is ready"""
+        futures = [self._pool.submit(_ping) for _ in range(self.workers)]
+        for future in futures:
+            future.result()
+
+    def submit(self, file_path: str) -> Future:
+        """Schedule a conversion; the future resolves to the serialized document"""
+        with self._lock:
+            return self._pool.submit(_convert, file_path)
+
+    def convert(self, file_path: str) -> "DoclingDocument":
+        """Convert a file in a worker process and return the DoclingDocument"""
+        from docling_core.types.doc import DoclingDocument
+
+        return DoclingDocument.model_validate_json(self._result(self.submit(file_path)))
+
+    def convert_sharded(self, file_path: str, ranges: list[tuple[int, int]],
+                        on_shard: Optional[Callable[[int, int], None]] = None) -> "DoclingDocument":
+        """Convert page ranges of a PDF in parallel workers and merge them in page order
+
+        `on_shard(done, total)` is called from this thread after each shard, in order.
+        """
+        from docling_core.types.doc import DoclingDocument
+
+        with self._lock:
+            futures = [self._pool.submit(_convert_pages, file_path, first, last) for first, last in ranges]
+        try:
+            shards = []
+            for future in futures:
+                shards.append(DoclingDocument.model_validate_json(self._result(future)))
+                if on_shard:
+                    on_shard(len(shards), len(futures))
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+        return shards[0] if len(shards) == 1 else DoclingDocument.concatenate(shards)
+
+    def _result(self, future: Future) -> str:
+        try:
+            return future.result()
+        except BrokenProcessPool:
+            # A worker died (usually out of memory): replace the pool so later uploads still work
+            with self._lock:
+                if not getattr(self._pool, "_broken", False):
+                    return self._raise_crashed()
+                print("Conversion worker crashed, restarting conversion pool")
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = self._new_pool()
+            self._raise_crashed()
+
+    def _raise_crashed(self):
+        raise RuntimeError("Document conversion worker crashed")
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
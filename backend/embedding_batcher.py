@@ -0,0 +1,133 @@
+"""Micro-batching of embedding requests across sessions.
+
+Sessions submit texts from many threads (query embedding, chunk embedding).
+Instead of each caller running its own tiny `model.encode` call, requests
+for the same model are queued and a single worker thread merges everything
+that arrives within a short window into one padded batch. Callers get a
+future that resolves to their slice of the result.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable
+
+import numpy as np
+
+
+class _Request:
+    __slots__ = ("texts", "future")
+
+    def __init__(self, texts: list[str]):
+        self.texts = texts
+        self.future: Future = Future()
+
+
+class EmbeddingBatcher:
+    """Merges concurrent encode requests for one embedding model into batches"""
+
+    def __init__(self, name: str, get_model: Callable[[], object],
+                 max_batch_size: int = 64, max_wait_ms: float = 5.0):
+        self.name = name
+        self.get_model = get_model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: "queue.Queue[_Request]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=f"embed-{name}", daemon=True)
+        self._thread.start()
+
+        self.batches = 0
+        self.texts = 0
+        self.requests = 0
+
+    def submit(self, texts: list[str]) -> Future:
+        """Queue texts for encoding; the future resolves to a (len(texts), dim) float32 array"""
+        if not texts:
+            result: Future = Future()
+            result.set_result(np.zeros((0, 0), dtype=np.float32))
+            return result
+
+        self.requests += 1
+        # Large requests (a whole document) are split so short queries can join
+        # the batches in between instead of waiting behind the entire document
+        parts = []
+        for start in range(0, len(texts), self.max_batch_size):
+            request = _Request(texts[start:start + self.max_batch_size])
+            self._queue.put(request)
+            parts.append(request.future)
+        return parts[0] if len(parts) == 1 else _gather(parts)
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        """Encode texts, blocking until their batch has been processed"""
+        return self.submit(texts).result()
+
+    def _collect(self) -> list[_Request]:
+        """Wait for one request, then take whatever else arrives before the batch is full or the window closes"""
+        batch = [self._queue.get()]
+        size = len(batch[0].texts)
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(request)
+            size += len(request.texts)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            texts = [text for request in batch for text in request.texts]
+            try:
+                model = self.get_model()
+                # encode() sorts by length internally, so each padded sub-batch stays tight
+                vectors = np.asarray(
+                    model.encode(texts, batch_size=self.max_batch_size, convert_to_numpy=True),
+                    dtype=np.float32
+                )
+            except Exception as e:
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.texts += len(texts)
+            offset = 0
+            for request in batch:
+                request.future.set_result(vectors[offset:offset + len(request.texts)])
+                offset += len(request.texts)
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "texts": self.texts,
+            "avg_batch_size": self.texts / self.batches if self.batches else 0.0,
+            "queued": self._queue.qsize(),
+        }
+
+
+def _gather(parts: list[Future]) -> Future:
+    """Combine the futures of a split request into one future of the stacked result"""
+    combined: Future = Future()
+    remaining = [len(parts)]
+    lock = threading.Lock()
+
+    def done(_):
+        with lock:
+            remaining[0] -= 1
+            if remaining[0] or combined.done():
+                return
+        errors = [part.exception() for part in parts if part.exception()]
+        if errors:
+            combined.set_exception(errors[0])
+        else:
+            combined.set_result(np.vstack([part.result() for part in parts]))
+
+    for part in parts:
+        part.add_done_callback(done)
+    return combined
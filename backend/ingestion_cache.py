@@ -0,0 +1,187 @@
+"""Content-addressed cache for processed documents.
+
+Entries are keyed by the SHA-256 of the uploaded file together with the
+embedding model id and the chunker token limit, so changing either one
+simply stops old entries from matching. Each entry is a directory holding
+the converted markdown, the serialized chunks and their embedding matrix.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+import numpy as np
+
+
+def hash_file(path: str, block_size: int = 1 << 20) -> str:
+    """Return the hex SHA-256 digest of a file, read in fixed-size blocks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_key(content_hash: str, model_id: str, max_tokens: int) -> str:
+    """Build the cache key for a document processed with a given model and chunk size"""
+    return hashlib.sha256(f"{content_hash}|{model_id}|{max_tokens}".encode()).hexdigest()
+
+
+@dataclass
+class CachedDocument:
+    """A fully processed document as stored in the cache"""
+    content_hash: str
+    language: str
+    model_id: str
+    markdown: str
+    chunks: list[str]
+    embeddings: np.ndarray
+
+
+class IngestionCache:
+    """Size-bounded, on-disk LRU cache of processed documents"""
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # key -> entry size in bytes, least recently used first
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        os.makedirs(directory, exist_ok=True)
+        self._scan()
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def _scan(self):
+        """Rebuild the LRU order from entry directory modification times"""
+        found = []
+        for name in os.listdir(self.directory):
+            path = self._entry_dir(name)
+            if name.startswith(".") or not os.path.isdir(path):
+                continue
+            if not os.path.exists(os.path.join(path, "meta.json")):
+                # Leftover from an interrupted write
+                shutil.rmtree(path, ignore_errors=True)
+                continue
+            found.append((os.path.getmtime(path), name, _dir_size(path)))
+        for _, name, size in sorted(found):
+            self._entries[name] = size
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(self._entries.values())
+
+    def lookup(self, content_hash: str, model_ids: Iterable[str], max_tokens: int) -> Optional[CachedDocument]:
+        """Return the cached document for any of the given models, or None"""
+        with self._lock:
+            for model_id in model_ids:
+                key = cache_key(content_hash, model_id, max_tokens)
+                if key not in self._entries:
+                    continue
+                try:
+                    entry = self._read(key)
+                except Exception as e:
+                    print(f"Ingestion cache: dropping unreadable entry {key[:12]}: {e}")
+                    self._remove(key)
+                    continue
+                self._entries.move_to_end(key)
+                os.utime(self._entry_dir(key))
+                self.hits += 1
+                return entry
+            self.misses += 1
+            return None
+
+    def put(self, content_hash: str, language: str, model_id: str, max_tokens: int,
+            markdown: str, chunks: list[str], embeddings: np.ndarray):
+        """Store a processed document, evicting least recently used entries if needed"""
+        key = cache_key(content_hash, model_id, max_tokens)
+        tmp_dir = os.path.join(self.directory, f".tmp-{uuid.uuid4().hex}")
+        os.makedirs(tmp_dir)
+        try:
+            meta = {
+                "content_hash": content_hash,
+                "language": language,
+                "model_id": model_id,
+                "max_tokens": max_tokens,
+                "num_chunks": len(chunks),
+                "created": time.time(),
+            }
+            with open(os.path.join(tmp_dir, "document.md"), "w", encoding="utf-8") as f:
+                f.write(markdown)
+            with open(os.path.join(tmp_dir, "chunks.json"), "w", encoding="utf-8") as f:
+                json.dump(chunks, f, ensure_ascii=False)
+            np.save(os.path.join(tmp_dir, "embeddings.npy"), np.asarray(embeddings, dtype=np.float32))
+            # meta.json is written last: its presence marks a complete entry
+            with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            size = _dir_size(tmp_dir)
+
+            with self._lock:
+                if key in self._entries:
+                    self._remove(key)
+                os.replace(tmp_dir, self._entry_dir(key))
+                self._entries[key] = size
+                self._evict()
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def _read(self, key: str) -> CachedDocument:
+        path = self._entry_dir(key)
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(os.path.join(path, "document.md"), encoding="utf-8") as f:
+            markdown = f.read()
+        with open(os.path.join(path, "chunks.json"), encoding="utf-8") as f:
+            chunks = json.load(f)
+        embeddings = np.load(os.path.join(path, "embeddings.npy"))
+        return CachedDocument(
+            content_hash=meta["content_hash"],
+            language=meta["language"],
+            model_id=meta["model_id"],
+            markdown=markdown,
+            chunks=chunks,
+            embeddings=embeddings,
+        )
+
+    def _remove(self, key: str):
+        self._entries.pop(key, None)
+        shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits its budget"""
+        while self._entries and self.total_bytes > self.max_bytes:
+            key = next(iter(self._entries))
+            self._remove(key)
+            self.evictions += 1
+            print(f"Ingestion cache: evicted {key[:12]}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+def _dir_size(path: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(path, name))
+        for name in os.listdir(path)
+        if os.path.isfile(os.path.join(path, name))
+    )
@@ -0,0 +1,223 @@
+"""BM25 keyword index of a session's chunks, and fusion with dense search results.
+
+Embeddings are good at paraphrases but weak on exact identifiers, numbers
+and table terms ("INV-0042", "2023", "EBITDA"). A small inverted index over
+the same chunks catches those. Postings are kept in flat numpy arrays (CSR
+layout: one offsets array indexing into chunk ids and term frequencies), so
+a query touches only the postings of its own terms.
+"""
+import re
+import threading
+import unicodedata
+from typing import Collection, Iterable, Optional
+
+import numpy as np
+
+# Words, plus compound tokens such as "inv-0042", "3.5" or "a/b" kept whole next to their parts
+_TOKEN = re.compile(r"\w+(?:[-./]\w+)*")
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercased, accent-folded tokens; compound identifiers also yield their parts"""
+    folded = unicodedata.normalize("NFKD", text.lower())
+    folded = "".join(ch for ch in folded if not unicodedata.combining(ch))
+    tokens = []
+    for token in _TOKEN.findall(folded):
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(re.findall(r"\w+", token))
+    return tokens
+
+
+class BM25Index:
+    """Okapi BM25 over chunks added in batches, searched by chunk id"""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self.ids: list[str] = []
+        self._vocabulary: dict[str, int] = {}
+        self._doc_lengths: list[int] = []
+        # Source document of every chunk, as an index into _document_ids
+        self._document_ids: list[Optional[str]] = []
+        self._group_list: list[int] = []
+        self._groups = np.zeros(0, dtype=np.int32)
+        self._pending: list[tuple[int, dict[int, int]]] = []  # (position, {term id: frequency}) not yet in the arrays
+        # CSR postings: entries offsets[t]:offsets[t + 1] of `postings` and `frequencies` belong to term t
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._postings = np.zeros(0, dtype=np.int32)
+        self._frequencies = np.zeros(0, dtype=np.float32)
+        self._idf = np.zeros(0, dtype=np.float32)
+        self._length_norm = np.zeros(0, dtype=np.float32)
+
+    def add(self, ids: list[str], texts: Iterable[str], document_id: Optional[str] = None):
+        """Index chunk texts under their ids, tagged with the document they come from"""
+        with self._lock:
+            self.ids.extend(ids)
+            self._document_ids.append(document_id)
+            self._group_list.extend([len(self._document_ids) - 1] * len(ids))
+            for text in texts:
+                counts: dict[int, int] = {}
+                tokens = tokenize(text)
+                for token in tokens:
+                    term = self._vocabulary.setdefault(token, len(self._vocabulary))
+                    counts[term] = counts.get(term, 0) + 1
+                self._pending.append((len(self._doc_lengths), counts))
+                self._doc_lengths.append(len(tokens))
+
+    def _flush(self):
+        """Merge pending chunks into the posting arrays and refresh the statistics"""
+        if not self._pending:
+            return
+        n_terms = len(self._vocabulary)
+        old_counts = np.diff(self._offsets)
+        new_counts = np.zeros(n_terms, dtype=np.int64)
+        for _, counts in self._pending:
+            for term in counts:
+                new_counts[term] += 1
+        totals = new_counts.copy()
+        totals[:len(old_counts)] += old_counts
+
+        offsets = np.zeros(n_terms + 1, dtype=np.int64)
+        np.cumsum(totals, out=offsets[1:])
+        postings = np.empty(offsets[-1], dtype=np.int32)
+        frequencies = np.empty(offsets[-1], dtype=np.float32)
+        # Existing postings first, so every list stays sorted by position
+        for term in np.flatnonzero(old_counts):
+            start, end = self._offsets[term], self._offsets[term + 1]
+            postings[offsets[term]:offsets[term] + end - start] = self._postings[start:end]
+            frequencies[offsets[term]:offsets[term] + end - start] = self._frequencies[start:end]
+        cursor = offsets[:-1].copy()
+        cursor[:len(old_counts)] += old_counts
+        for position, counts in self._pending:
+            for term, frequency in counts.items():
+                postings[cursor[term]] = position
+                frequencies[cursor[term]] = frequency
+                cursor[term] += 1
+
+        n_docs = len(self._doc_lengths)
+        lengths = np.asarray(self._doc_lengths, dtype=np.float32)
+        average = float(lengths.mean()) if n_docs else 0.0
+        self._offsets, self._postings, self._frequencies = offsets, postings, frequencies
+        self._idf = np.log1p((n_docs - totals + 0.5) / (totals + 0.5)).astype(np.float32)
+        self._length_norm = (self.k1 * (1 - self.b + self.b * lengths / (average or 1.0))).astype(np.float32)
+        self._groups = np.asarray(self._group_list, dtype=np.int32)
+        self._pending = []
+
+    def search(self, query: str, top_k: int, document_ids: Optional[Collection[str]] = None) -> list[tuple[str, float]]:
+        """Return (id, BM25 score) of the best matching chunks, best first, only from `document_ids` if given"""
+        with self._lock:
+            self._flush()
+            terms = {self._vocabulary[token] for token in tokenize(query) if token in self._vocabulary}
+            if not terms or top_k <= 0:
+                return []
+            scores = np.zeros(len(self._doc_lengths), dtype=np.float32)
+            for term in terms:
+                start, end = self._offsets[term], self._offsets[term + 1]
+                docs = self._postings[start:end]
+                tf = self._frequencies[start:end]
+                # Positions are unique within one posting list, so fancy-indexed += is safe
+                scores[docs] += self._idf[term] * tf * (self.k1 + 1) / (tf + self._length_norm[docs])
+            if document_ids is not None:
+                allowed = [group for group, document_id in enumerate(self._document_ids) if document_id in document_ids]
+                scores[~np.isin(self._groups, allowed)] = 0.0
+
+        matched = np.flatnonzero(scores)
+        if len(matched) > top_k:
+            matched = matched[np.argpartition(-scores[matched], top_k)[:top_k]]
+        matched = matched[np.argsort(-scores[matched], kind="stable")]
+        return [(self.ids[i], float(scores[i])) for i in matched]
+
+    def state(self) -> dict:
+        """Everything needed to rebuild the index without re-tokenizing: flat arrays, plus JSON-able lists"""
+        with self._lock:
+            self._flush()
+            vocabulary = [""] * len(self._vocabulary)
+            for token, term in self._vocabulary.items():
+                vocabulary[term] = token
+            return {
+                "k1": self.k1,
+                "b": self.b,
+                "ids": list(self.ids),
+                "vocabulary": vocabulary,
+                "document_ids": list(self._document_ids),
+                "arrays": {
+                    "doc_lengths": np.asarray(self._doc_lengths, dtype=np.int32),
+                    "groups": self._groups,
+                    "offsets": self._offsets,
+                    "postings": self._postings,
+                    "frequencies": self._frequencies,
+                    "idf": self._idf,
+                    "length_norm": self._length_norm,
+                },
+            }
+
+    @classmethod
+    def from_state(cls, state: dict) -> "BM25Index":
+        """Rebuild an index from state(); the arrays may be read-only memory maps, they are never written"""
+        index = cls(state["k1"], state["b"])
+        arrays = state["arrays"]
+        index.ids = list(state["ids"])
+        index._vocabulary = {token: term for term, token in enumerate(state["vocabulary"])}
+        index._document_ids = list(state["document_ids"])
+        index._doc_lengths = arrays["doc_lengths"].tolist()
+        index._group_list = arrays["groups"].tolist()
+        index._groups = arrays["groups"]
+        index._offsets = arrays["offsets"]
+        index._postings = arrays["postings"]
+        index._frequencies = arrays["frequencies"]
+        index._idf = arrays["idf"]
+        index._length_norm = arrays["length_norm"]
+        return index
+
+    def __len__(self) -> int:
+        return len(self._doc_lengths)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory of the posting arrays"""
+        return sum(array.nbytes for array in (
+            self._offsets, self._postings, self._frequencies, self._idf, self._length_norm, self._groups
+        ))
+
+
+def reciprocal_rank_fusion(rankings: list[list[str]], weights: Optional[list[float]] = None,
+                           k: float = 60.0) -> list[tuple[str, float]]:
+    """Fuse ranked id lists: each id scores sum(weight / (k + rank)); returns (id, score), best first"""
+    weights = weights or [1.0] * len(rankings)
+    scores: dict[str, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        if weight <= 0:
+            continue
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + weight / (k + rank)
+    return sorted(scores.items(), key=lambda entry: -entry[1])
+
+
+def score_fusion(results: list[list[tuple[str, float]]], weights: Optional[list[float]] = None) -> list[tuple[str, float]]:
+    """Fuse (id, score) lists by a weighted sum of min-max normalized scores; returns (id, score), best first
+
+    Unlike rank fusion this keeps how far ahead a result is, e.g. a BM25 hit on a rare identifier.
+    """
+    weights = weights or [1.0] * len(results)
+    scores: dict[str, float] = {}
+    for result, weight in zip(results, weights):
+        if weight <= 0 or not result:
+            continue
+        values = [score for _, score in result]
+        low, spread = min(values), max(values) - min(values)
+        for item, score in result:
+            normalized = (score - low) / spread if spread > 0 else 1.0
+            scores[item] = scores.get(item, 0.0) + weight * normalized
+    return sorted(scores.items(), key=lambda entry: -entry[1])
+
+
+def fuse(results: list[list[tuple[str, float]]], method: str = "rrf", weights: Optional[list[float]] = None,
+         rrf_k: float = 60.0) -> list[tuple[str, float]]:
+    """Fuse ranked (id, score) lists with "rrf" (reciprocal rank fusion) or "score" (normalized scores)"""
+    if method == "rrf":
+        return reciprocal_rank_fusion([[item for item, _ in result] for result in results], weights, rrf_k)
+    if method == "score":
+        return score_fusion(results, weights)
+    raise ValueError(f"Unknown fusion method: {method}")
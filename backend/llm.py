@@ -0,0 +1,72 @@
+"""LLM backends used to answer questions.
+
+`GeminiLLM` calls Google Gemini with the user's API key. `FakeLLM` is a
+local stand-in that streams a deterministic answer built from the prompt,
+so the question pipeline can be exercised and benchmarked without network
+access or an API key.
+"""
+import asyncio
+import re
+from typing import AsyncIterator
+
+
+class GeminiLLM:
+    """Google Gemini through the async client of google-generativeai"""
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+
+    def _model(self, api_key: str):
+        import google.generativeai as genai
+
+        genai.configure(api_key=api_key)
+        return genai.GenerativeModel(self.model_name)
+
+    async def generate(self, prompt: str, api_key: str) -> str:
+        response = await self._model(api_key).generate_content_async(prompt)
+        return response.text
+
+    async def stream(self, prompt: str, api_key: str) -> AsyncIterator[str]:
+        response = await self._model(api_key).generate_content_async(prompt, stream=True)
+        iterator = response.__aiter__()
+        try:
+            async for chunk in iterator:
+                if chunk.text:
+                    yield chunk.text
+        finally:
+            # Stop the upstream generation when the consumer goes away early
+            close = getattr(iterator, "aclose", None)
+            if close:
+                await close()
+
+
+class FakeLLM:
+    """Deterministic offline LLM: answers with the start of the first context block"""
+
+    def __init__(self, token_delay_ms: float = 0.0, max_tokens: int = 64):
+        self.token_delay = token_delay_ms / 1000
+        self.max_tokens = max_tokens
+
+    def _answer(self, prompt: str) -> list[str]:
+        match = re.search(r"Context 1:\n(.*?)(?:\n\nContext \d+:|\n\nQuestion:)", prompt, re.S)
+        source = match.group(1) if match else "I cannot answer based on the context."
+        words = source.split()[:self.max_tokens]
+        return [word + " " for word in words[:-1]] + words[-1:]
+
+    async def generate(self, prompt: str, api_key: str) -> str:
+        return "".join([token async for token in self.stream(prompt, api_key)])
+
+    async def stream(self, prompt: str, api_key: str) -> AsyncIterator[str]:
+        for token in self._answer(prompt):
+            if self.token_delay:
+                await asyncio.sleep(self.token_delay)
+            yield token
+
+
+def create_llm(backend: str, model_name: str, fake_token_delay_ms: float = 0.0):
+    """Build the LLM backend selected for this deployment"""
+    if backend == "gemini":
+        return GeminiLLM(model_name)
+    if backend == "fake":
+        return FakeLLM(token_delay_ms=fake_token_delay_ms)
+    raise ValueError(f"Unknown LLM backend: {backend}")
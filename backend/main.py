@@ -1,15 +1,21 @@
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from fastapi import FastAPI, Form, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
+from starlette.background import BackgroundTask
+from multipart.multipart import MultipartParser, parse_options_header
 import tempfile
 import os
-from typing import Optional
+from typing import Collection, Iterator, Optional, Sequence
 import uuid
 import warnings
 import asyncio
 import json
 import time
+import hashlib
+from dataclasses import asdict
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 # Suppress ChromaDB telemetry warnings
 warnings.filterwarnings("ignore", message=".*capture.*takes 1 positional argument.*")
@@ -18,22 +24,167 @@ warnings.filterwarnings("ignore", message=".*pin_memory.*")
 # Suppress transformers cache deprecation warning
 warnings.filterwarnings("ignore", message=".*TRANSFORMERS_CACHE.*deprecated.*")
 
-from docling.document_converter import DocumentConverter
-from docling.chunking import HybridChunker
-from docling_core.transforms.chunker.tokenizer.huggingface import HuggingFaceTokenizer
-from pypdf import PdfReader
-import chromadb
-from chromadb.config import Settings
-from sentence_transformers import SentenceTransformer
-from transformers import AutoTokenizer
-import google.generativeai as genai
-from langdetect import detect, LangDetectException
-from deep_translator import GoogleTranslator
+# Docling, transformers, torch, pypdf, chromadb and Gemini are imported where they are first used,
+# so the server answers health checks before any of them is loaded
+import numpy as np
+
+from ingestion_cache import IngestionCache, CachedDocument, hash_file
+from conversion import ConversionEngine, can_merge_documents, page_ranges
+from embedding_batcher import EmbeddingBatcher
+from vector_store import ChunkTexts, NumpyVectorStore, VectorStore, create_vector_store
+from lexical_index import BM25Index, fuse
+from context_packer import PackedContext, estimate_tokens, pack_context
+from answer_cache import AnswerCache, CachedRetrieval, ChunkRef, retrieval_scope
+from llm import create_llm
+from translation import LanguageIdentifier, TranslationCache, Translator, create_translation_backend
+from scheduler import IngestionScheduler, Job, JobCancelled, QueueFullError
+from metrics import Registry, process_rss_bytes, process_start_time
+from model_manager import LoadedModel, ModelManager, load_sentence_encoder
+from session_store import SessionDocument, SessionRecord, create_session_store
+from progress_bus import TERMINAL_STEPS, ProgressHub, create_progress_bus
 
 # Constants
-MAX_PAGES = 20
+MAX_PAGES = int(os.getenv("MAX_PAGES", "20"))
 MAX_TOKENS = 512  # Token limit per chunk for HybridChunker
 
+# Uploads are streamed to disk in fixed-size blocks and rejected past this size
+MAX_UPLOAD_MB = int(os.getenv("MAX_UPLOAD_MB", "50"))
+MAX_UPLOAD_BYTES = MAX_UPLOAD_MB * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+UPLOAD_TMP_PREFIX = "docling-rag-upload-"
+
+# Accepted document types
+ALLOWED_EXTENSIONS = ['pdf', 'docx', 'pptx', 'xlsx', 'html']
+
+# Content-addressed cache of processed documents (set the size to 0 to disable)
+INGESTION_CACHE_DIR = os.getenv(
+    "INGESTION_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".cache", "ingestion")
+)
+INGESTION_CACHE_MAX_MB = int(os.getenv("INGESTION_CACHE_MAX_MB", "512"))
+
+# PDFs longer than PDF_SHARD_PAGES are split into shards of that many pages, converted in parallel
+# by the conversion workers and merged in page order (0 = convert every document in one piece)
+PDF_SHARD_PAGES = int(os.getenv("PDF_SHARD_PAGES", "0"))
+
+# Worker processes running Docling conversions, and threads driving the ingestion pipeline
+CONVERSION_WORKERS = int(os.getenv("CONVERSION_WORKERS", str(min(2, os.cpu_count() or 1))))
+INGESTION_THREADS = int(os.getenv("INGESTION_THREADS", str(CONVERSION_WORKERS * 2)))
+
+# Ingestion admission control: concurrent jobs and how many may wait before uploads get a 429
+INGESTION_WORKERS = int(os.getenv("INGESTION_WORKERS", str(CONVERSION_WORKERS)))
+INGESTION_QUEUE_SIZE = int(os.getenv("INGESTION_QUEUE_SIZE", "20"))
+
+# Concurrent encode requests for the same model are merged into batches
+EMBED_MAX_BATCH_SIZE = int(os.getenv("EMBED_MAX_BATCH_SIZE", "64"))
+EMBED_MAX_WAIT_MS = float(os.getenv("EMBED_MAX_WAIT_MS", "5"))
+
+# Bulk uploads: files per request, and how many of one upload's files are processed at the same time
+MAX_BULK_FILES = int(os.getenv("MAX_BULK_FILES", "20"))
+BULK_CONCURRENCY = int(os.getenv("BULK_CONCURRENCY", str(CONVERSION_WORKERS)))
+
+# Ingestion streams chunks to the encoder in batches of this size, with at most this many batches being encoded
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", str(EMBED_MAX_BATCH_SIZE)))
+INGEST_MAX_IN_FLIGHT = int(os.getenv("INGEST_MAX_IN_FLIGHT", "2"))
+
+# Embedding models: "torch", "int8" (dynamic quantization) or "onnx" (needs optimum[onnxruntime]),
+# loaded within a memory budget; least recently used models are evicted (0 = no limit / never)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+MODEL_MEMORY_BUDGET_MB = int(os.getenv("MODEL_MEMORY_BUDGET_MB", "0"))
+MODEL_IDLE_TTL = float(os.getenv("MODEL_IDLE_TTL", "0"))
+# Embedding space: "per_language" (one model per document language; questions are translated to the
+# document language before searching) or "multilingual" (MULTILINGUAL_MODEL_ID embeds every language
+# in one space, so questions are searched as asked, with no translation)
+EMBEDDING_MODE = os.getenv("EMBEDDING_MODE", "per_language")
+MULTILINGUAL_MODEL_ID = os.getenv("MULTILINGUAL_MODEL_ID", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+# Languages whose models load in the background on startup, in this order (empty = load on demand only)
+PRELOAD_LANGUAGES = [lang.strip() for lang in os.getenv("PRELOAD_LANGUAGES", "fr,en,pt").split(",") if lang.strip()]
+
+# Vector store backend per session: "numpy" (exact flat index) or "chroma" (HNSW)
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "numpy")
+# Numpy backend only: float32, float16 (half the memory) or int8 (a quarter, scalar-quantized per row)
+VECTOR_STORE_DTYPE = os.getenv("VECTOR_STORE_DTYPE", "float32")
+# int8 only: also keep the rows as VECTOR_STORE_RESCORE_DTYPE ("none" = off) and re-rank the best
+# top_k * VECTOR_STORE_OVERSAMPLE int8 candidates with them. Resident float16 rows make int8 cost more
+# than plain float16 for the same recall, so only turn this on with disk snapshots, which memory-map them
+VECTOR_STORE_RESCORE_DTYPE = os.getenv("VECTOR_STORE_RESCORE_DTYPE", "none")
+VECTOR_STORE_OVERSAMPLE = int(os.getenv("VECTOR_STORE_OVERSAMPLE", "4"))
+
+# Retrieval: RETRIEVAL_TOP_K chunks go to the LLM, picked by fusing the top RETRIEVAL_CANDIDATES of dense
+# (embedding) and lexical (BM25) search with FUSION_METHOD: "rrf" (reciprocal rank fusion, constant RRF_K)
+# or "score" (weighted sum of normalized scores); a weight of 0 turns a retriever off
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "3"))
+RETRIEVAL_CANDIDATES = int(os.getenv("RETRIEVAL_CANDIDATES", "20"))
+FUSION_METHOD = os.getenv("FUSION_METHOD", "rrf")
+DENSE_WEIGHT = float(os.getenv("DENSE_WEIGHT", "1.0"))
+LEXICAL_WEIGHT = float(os.getenv("LEXICAL_WEIGHT", "1.0"))
+RRF_K = float(os.getenv("RRF_K", "60"))
+# Prompt context: retrieved chunks are put in document order without repeated headings and overlaps, and
+# kept best first up to CONTEXT_TOKEN_BUDGET tokens of the embedding tokenizer (0 = send them unchanged)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1536"))
+
+# Two-level /ask cache shared by all sessions of the same documents: retrieved chunks by question, and
+# answers by retrieved chunks and question, ANSWER_CACHE_SIZE entries each (0 = off) that expire after
+# ANSWER_CACHE_TTL seconds (0 = never); with ANSWER_CACHE_SIMILARITY > 0 a new question also reuses a
+# cached one in the same language whose embedding has at least that cosine similarity
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "10000"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0"))
+
+# /ask pipeline: concurrency limit, executor sizes and per-stage timeouts (seconds)
+ASK_CONCURRENCY = int(os.getenv("ASK_CONCURRENCY", "32"))
+ASK_QUEUE_TIMEOUT = float(os.getenv("ASK_QUEUE_TIMEOUT", "30"))
+ASK_CPU_THREADS = int(os.getenv("ASK_CPU_THREADS", str(os.cpu_count() or 1)))
+ASK_IO_THREADS = int(os.getenv("ASK_IO_THREADS", "16"))
+DETECT_TIMEOUT = float(os.getenv("DETECT_TIMEOUT", "2"))
+TRANSLATE_TIMEOUT = float(os.getenv("TRANSLATE_TIMEOUT", "5"))
+SEARCH_TIMEOUT = float(os.getenv("SEARCH_TIMEOUT", "10"))
+GENERATE_TIMEOUT = float(os.getenv("GENERATE_TIMEOUT", "60"))
+
+# LLM answering questions: "gemini", or "fake" for a local offline stand-in
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+LLM_MODEL = os.getenv("LLM_MODEL", "gemini-2.5-flash-lite")
+FAKE_LLM_TOKEN_DELAY_MS = float(os.getenv("FAKE_LLM_TOKEN_DELAY_MS", "0"))
+
+# Question translation: "google", "argos" (offline) or "identity" (no-op), with an LRU + SQLite cache
+TRANSLATOR_BACKEND = os.getenv("TRANSLATOR_BACKEND", "google")
+TRANSLATION_CACHE_SIZE = int(os.getenv("TRANSLATION_CACHE_SIZE", "10000"))
+TRANSLATION_CACHE_PATH = os.getenv(
+    "TRANSLATION_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".cache", "translations.sqlite3")
+)
+
+# Where sessions and progress events live: "memory" (single worker), "sqlite" (all workers on one host,
+# in SESSION_STORE_PATH), "redis" (REDIS_URL, needs the redis package) or "disk" (all workers on one host,
+# snapshots in SESSION_SNAPSHOT_DIR that survive restarts; progress events go to SESSION_STORE_PATH)
+SESSION_STORE = os.getenv("SESSION_STORE", "memory")
+SESSION_STORE_PATH = os.getenv(
+    "SESSION_STORE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".cache", "sessions.sqlite3")
+)
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+SESSION_SNAPSHOT_DIR = os.getenv(
+    "SESSION_SNAPSHOT_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".cache", "sessions")
+)
+
+# Background reaper: sessions idle for SESSION_TTL seconds are deleted, the least recently used ones go
+# first past MAX_SESSIONS or past SESSION_MEMORY_MB of vectors held by this worker (0 = no limit)
+SESSION_TTL = float(os.getenv("SESSION_TTL", "3600"))
+MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", "500"))
+SESSION_MEMORY_MB = int(os.getenv("SESSION_MEMORY_MB", "1024"))
+REAPER_INTERVAL = float(os.getenv("REAPER_INTERVAL", "60"))
+# Progress channels (kept after the upload ends so reconnecting streams can replay them) and leftover
+# upload temp files are removed after these many seconds
+PROGRESS_CHANNEL_TTL = float(os.getenv("PROGRESS_CHANNEL_TTL", "900"))
+# Progress streams: latest events kept per upload for replay, seconds between keepalives, and how long an
+# upload keeps running once nobody follows it (time for a browser to reconnect with Last-Event-ID)
+PROGRESS_BUFFER_SIZE = int(os.getenv("PROGRESS_BUFFER_SIZE", "256"))
+PROGRESS_KEEPALIVE = float(os.getenv("PROGRESS_KEEPALIVE", "15"))
+PROGRESS_RESUME_GRACE = float(os.getenv("PROGRESS_RESUME_GRACE", "30"))
+TEMP_FILE_TTL = float(os.getenv("TEMP_FILE_TTL", "3600"))
+SESSION_TOUCH_INTERVAL = 60  # seconds between last-access writes to a shared store
+
 # Initialize FastAPI
 app = FastAPI(title="Docling RAG API")
 
@@ -46,11 +197,67 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# In-memory storage for sessions
+# Processors of the sessions this worker has served (the session store holds the shared copy)
 sessions = {}
 
-# Progress tracking for real-time updates (queues created explicitly per session)
-progress_queues = {}
+if SESSION_STORE in ("sqlite", "disk"):
+    os.makedirs(os.path.dirname(os.path.abspath(SESSION_STORE_PATH)), exist_ok=True)
+session_store = create_session_store(SESSION_STORE, SESSION_STORE_PATH, REDIS_URL, SESSION_SNAPSHOT_DIR)
+
+# Temp files of uploads that are still queued or being processed (never reaped)
+active_uploads = set()
+
+# Progress tracking for real-time updates (one channel per upload, readable from any worker); writes are
+# queued on the bus's own thread, so publishing never blocks the event loop or an ingestion thread
+progress_bus = create_progress_bus(SESSION_STORE, SESSION_STORE_PATH, REDIS_URL, PROGRESS_BUFFER_SIZE)
+# Fans each channel out to every progress stream this worker serves, and marks the channel as followed on
+# the bus often enough for the other workers to see it within PROGRESS_RESUME_GRACE
+progress_hub = ProgressHub(progress_bus, PROGRESS_BUFFER_SIZE, heartbeat=max(0.1, PROGRESS_RESUME_GRACE / 3))
+# Uploads waiting to see whether a client reconnects to their progress
+unfollowed_checks: set[asyncio.Task] = set()
+
+# Metrics exported on /metrics
+metrics = Registry()
+stage_seconds = metrics.histogram(
+    "rag_stage_duration_seconds", "Duration of each ingestion and question pipeline stage", ("pipeline", "stage")
+)
+request_seconds = metrics.histogram(
+    "rag_request_duration_seconds", "End-to-end duration of document ingestion and questions", ("pipeline",)
+)
+documents_total = metrics.counter("rag_documents_total", "Processed documents by result", ("result",))
+questions_total = metrics.counter("rag_questions_total", "Answered questions by endpoint and result", ("endpoint", "result"))
+context_tokens_total = metrics.counter(
+    "rag_context_tokens_total", "Prompt context tokens of retrieved chunks, as sent and saved by packing", ("kind",)
+)
+metrics.gauge("rag_active_sessions", "Sessions holding a processed document", lambda: len(sessions))
+metrics.gauge(
+    "rag_session_memory_bytes", "Approximate memory of the session vectors and chunks held by this worker",
+    lambda: sum(session["processor"].memory_bytes for session in list(sessions.values()))
+)
+metrics.gauge(
+    "rag_session_memory_saved_bytes", "Memory the compact vector and chunk text storage saves for the sessions held",
+    lambda: sum(session["processor"].memory_saved_bytes for session in list(sessions.values()))
+)
+sessions_reaped_total = metrics.counter("rag_sessions_reaped_total", "Sessions and leftovers removed by the reaper", ("reason",))
+metrics.gauge("rag_progress_queues", "Open progress channels", lambda: len(progress_bus))
+metrics.gauge("rag_progress_streams", "Progress streams connected to this worker", lambda: progress_hub.subscribers())
+metrics.gauge(
+    "rag_model_loaded", "Whether the embedding model of a language is loaded",
+    lambda: {(key,): float(model_manager.is_loaded(key)) for key in embedding_keys()}, ("language",)
+)
+metrics.gauge(
+    "rag_model_memory_bytes", "Estimated memory of each loaded embedding model",
+    lambda: {(key,): float(model_manager.status(key).get("memory_bytes", 0)) for key in embedding_keys()},
+    ("language",)
+)
+metrics.gauge("rag_ingestion_queue_depth", "Uploads waiting for an ingestion slot", lambda: ingestion_scheduler.queued)
+metrics.gauge("rag_ingestion_running", "Uploads being processed", lambda: ingestion_scheduler.running)
+metrics.gauge("process_resident_memory_bytes", "Resident memory size of the API process", process_rss_bytes)
+
+
+def timed(pipeline: str, stage: str):
+    """Time a pipeline stage into the stage histogram"""
+    return stage_seconds.time(pipeline=pipeline, stage=stage)
 
 # Language code mapping (Docling uses ISO 639-1, langdetect returns similar codes)
 SUPPORTED_LANGUAGES = {
@@ -59,155 +266,636 @@ SUPPORTED_LANGUAGES = {
     'pt': 'Portuguese'
 }
 
-# Model IDs for embeddings (reused for tokenizers)
+# Shown when retrieval finds nothing, in the user's language
+NO_INFO_MESSAGES = {
+    'en': "No relevant information found in the document.",
+    'fr': "Aucune information pertinente trouvée dans le document.",
+    'pt': "Nenhuma informação relevante encontrada no documento."
+}
+
+# Model IDs for embeddings (reused for tokenizers), by language or MULTILINGUAL
+MULTILINGUAL = 'multilingual'
 EMBEDDING_MODEL_IDS = {
     'en': 'sentence-transformers/all-MiniLM-L6-v2',
     'fr': 'dangvantuan/sentence-camembert-large',
-    'pt': 'rufimelo/bert-large-portuguese-cased-sts'
+    'pt': 'rufimelo/bert-large-portuguese-cased-sts',
+    MULTILINGUAL: MULTILINGUAL_MODEL_ID
 }
 
-# Initialize empty model containers (lazy loading)
-embedding_models = {}
-tokenizers = {}
-chunkers = {}
-model_loading_status = {
-    'en': False,
-    'fr': False,
-    'pt': False
-}
+if EMBEDDING_MODE not in ("per_language", "multilingual"):
+    raise ValueError(f"Unknown embedding mode: {EMBEDDING_MODE}")
+
+
+def embedding_key(lang: str) -> str:
+    """Model, and session index, that text in a language is embedded with"""
+    return MULTILINGUAL if EMBEDDING_MODE == "multilingual" else lang
+
+
+def embedding_keys() -> list[str]:
+    """Models in use for the supported languages"""
+    return list(dict.fromkeys(embedding_key(lang) for lang in SUPPORTED_LANGUAGES))
 
 import threading
 import asyncio
 
-def load_language_model(lang: str):
-    """Load embedding model, tokenizer, and chunker for a specific language"""
-    if lang in embedding_models:
-        return  # Already loaded
+# Startup milestones in seconds since the process started (time to first healthy / ready / answer)
+startup_timings = {}
+preload_done = threading.Event()
+preload_errors = []
+conversion_ready = threading.Event()
+
+
+def mark_startup(milestone: str):
+    """Record the first time a startup milestone is reached"""
+    if milestone not in startup_timings:
+        startup_timings[milestone] = round(time.time() - process_start_time(), 3)
+        print(f"⏱️ {milestone} after {startup_timings[milestone]:.2f}s")
+
+
+def readiness_checks() -> dict:
+    return {
+        "models": preload_done.is_set() and not preload_errors,
+        "conversion": conversion_ready.is_set(),
+    }
+
+
+def check_ready() -> bool:
+    """Whether the preloaded models and the conversion workers are up"""
+    ready = all(readiness_checks().values())
+    if ready:
+        mark_startup("ready")
+    return ready
+
+
+metrics.gauge("process_start_time_seconds", "Start time of the process since unix epoch in seconds", process_start_time)
+metrics.gauge(
+    "rag_startup_seconds", "Seconds from process start to each startup milestone",
+    lambda: {(milestone,): seconds for milestone, seconds in startup_timings.items()}, ("milestone",)
+)
+
+ingestion_cache = (
+    IngestionCache(INGESTION_CACHE_DIR, INGESTION_CACHE_MAX_MB * 1024 * 1024)
+    if INGESTION_CACHE_MAX_MB > 0 else None
+)
+
+# Dedicated pool for ingestion so uploads never queue behind the default executor
+ingestion_executor = ThreadPoolExecutor(max_workers=INGESTION_THREADS, thread_name_prefix="ingest")
 
-    print(f"Loading {SUPPORTED_LANGUAGES.get(lang, lang)} model ({lang})...")
+# /ask stages: CPU-bound work (language detection, embedding + search) and blocking network calls
+ask_cpu_executor = ThreadPoolExecutor(max_workers=ASK_CPU_THREADS, thread_name_prefix="ask-cpu")
+ask_io_executor = ThreadPoolExecutor(max_workers=ASK_IO_THREADS, thread_name_prefix="ask-io")
+ask_semaphore = asyncio.Semaphore(ASK_CONCURRENCY)
+
+llm = create_llm(LLM_BACKEND, LLM_MODEL, FAKE_LLM_TOKEN_DELAY_MS)
+
+answer_cache = (
+    AnswerCache(ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL, ANSWER_CACHE_SIMILARITY, f"{LLM_BACKEND}:{LLM_MODEL}")
+    if ANSWER_CACHE_SIZE > 0 else None
+)
+
+if TRANSLATION_CACHE_PATH:
+    os.makedirs(os.path.dirname(os.path.abspath(TRANSLATION_CACHE_PATH)), exist_ok=True)
+translator = Translator(
+    create_translation_backend(TRANSLATOR_BACKEND),
+    TranslationCache(TRANSLATION_CACHE_SIZE, TRANSLATION_CACHE_PATH or None)
+)
+language_identifier = LanguageIdentifier(set(SUPPORTED_LANGUAGES), default='en')
+
+# Created on startup: worker processes must not be spawned while this module is imported
+conversion_engine: Optional[ConversionEngine] = None
+conversion_engine_lock = threading.Lock()
+
+
+def get_conversion_engine() -> ConversionEngine:
+    """Return the shared conversion engine, starting it on first use"""
+    global conversion_engine
+    with conversion_engine_lock:
+        if conversion_engine is None:
+            conversion_engine = ConversionEngine(CONVERSION_WORKERS)
+        return conversion_engine
+
+
+def warm_up_conversion_engine():
+    """Start the conversion workers so the first upload doesn't pay for model loading"""
     try:
-        model_id = EMBEDDING_MODEL_IDS[lang]
+        get_conversion_engine().warm_up()
+        print(f"✓ Conversion engine ready ({CONVERSION_WORKERS} workers)")
+        conversion_ready.set()
+        mark_startup("conversion_ready")
+        check_ready()
+    except Exception as e:
+        print(f"✗ Error starting conversion engine: {e}")
 
-        # Load embedding model
-        embedding_models[lang] = SentenceTransformer(model_id)
+def load_language_model(lang: str) -> LoadedModel:
+    """Load embedding model, tokenizer, and chunker for a specific language"""
+    from docling.chunking import HybridChunker
+    from docling_core.transforms.chunker.tokenizer.huggingface import HuggingFaceTokenizer
+    from transformers import AutoTokenizer
 
-        # Load tokenizer and chunker
-        tokenizers[lang] = HuggingFaceTokenizer(
-            tokenizer=AutoTokenizer.from_pretrained(model_id),
-            max_tokens=MAX_TOKENS
-        )
-        chunkers[lang] = HybridChunker(
-            tokenizer=tokenizers[lang],
-            merge_peers=True
-        )
+    print(f"Loading {SUPPORTED_LANGUAGES.get(lang, lang)} model ({lang}, {EMBEDDING_BACKEND})...")
+    model_id = EMBEDDING_MODEL_IDS[lang]
+
+    # Load embedding model
+    model, backend = load_sentence_encoder(model_id, EMBEDDING_BACKEND)
+
+    # Load tokenizer and chunker
+    tokenizer = HuggingFaceTokenizer(
+        tokenizer=AutoTokenizer.from_pretrained(model_id),
+        max_tokens=MAX_TOKENS
+    )
+    chunker = HybridChunker(
+        tokenizer=tokenizer,
+        merge_peers=True
+    )
+
+    # Warm-up pass: the first encode pays for lazy initialization and buffer allocation
+    model.encode(["Warm-up sentence for the embedding model."], batch_size=1, convert_to_numpy=True)
+    tokenizer.count_tokens("Warm-up sentence for the tokenizer.")
+
+    print(f"✓ {SUPPORTED_LANGUAGES.get(lang, lang)} model loaded!")
+    return LoadedModel(lang=lang, model_id=model_id, backend=backend, model=model, chunker=chunker)
 
-        model_loading_status[lang] = True
-        print(f"✓ {SUPPORTED_LANGUAGES.get(lang, lang)} model loaded!")
+
+def embedding_cache_id(model_id: str, backend: str) -> str:
+    """Model identity for the ingestion cache: quantized and ONNX embeddings differ slightly from float32"""
+    return model_id if backend == "torch" else f"{model_id}@{backend}"
+
+
+model_manager = ModelManager(load_language_model, MODEL_MEMORY_BUDGET_MB * 1024 * 1024, MODEL_IDLE_TTL)
+
+
+def get_language_model(lang: str) -> LoadedModel:
+    """Return the model for a language (the multilingual one in that mode), falling back to English if it can't be loaded"""
+    key = embedding_key(lang)
+    try:
+        return model_manager.get(key)
+    except Exception as e:
+        print(f"✗ Error loading {key} model: {e}")
+        if key in ('en', MULTILINGUAL):
+            raise HTTPException(status_code=500, detail=f"Embedding model for {lang} not available")
+    try:
+        return model_manager.get('en')
     except Exception as e:
-        print(f"✗ Error loading {lang} model: {e}")
+        raise HTTPException(status_code=500, detail=f"Embedding model for {lang} not available: {e}")
+
+embedding_batchers = {}
+embedding_batchers_lock = threading.Lock()
+
+
+def get_embedding_batcher(lang: str) -> EmbeddingBatcher:
+    """Return the shared encode batcher for a loaded language model"""
+    with embedding_batchers_lock:
+        if lang not in embedding_batchers:
+            embedding_batchers[lang] = EmbeddingBatcher(
+                lang,
+                lambda: model_manager.get(lang).model,
+                max_batch_size=EMBED_MAX_BATCH_SIZE,
+                max_wait_ms=EMBED_MAX_WAIT_MS
+            )
+        return embedding_batchers[lang]
+
 
 def preload_models_background():
-    """Pre-load models in priority order: FR → EN → PT"""
-    priority_order = ['fr', 'en', 'pt']
-    for lang in priority_order:
-        load_language_model(lang)
+    """Pre-load models in PRELOAD_LANGUAGES order (just the multilingual model in that mode)"""
+    for lang in PRELOAD_LANGUAGES:
+        if lang not in EMBEDDING_MODEL_IDS:
+            print(f"✗ Unknown language in PRELOAD_LANGUAGES: {lang}")
+    for lang in dict.fromkeys(embedding_key(lang) for lang in PRELOAD_LANGUAGES if lang in EMBEDDING_MODEL_IDS):
+        try:
+            model_manager.preload(lang)
+        except Exception as e:
+            print(f"✗ Error loading {lang} model: {e}")
+            preload_errors.append(f"{lang}: {e}")
+    preload_done.set()
+    mark_startup("models_ready")
+    check_ready()
 
 
 def detect_language(text: str) -> str:
     """Detect language of text, return ISO 639-1 code (en/fr/pt), default to 'en'"""
-    try:
-        lang = detect(text)
-        # Map detected language to supported languages
-        if lang in SUPPORTED_LANGUAGES:
-            return lang
-        # If detected language not supported, default to English
-        return 'en'
-    except LangDetectException:
-        # If detection fails, default to English
-        return 'en'
+    return language_identifier.detect(text)
 
 
 def translate_text(text: str, source_lang: str, target_lang: str) -> str:
-    """Translate text from source language to target language"""
-    if source_lang == target_lang:
-        return text
+    """Translate text from source language to target language (cached, original text on failure)"""
+    return translator.translate(text, source_lang, target_lang)
+
 
+def send_progress(session_id: str, message: str, step: str = "", **details):
+    """Send progress update to the session's channel"""
     try:
-        translator = GoogleTranslator(source=source_lang, target=target_lang)
-        return translator.translate(text)
+        progress_bus.publish(session_id, {"message": message, "step": step, **details})
     except Exception as e:
-        print(f"Translation error: {e}")
-        return text  # Return original text if translation fails
+        print(f"Error sending progress: {e}")
 
 
-def send_progress(session_id: str, message: str, step: str = ""):
-    """Send progress update to the session's queue"""
+def send_queue_position(job: Job, position: int, estimated_wait: float):
+    """Tell a queued upload where it stands"""
+    message = f"🕒 Waiting in queue: position {position}"
+    if estimated_wait:
+        message += f", about {estimated_wait:.0f}s"
     try:
-        queue = progress_queues[session_id]
-        queue.put_nowait({"message": message, "step": step})
+        progress_bus.publish(job.id, {
+            "message": message, "step": "queued", "position": position, "estimated_wait": round(estimated_wait, 1)
+        })
     except Exception as e:
         print(f"Error sending progress: {e}")
 
 
+def send_queued_cancelled(job: Job):
+    """End the stream of an upload cancelled before it started"""
+    send_progress(job.id, "🛑 Processing cancelled", "cancelled")
+
+
+ingestion_scheduler = IngestionScheduler(
+    INGESTION_WORKERS, INGESTION_QUEUE_SIZE, on_queue_update=send_queue_position, on_cancel=send_queued_cancelled
+)
+
+
+def check_pdf_pages(file_path: str) -> tuple[bool, int]:
+    """Check if PDF is within page limit"""
+    from pypdf import PdfReader
+
+    try:
+        reader = PdfReader(file_path)
+        num_pages = len(reader.pages)
+        return num_pages <= MAX_PAGES, num_pages
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error reading PDF: {str(e)}")
+
+
+def validate_pdf_pages(file_path: str) -> int:
+    """Raise a 400 error if a PDF exceeds the page limit; returns the page count"""
+    within_limit, num_pages = check_pdf_pages(file_path)
+    if not within_limit:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Document has {num_pages} pages. Maximum allowed: {MAX_PAGES} pages."
+        )
+    return num_pages
+
+
+class UploadForm:
+    """Multipart form of an upload request, parsed while the body streams in
+
+    File parts go straight from the request stream to temporary files, hashed
+    block by block on the way, so the body is read once and never held in
+    memory. The 413 comes as soon as a file goes over MAX_UPLOAD_BYTES, whether
+    or not the request declared a Content-Length. Other parts are form fields.
+    """
+
+    def __init__(self, max_files: int):
+        self.max_files = max_files
+        self.fields: dict[str, str] = {}
+        self.files: list[dict] = []  # same keys as receive_uploads returns
+        self._header_name = b""
+        self._header_value = b""
+        self._disposition = b""
+        self._name = ""
+        self._value = bytearray()
+        self._file = None  # temp file of the file part being received
+        self._digest = None
+        self._started = 0.0
+
+    def on_part_begin(self):
+        self._disposition = b""
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def on_header_end(self):
+        if self._header_name.lower() == b"content-disposition":
+            self._disposition = self._header_value
+        self._header_name, self._header_value = b"", b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._disposition)
+        self._name = options.get(b"name", b"").decode("utf-8", "replace")
+        if b"filename" not in options:
+            self._value = bytearray()
+            return
+
+        filename = options[b"filename"].decode("utf-8", "replace")
+        if len(self.files) >= self.max_files:
+            raise HTTPException(status_code=400, detail=f"Too many files. Maximum allowed: {self.max_files}.")
+        extension = filename.split('.')[-1].lower()
+        if extension not in ALLOWED_EXTENSIONS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unsupported file type: {filename}. Allowed: {', '.join(ALLOWED_EXTENSIONS)}"
+            )
+        self._file = tempfile.NamedTemporaryFile(delete=False, prefix=UPLOAD_TMP_PREFIX, suffix=f".{extension}")
+        self._digest = hashlib.sha256()
+        self._started = time.perf_counter()
+        self.files.append({
+            "filename": filename,
+            "extension": extension,
+            "path": self._file.name,
+            "content_hash": None,
+            "num_pages": None,
+            "bytes": 0,
+            "upload_seconds": 0.0
+        })
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        block = data[start:end]
+        if self._file is None:
+            self._value += block
+            # The size check only allows 64 KB besides the files for the other fields
+            if len(self._value) > 64 * 1024:
+                raise HTTPException(status_code=413, detail=f"Form field {self._name} is too large.")
+            return
+        upload = self.files[-1]
+        upload["bytes"] += len(block)
+        if upload["bytes"] > MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail=f"File too large. Maximum allowed: {MAX_UPLOAD_MB} MB.")
+        self._digest.update(block)
+        self._file.write(block)
+
+    def on_part_end(self):
+        if self._file is None:
+            self.fields[self._name] = self._value.decode("utf-8", "replace")
+            return
+        self._file.close()
+        self._file = None
+        upload = self.files[-1]
+        upload["content_hash"] = self._digest.hexdigest()
+        upload["upload_seconds"] = time.perf_counter() - self._started
+
+    async def parse(self, request: Request):
+        """Consume the request body; on any error the temp files written so far are removed"""
+        _, params = parse_options_header(request.headers.get("content-type", ""))
+        if b"boundary" not in params:
+            raise HTTPException(status_code=400, detail="Expected a multipart/form-data upload.")
+        parser = MultipartParser(params[b"boundary"], {
+            "on_part_begin": self.on_part_begin,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished
+        })
+        try:
+            async for chunk in request.stream():
+                parser.write(chunk)
+            parser.finalize()
+            if self._file is not None:
+                raise HTTPException(status_code=400, detail="Upload ended in the middle of a file.")
+        except BaseException:
+            if self._file is not None:
+                self._file.close()
+            for upload in self.files:
+                if os.path.exists(upload["path"]):
+                    os.unlink(upload["path"])
+            raise
+
+
+class LanguageIndex:
+    """Vector store and keyword index over a session's chunks embedded by one model
+
+    That is one per document language, or a single one for all languages in multilingual mode.
+    """
+
+    def __init__(self, session_id: str, language: str):
+        self.language = language  # document language or MULTILINGUAL
+        self.vector_store: VectorStore = create_vector_store(
+            VECTOR_STORE_BACKEND,
+            f"docs_{session_id}_{language}",
+            VECTOR_STORE_DTYPE,
+            VECTOR_STORE_RESCORE_DTYPE,
+            VECTOR_STORE_OVERSAMPLE
+        )
+        # BM25 over the same chunks, unless LEXICAL_WEIGHT is 0
+        self.lexical_index: Optional[BM25Index] = BM25Index() if LEXICAL_WEIGHT > 0 else None
+        # Documents in the same language may be ingested concurrently
+        self._lock = threading.Lock()
+
+    def add_vectors(self, document_id: str, ids: list[str], embeddings: np.ndarray, texts: list[str]):
+        with self._lock:
+            self.vector_store.add(ids, embeddings, texts, {"document_id": document_id, "language": self.language})
+
+    def add_keywords(self, document_id: str, ids: list[str], texts: list[str]):
+        if self.lexical_index is not None:
+            self.lexical_index.add(ids, texts, document_id)
+
+    def restore(self, ids: list[str], owners: list[str], embeddings: np.ndarray, texts: Sequence[str],
+                lexical_state: Optional[dict] = None, scales: Optional[np.ndarray] = None,
+                rescore: Optional[np.ndarray] = None):
+        """Fill an empty index from a stored record, keeping memory-mapped arrays as they are"""
+        # Runs of consecutive chunks from the same document, each tagged with that document
+        runs, start = [], 0
+        for end in range(1, len(ids) + 1):
+            if end == len(ids) or owners[end] != owners[start]:
+                runs.append((owners[start], start, end))
+                start = end
+        if isinstance(self.vector_store, NumpyVectorStore):
+            groups = np.empty(len(ids), dtype=np.int32)
+            for group, (_, start, end) in enumerate(runs):
+                groups[start:end] = group
+            metadatas = [{"document_id": owner, "language": self.language} for owner, _, _ in runs]
+            self.vector_store.attach(ids, embeddings, texts, metadatas, groups, scales, rescore)
+        else:
+            if scales is not None:
+                embeddings = embeddings.astype(np.float32) * scales[:, None]
+            for owner, start, end in runs:
+                self.add_vectors(owner, ids[start:end], embeddings[start:end], texts[start:end])
+        if self.lexical_index is not None and lexical_state is not None:
+            self.lexical_index = BM25Index.from_state(lexical_state)
+        else:
+            for owner, start, end in runs:
+                self.add_keywords(owner, ids[start:end], texts[start:end])
+
+    def export_document(self, document_id: str) -> tuple[list[str], np.ndarray]:
+        """Chunk texts and embeddings of one document"""
+        _, _, texts, metadatas = self.vector_store.export()
+        rows = [i for i, metadata in enumerate(metadatas) if metadata.get("document_id") == document_id]
+        return [texts[i] for i in rows], self.vector_store.vectors()[rows]
+
+    @property
+    def nbytes(self) -> int:
+        return self.vector_store.nbytes + (self.lexical_index.nbytes if self.lexical_index else 0)
+
+    @property
+    def saved_bytes(self) -> int:
+        """Memory saved by the compact vector and text storage, compared to float32 rows and a list of str"""
+        return max(0, self.vector_store.baseline_nbytes - self.vector_store.nbytes)
+
+    def delete(self):
+        self.vector_store.delete()
+        self.lexical_index = None
+
+
+def chunk_document_id(chunk_id: str) -> str:
+    """Chunk ids are "<document id>:<chunk number>" """
+    return chunk_id.rsplit(":", 1)[0]
+
+
 class DocumentProcessor:
-    """Handles document processing and RAG functionality"""
+    """Handles document processing and RAG functionality for the documents of one session"""
 
-    def __init__(self, session_id: str):
+    def __init__(self, session_id: str, cancel_event: Optional[threading.Event] = None, label_progress: bool = False):
         self.session_id = session_id
-        self.chroma_client = chromadb.Client(Settings(
-            anonymized_telemetry=False,
-            allow_reset=True
+        self.cancel_event = cancel_event
+        self.label_progress = label_progress  # prefix progress messages with the file name (bulk uploads)
+        self.documents: dict[str, SessionDocument] = {}  # by document id, in the order they finished processing
+        self.indexes: dict[str, LanguageIndex] = {}  # by embedding_key() of the documents sharing it
+        self.discarded: set[str] = set()  # failed documents whose chunks were already indexed
+        self._lock = threading.Lock()
+
+    @property
+    def memory_bytes(self) -> int:
+        """Approximate memory held by the session's vectors, keyword indexes and chunk texts"""
+        return sum(index.nbytes for index in list(self.indexes.values()))
+
+    @property
+    def memory_saved_bytes(self) -> int:
+        """Memory saved by compact storage (VECTOR_STORE_DTYPE, packed chunk texts)"""
+        return sum(index.saved_bytes for index in list(self.indexes.values()))
+
+    @property
+    def document_language(self) -> str:
+        """Language of the first document (the only one for single uploads)"""
+        return next(iter(self.documents.values())).language if self.documents else "en"
+
+    def languages(self, document_ids: Optional[list[str]] = None) -> list[str]:
+        """Languages of the given documents (all of them by default), first document first"""
+        return list(dict.fromkeys(
+            document.language for document in self.documents.values()
+            if document_ids is None or document.document_id in document_ids
         ))
-        self.collection = None
-        self.document_content = ""
-        self.docling_document = None  # Store DoclingDocument for HybridChunker
-        self.document_language = "en"  # Default to English
 
-    def check_pdf_pages(self, file_path: str) -> tuple[bool, int]:
-        """Check if PDF is within page limit"""
-        try:
-            reader = PdfReader(file_path)
-            num_pages = len(reader.pages)
-            return num_pages <= MAX_PAGES, num_pages
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Error reading PDF: {str(e)}")
+    def index_keys(self, document_ids: Optional[list[str]] = None) -> list[str]:
+        """Indexes holding the given documents (all of them by default), first document first"""
+        return list(dict.fromkeys(embedding_key(language) for language in self.languages(document_ids)))
+
+    def _index(self, language: str) -> LanguageIndex:
+        with self._lock:
+            if language not in self.indexes:
+                self.indexes[language] = LanguageIndex(self.session_id, language)
+            return self.indexes[language]
+
+    def _register(self, document: SessionDocument):
+        with self._lock:
+            self.documents[document.document_id] = document
+
+    @classmethod
+    def from_record(cls, record: SessionRecord) -> "DocumentProcessor":
+        """Rebuild a processed session stored by another worker"""
+        processor = cls(record.session_id)
+        for document in record.documents:
+            processor._register(document)
+        for language, ids in record.chunk_ids.items():
+            processor._index(language).restore(
+                ids,
+                record.chunk_documents[language],
+                record.embeddings[language],
+                record.chunks[language],
+                record.lexical.get(language),
+                record.scales.get(language),
+                record.rescore.get(language)
+            )
+        return processor
+
+    def to_record(self) -> SessionRecord:
+        """Everything another worker needs to answer questions about these documents
+
+        Texts and vectors stay in the vector store's compact form and share its memory.
+        """
+        chunk_ids, chunk_documents, chunks, embeddings, lexical, scales, rescore = {}, {}, {}, {}, {}, {}, {}
+        for language, index in list(self.indexes.items()):
+            ids, vectors, texts, metadatas = index.vector_store.export()
+            owners = [metadata.get("document_id") for metadata in metadatas]
+            # Leave out the chunks of documents that failed halfway through
+            rows = [i for i, owner in enumerate(owners) if owner in self.documents]
+            complete = len(rows) == len(ids)
+            chunk_ids[language] = [ids[i] for i in rows]
+            chunk_documents[language] = [owners[i] for i in rows]
+            chunks[language] = texts if complete else ChunkTexts.pack([texts[i] for i in rows])
+            embeddings[language] = vectors if complete else vectors[rows]
+            if isinstance(index.vector_store, NumpyVectorStore):
+                for arrays, array in ((scales, index.vector_store.scales), (rescore, index.vector_store.rescore_rows)):
+                    if array is not None:
+                        arrays[language] = array if complete else array[rows]
+            # The keyword index still holds the chunks of discarded documents, so it is rebuilt then
+            if index.lexical_index is not None and not self.discarded:
+                lexical[language] = index.lexical_index.state()
+        return SessionRecord(
+            session_id=self.session_id,
+            documents=list(self.documents.values()),
+            chunk_ids=chunk_ids,
+            chunk_documents=chunk_documents,
+            chunks=chunks,
+            embeddings=embeddings,
+            lexical=lexical,
+            scales=scales,
+            rescore=rescore
+        )
 
-    def process_document(self, file_path: str, file_extension: str) -> dict:
-        """Process document with Docling"""
+    def _progress(self, message: str, step: str, document: Optional[SessionDocument] = None, **details):
+        """Report progress, stopping the pipeline here if the upload was cancelled"""
+        if self.cancel_event and self.cancel_event.is_set():
+            raise JobCancelled(f"Processing of session {self.session_id} was cancelled")
+        if document is not None:
+            details = {"document_id": document.document_id, "filename": document.filename, **details}
+            if self.label_progress:
+                message = f"{document.filename}: {message}"
+        send_progress(self.session_id, message, step, **details)
+
+    def process_document(self, file_path: str, file_extension: str, content_hash: Optional[str] = None,
+                         num_pages: Optional[int] = None, filename: Optional[str] = None) -> dict:
+        """Process document with Docling and add it to the session's indexes
+
+        Passing the `num_pages` of a PDF skips the page check when the upload was already validated.
+        """
+        document = SessionDocument(document_id=uuid.uuid4().hex[:12], filename=filename or os.path.basename(file_path))
         try:
-            send_progress(self.session_id, "📋 Validating document...", "validating")
+            self._progress("📋 Validating document...", "validating", document)
 
             # Check PDF page limit
-            if file_extension == "pdf":
-                within_limit, num_pages = self.check_pdf_pages(file_path)
-                if not within_limit:
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"Document has {num_pages} pages. Maximum allowed: {MAX_PAGES} pages."
+            if file_extension == "pdf" and num_pages is None:
+                with timed("ingest", "page_check"):
+                    num_pages = validate_pdf_pages(file_path)
+
+            # Skip conversion, chunking and embedding if this exact file was processed before
+            document.content_hash = content_hash or hash_file(file_path)
+            if ingestion_cache:
+                with timed("ingest", "cache_lookup"):
+                    cached = ingestion_cache.lookup(
+                        document.content_hash,
+                        [embedding_cache_id(EMBEDDING_MODEL_IDS[key], EMBEDDING_BACKEND) for key in embedding_keys()],
+                        MAX_TOKENS
                     )
+                if cached:
+                    return self._load_from_cache(document, cached)
 
             # Inform user about potential model download on first run
-            send_progress(self.session_id, "📄 Converting document to markdown (first time may download OCR models, ~1-2 min)...", "converting")
-
-            # Convert document with Docling
-            converter = DocumentConverter()
-            result = converter.convert(file_path)
+            self._progress(
+                "📄 Converting document to markdown (first time may download OCR models, ~1-2 min)...",
+                "converting", document
+            )
 
-            # Store the DoclingDocument for HybridChunker
-            self.docling_document = result.document
+            # Convert document with Docling in a warmed worker process
+            # Keep the DoclingDocument for HybridChunker (and only until chunking is done)
+            with timed("ingest", "convert"):
+                docling_document = self._convert(document, file_path, file_extension, num_pages)
 
-            send_progress(self.session_id, "📝 Extracting text from document...", "extracting")
-            markdown_content = self.docling_document.export_to_markdown()
+            self._progress("📝 Extracting text from document...", "extracting", document)
+            with timed("ingest", "export_markdown"):
+                markdown_content = docling_document.export_to_markdown()
 
-            send_progress(self.session_id, "🌍 Detecting document language...", "detecting_language")
+            self._progress("🌍 Detecting document language...", "detecting_language", document)
 
             # Extract document language from Docling metadata
             doc_lang = None
-            if hasattr(result.document, 'lang') and result.document.lang:
-                doc_lang = result.document.lang.lower()
-            elif hasattr(result.document, 'metadata') and result.document.metadata:
+            if hasattr(docling_document, 'lang') and docling_document.lang:
+                doc_lang = docling_document.lang.lower()
+            elif hasattr(docling_document, 'metadata') and docling_document.metadata:
                 # Check metadata for language
-                metadata = result.document.metadata
+                metadata = docling_document.metadata
                 if hasattr(metadata, 'language'):
                     doc_lang = metadata.language.lower()
                 elif isinstance(metadata, dict) and 'language' in metadata:
@@ -216,14 +904,15 @@ class DocumentProcessor:
             # If Docling didn't detect language, use content-based detection
             if not doc_lang or doc_lang not in SUPPORTED_LANGUAGES:
                 # Detect from first 1000 chars of content
-                doc_lang = detect_language(markdown_content[:1000])
+                with timed("ingest", "detect_language"):
+                    doc_lang = detect_language(markdown_content[:1000])
                 print(f"Language detected from content: {doc_lang}")
             else:
                 print(f"Language from Docling: {doc_lang}")
 
-            self.document_language = doc_lang
+            document.language = doc_lang
             lang_name = SUPPORTED_LANGUAGES.get(doc_lang, doc_lang.upper())
-            send_progress(self.session_id, f"✓ Language: {lang_name}", "language_detected")
+            self._progress(f"✓ Language: {lang_name}", "language_detected", document)
 
             # Estimate pages for non-PDF formats
             if file_extension != "pdf":
@@ -234,155 +923,321 @@ class DocumentProcessor:
                         detail=f"Document too large! Estimated {estimated_pages} pages. Maximum: {MAX_PAGES}."
                     )
 
-            self.document_content = markdown_content
-
-            send_progress(self.session_id, "✂️ Creating smart chunks...", "chunking")
-            # Chunk using HybridChunker with document structure
-            chunks = self._chunk_with_hybrid_chunker()
-
-            send_progress(self.session_id, "🧠 Generating embeddings...", "embedding")
-            # Create embeddings and store in ChromaDB
-            self._create_vector_store(chunks)
+            document.content_length = len(markdown_content)
 
-            return {
-                "status": "success",
-                "message": "Document processed successfully",
-                "num_chunks": len(chunks),
-                "content_length": len(markdown_content),
-                "document_language": self.document_language,
-                "language_name": SUPPORTED_LANGUAGES.get(self.document_language, "Unknown")
-            }
+            # Chunk with HybridChunker, embed and store, one batch at a time
+            document.num_chunks = self._ingest_chunks(document, docling_document)
+            del docling_document
+            self._register(document)
+            self._save_to_cache(document, markdown_content)
+            return self._result(document, cached=False)
 
-        except HTTPException:
+        except (HTTPException, JobCancelled):
+            self._discard(document)
             raise
         except Exception as e:
+            self._discard(document)
             raise HTTPException(status_code=500, detail=f"Error processing document: {str(e)}")
 
-    def _chunk_with_hybrid_chunker(self) -> list[str]:
+    def _discard(self, document: SessionDocument):
+        """Hide the chunks a failed document may have indexed already from searches"""
+        if document.document_id not in self.documents:
+            self.discarded.add(document.document_id)
+
+    def _result(self, document: SessionDocument, cached: bool) -> dict:
+        return {
+            "status": "success",
+            "message": "Document loaded from cache" if cached else "Document processed successfully",
+            "document_id": document.document_id,
+            "filename": document.filename,
+            "num_chunks": document.num_chunks,
+            "content_length": document.content_length,
+            "document_language": document.language,
+            "language_name": SUPPORTED_LANGUAGES.get(document.language, "Unknown"),
+            "cached": cached
+        }
+
+    def _convert(self, document: SessionDocument, file_path: str, file_extension: str, num_pages: Optional[int]):
+        """Convert the document, as parallel page shards if it is a PDF longer than PDF_SHARD_PAGES"""
+        engine = get_conversion_engine()
+        if file_extension != "pdf" or not PDF_SHARD_PAGES or num_pages <= PDF_SHARD_PAGES:
+            return engine.convert(file_path)
+        if not can_merge_documents():
+            print("✗ Installed docling-core cannot merge documents, converting the PDF in one piece")
+            return engine.convert(file_path)
+
+        ranges = page_ranges(num_pages, PDF_SHARD_PAGES)
+        print(f"Converting {num_pages} pages in {len(ranges)} shards of up to {PDF_SHARD_PAGES} pages")
+        return engine.convert_sharded(
+            file_path,
+            ranges,
+            on_shard=lambda done, total: self._progress(
+                f"📄 Converted {ranges[done - 1][1]}/{num_pages} pages...", "converting", document,
+                pages=ranges[done - 1][1], total_pages=num_pages
+            )
+        )
+
+    def _iter_chunks(self, chunker, docling_document) -> Iterator[str]:
         """
         Use Docling's HybridChunker for hierarchical, structure-aware chunking.
         This respects document structure (headings, sections, tables) and uses
         the same tokenizer as the embedding model for optimal chunk sizes.
+        Chunk texts are yielded as the chunker produces them.
         """
-        if not self.docling_document:
-            raise HTTPException(status_code=500, detail="No Docling document available for chunking")
-
-        # Lazy-load model if not already loaded
-        if self.document_language not in chunkers:
-            load_language_model(self.document_language)
-
-        # Get the appropriate chunker for the document language
-        chunker = chunkers.get(self.document_language, chunkers.get('en'))
-        if not chunker:
-            raise HTTPException(status_code=500, detail=f"Chunker for {self.document_language} not available")
-        print(f"Using {self.document_language} HybridChunker for document structure-aware chunking")
-
-        # Chunk the document using HybridChunker
-        chunk_iter = chunker.chunk(dl_doc=self.docling_document)
-
-        # Extract text from chunks
-        chunks = []
-        for chunk in chunk_iter:
+        for chunk in chunker.chunk(dl_doc=docling_document):
             # Use the contextualize method to get metadata-enriched text
             chunk_text = chunker.serialize(chunk)
             if chunk_text and chunk_text.strip():
-                chunks.append(chunk_text.strip())
+                yield chunk_text.strip()
 
-        print(f"Created {len(chunks)} structure-aware chunks")
-        return chunks
-
-    def _create_vector_store(self, chunks: list[str]):
-        """Create ChromaDB collection with embeddings"""
-        try:
-            # Create collection
-            collection_name = f"docs_{self.session_id}"
-            self.collection = self.chroma_client.create_collection(
-                name=collection_name,
-                metadata={"hnsw:space": "cosine"}
-            )
+    def _ingest_chunks(self, document: SessionDocument, docling_document) -> int:
+        """Chunk, embed and store the document as a pipeline of INGEST_BATCH_SIZE batches
 
-            # Lazy-load model if not already loaded
-            if self.document_language not in embedding_models:
-                lang_name = SUPPORTED_LANGUAGES.get(self.document_language, self.document_language.upper())
-                send_progress(self.session_id, f"🤖 Loading {lang_name} model (first time, ~30-60s)...", "loading_model")
-                load_language_model(self.document_language)
-
-            # Get the appropriate embedding model for document language
-            embedding_model = embedding_models.get(self.document_language, embedding_models.get('en'))
-            if not embedding_model:
-                raise HTTPException(status_code=500, detail=f"Embedding model for {self.document_language} not available")
-            print(f"Using {self.document_language} embedding model for document chunks")
-
-            # Generate embeddings
-            embeddings = embedding_model.encode(chunks).tolist()
-
-            send_progress(self.session_id, "💾 Storing in vector database...", "storing")
-            # Add to ChromaDB
-            ids = [f"chunk_{i}" for i in range(len(chunks))]
-            self.collection.add(
-                embeddings=embeddings,
-                documents=chunks,
-                ids=ids
-            )
+        Each batch is submitted to the embedding batcher as soon as it is chunked, so the
+        next batch is chunked while it is encoded, and encoded batches are added to the
+        language index right away. Returns the number of chunks.
+        """
+        if not docling_document:
+            raise HTTPException(status_code=500, detail="No Docling document available for chunking")
 
-            send_progress(self.session_id, "✅ Ready! Ask your questions below.", "complete")
+        # Lazy-load the model (and its chunker) for the document language if not already loaded
+        if not model_manager.is_loaded(embedding_key(document.language)):
+            lang_name = SUPPORTED_LANGUAGES.get(embedding_key(document.language), "Multilingual")
+            self._progress(f"🤖 Loading {lang_name} model (~30-60s)...", "loading_model", document)
+        with timed("ingest", "model_load"):
+            model = get_language_model(document.language)
+        print(f"Using {model.lang} HybridChunker and embedding model for document chunks")
+        document.embedding_model_id = embedding_cache_id(model.model_id, model.backend)
+        batcher = get_embedding_batcher(model.lang)
+
+        self._progress("✂️ Creating smart chunks and embeddings...", "chunking", document)
+        index = self._index(embedding_key(document.language))
+        durations = {"chunk": 0.0, "encode": 0.0, "store": 0.0, "lexical_index": 0.0}
+        pending = deque()  # (chunk texts, future of their embeddings), oldest first
+        stored = 0
+
+        def store_oldest():
+            nonlocal stored
+            texts, future = pending.popleft()
+            start = time.perf_counter()
+            embeddings = future.result()
+            durations["encode"] += time.perf_counter() - start
+
+            start = time.perf_counter()
+            ids = [f"{document.document_id}:{stored + i}" for i in range(len(texts))]
+            index.add_vectors(document.document_id, ids, embeddings, texts)
+            durations["store"] += time.perf_counter() - start
+
+            start = time.perf_counter()
+            index.add_keywords(document.document_id, ids, texts)
+            durations["lexical_index"] += time.perf_counter() - start
+            stored += len(texts)
+            self._progress(f"🧠 Embedded and stored {stored} chunks...", "embedding", document, chunks=stored)
+
+        chunks = self._iter_chunks(model.chunker, docling_document)
+        batch = []
+        while True:
+            start = time.perf_counter()
+            text = next(chunks, None)
+            durations["chunk"] += time.perf_counter() - start
+            if text is not None:
+                batch.append(text)
+                if len(batch) < INGEST_BATCH_SIZE:
+                    continue
+            if batch:
+                pending.append((batch, batcher.submit(batch)))
+                batch = []
+            # Store finished batches in order; wait for the oldest once too many are in flight
+            while pending and (text is None or len(pending) > INGEST_MAX_IN_FLIGHT or pending[0][1].done()):
+                store_oldest()
+            if text is None:
+                break
+
+        for stage, seconds in durations.items():
+            stage_seconds.observe(seconds, pipeline="ingest", stage=stage)
+        print(f"Created {stored} structure-aware chunks")
+        return stored
+
+    def _load_from_cache(self, document: SessionDocument, cached: CachedDocument) -> dict:
+        """Add a previously processed copy of the document to the session's indexes"""
+        self._progress("⚡ Document already processed, loading from cache...", "cache_hit", document)
+        print(f"Ingestion cache hit for {document.content_hash[:12]} ({len(cached.chunks)} chunks)")
+
+        document.language = cached.language
+        document.embedding_model_id = cached.model_id
+        document.content_length = len(cached.markdown)
+        document.num_chunks = len(cached.chunks)
+        lang_name = SUPPORTED_LANGUAGES.get(cached.language, cached.language.upper())
+        self._progress(f"✓ Language: {lang_name}", "language_detected", document)
 
+        try:
+            self._progress("💾 Storing in vector database...", "storing", document)
+            index = self._index(embedding_key(document.language))
+            ids = [f"{document.document_id}:{i}" for i in range(len(cached.chunks))]
+            with timed("ingest", "store"):
+                index.add_vectors(document.document_id, ids, cached.embeddings, cached.chunks)
+            with timed("ingest", "lexical_index"):
+                index.add_keywords(document.document_id, ids, cached.chunks)
+        except JobCancelled:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error creating vector store: {str(e)}")
 
-    def search_similar(self, query: str, top_k: int = 3) -> list[str]:
-        """Search for similar chunks using document language embedding model"""
-        if not self.collection:
-            raise HTTPException(status_code=400, detail="No document loaded")
+        self._register(document)
+        return self._result(document, cached=True)
 
+    def _save_to_cache(self, document: SessionDocument, markdown_content: str):
+        """Store the processed document so identical uploads can skip the pipeline"""
+        if not ingestion_cache or not document.embedding_model_id:
+            return
         try:
-            # Lazy-load model if not already loaded
-            if self.document_language not in embedding_models:
-                load_language_model(self.document_language)
-
-            # Get the appropriate embedding model for document language
-            embedding_model = embedding_models.get(self.document_language, embedding_models.get('en'))
-            if not embedding_model:
-                raise HTTPException(status_code=500, detail=f"Embedding model for {self.document_language} not available")
-
-            # Embed query
-            query_embedding = embedding_model.encode([query])[0].tolist()
+            chunks, embeddings = self.indexes[embedding_key(document.language)].export_document(document.document_id)
+            ingestion_cache.put(
+                document.content_hash,
+                document.language,
+                document.embedding_model_id,
+                MAX_TOKENS,
+                markdown_content,
+                chunks,
+                embeddings
+            )
+        except Exception as e:
+            # A failed cache write must never fail the upload itself
+            print(f"Error writing ingestion cache: {e}")
+
+    def _search_index(self, index: LanguageIndex, query: str, candidates: int,
+                      document_ids: Optional[Collection[str]]) -> list[tuple[str, float]]:
+        """Fused ranking of one language index; returns (chunk id, score), best first"""
+        hybrid = index.lexical_index is not None
+        dense = []
+        if DENSE_WEIGHT > 0 or not hybrid:
+            # Get the embedding model the documents were indexed with (lazy-loaded if it was evicted)
+            model = get_language_model(index.language)
+
+            # Embed query (batched with concurrent queries from other sessions)
+            with timed("ask", "embed"):
+                query_embedding = get_embedding_batcher(model.lang).encode([query])[0]
 
             # Search
-            results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=top_k
-            )
+            with timed("ask", "search"):
+                dense = [
+                    (chunk_id, score)
+                    for chunk_id, _, score in index.vector_store.query(query_embedding, candidates, document_ids)
+                ]
+        if not hybrid:
+            return dense
+
+        # Exact identifiers, numbers and table terms that embeddings tend to miss
+        with timed("ask", "lexical_search"):
+            lexical = index.lexical_index.search(query, candidates, document_ids)
+        return [(chunk_id, 1.0 / rank) for rank, (chunk_id, _) in enumerate(fuse(
+            [dense, lexical], FUSION_METHOD, [DENSE_WEIGHT, LEXICAL_WEIGHT], RRF_K
+        ), start=1)]
+
+    def search_similar(self, queries: dict[str, str], top_k: int = RETRIEVAL_TOP_K,
+                       document_ids: Optional[Collection[str]] = None) -> list[tuple[str, str]]:
+        """Search the session's documents with the query in the language of each index
+
+        `queries` maps an index key (see index_keys()) to the query to search it with; only the
+        documents in `document_ids` are searched if given. Returns (chunk id, chunk text), best first.
+        """
+        if not self.documents:
+            raise HTTPException(status_code=400, detail="No document loaded")
+
+        try:
+            allowed = set(self.documents) if document_ids is None else set(document_ids) & set(self.documents)
+            languages = [language for language in self.index_keys(allowed) if language in queries]
+            candidates = max(top_k, RETRIEVAL_CANDIDATES) if LEXICAL_WEIGHT > 0 or len(languages) > 1 else top_k
+            # Only filter by document when needed: a subset was asked for, or a failed document left chunks behind
+            document_filter = allowed if document_ids is not None or self.discarded else None
+            rankings = {
+                language: self._search_index(self.indexes[language], queries[language], candidates, document_filter)
+                for language in languages
+            }
 
-            return results['documents'][0] if results['documents'] else []
+            with timed("ask", "fuse"):
+                if len(rankings) == 1:
+                    fused = next(iter(rankings.values()))[:top_k]
+                else:
+                    # Scores of different embedding models are not comparable, ranks are
+                    fused = fuse(list(rankings.values()), "rrf", None, RRF_K)[:top_k]
+                owners = {}
+                for language, ranking in rankings.items():
+                    owners.update((chunk_id, language) for chunk_id, _ in ranking)
+                texts = {}
+                for language in languages:
+                    wanted = [chunk_id for chunk_id, _ in fused if owners[chunk_id] == language]
+                    if wanted:
+                        texts.update(zip(wanted, self.indexes[language].vector_store.get_documents(wanted)))
+            return [(chunk_id, texts[chunk_id]) for chunk_id, _ in fused]
 
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error searching: {str(e)}")
 
+    def retrieval_scope(self, document_ids: Optional[list[str]] = None) -> str:
+        """Answer cache scope: the content and embedding model of the searched documents, and the retrieval settings"""
+        return retrieval_scope(
+            [
+                (document.content_hash, document.embedding_model_id) for document in self.documents.values()
+                if document_ids is None or document.document_id in document_ids
+            ],
+            (EMBEDDING_MODE, TRANSLATOR_BACKEND, FUSION_METHOD, DENSE_WEIGHT, LEXICAL_WEIGHT, RRF_K,
+             RETRIEVAL_CANDIDATES, MAX_TOKENS)
+        )
 
-def generate_answer(query: str, context_chunks: list[str], api_key: str, user_language: str = 'en') -> str:
-    """Generate answer using Google Gemini in the user's language"""
-    try:
-        # Configure Gemini
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-2.5-flash-lite')
-
-        # Build context
-        context = "\n\n".join([f"Context {i+1}:\n{chunk}" for i, chunk in enumerate(context_chunks)])
-
-        # Language instruction for Gemini
-        language_instruction = ""
-        if user_language == 'fr':
-            language_instruction = "\n\nIMPORTANT: You must answer in FRENCH (français)."
-        elif user_language == 'pt':
-            language_instruction = "\n\nIMPORTANT: You must answer in PORTUGUESE (português)."
-        elif user_language == 'en':
-            language_instruction = "\n\nIMPORTANT: You must answer in ENGLISH."
-        else:
-            language_instruction = f"\n\nIMPORTANT: You must answer in the same language as the question."
+    def chunk_refs(self, hits: list[tuple[str, str]]) -> list[ChunkRef]:
+        """Session-independent (content hash, chunk number) of retrieved chunks"""
+        refs = []
+        for chunk_id, _ in hits:
+            document_id, number = chunk_id.rsplit(":", 1)
+            refs.append((self.documents[document_id].content_hash, int(number)))
+        return refs
+
+    def resolve_chunks(self, refs: list[ChunkRef], document_ids: Optional[list[str]] = None
+                       ) -> Optional[list[tuple[str, str]]]:
+        """(chunk id, chunk text) of cached chunk references in this session, or None if one is missing"""
+        by_hash = {
+            document.content_hash: document for document in self.documents.values()
+            if document_ids is None or document.document_id in document_ids
+        }
+        try:
+            hits = []
+            for content_hash, number in refs:
+                document = by_hash[content_hash]
+                chunk_id = f"{document.document_id}:{number}"
+                index = self.indexes[embedding_key(document.language)]
+                hits.append((chunk_id, index.vector_store.get_documents([chunk_id])[0]))
+            return hits
+        except Exception:
+            return None
+
+    def close(self):
+        """Release the session's vector stores"""
+        for index in list(self.indexes.values()):
+            index.delete()
+        self.indexes = {}
+
+
+def build_prompt(query: str, context_chunks: list[str], user_language: str = 'en') -> str:
+    """Build the Gemini prompt asking for an answer in the user's language"""
+    # Build context
+    context = "\n\n".join([f"Context {i+1}:\n{chunk}" for i, chunk in enumerate(context_chunks)])
+
+    # Language instruction for Gemini
+    language_instruction = ""
+    if user_language == 'fr':
+        language_instruction = "\n\nIMPORTANT: You must answer in FRENCH (français)."
+    elif user_language == 'pt':
+        language_instruction = "\n\nIMPORTANT: You must answer in PORTUGUESE (português)."
+    elif user_language == 'en':
+        language_instruction = "\n\nIMPORTANT: You must answer in ENGLISH."
+    else:
+        language_instruction = f"\n\nIMPORTANT: You must answer in the same language as the question."
 
-        # Build prompt
-        prompt = f"""You are a helpful assistant answering questions about a document.
+    # Build prompt
+    return f"""You are a helpful assistant answering questions about a document.
 Use the following context to answer the question. If you cannot answer based on the context, say so.{language_instruction}
 
 {context}
@@ -391,67 +1246,510 @@ Question: {query}
 
 Answer:"""
 
-        # Generate response
-        response = model.generate_content(prompt)
 
-        return response.text
+async def generate_answer(query: str, context_chunks: list[str], api_key: str, user_language: str = 'en') -> str:
+    """Generate answer using the configured LLM in the user's language"""
+    try:
+        prompt = build_prompt(query, context_chunks, user_language)
+
+        # Generate response with the async client so the event loop stays free
+        return await llm.generate(prompt, api_key)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating answer: {str(e)}")
 
 
+async def run_stage(executor: ThreadPoolExecutor, timeout: float, func, *args):
+    """Run a blocking pipeline stage on an executor with a timeout"""
+    loop = asyncio.get_running_loop()
+    return await asyncio.wait_for(loop.run_in_executor(executor, func, *args), timeout)
+
+
+async def get_session(session_id: str) -> dict:
+    """Return a processed session, loading it from the session store if another worker created it; 404 otherwise"""
+    loop = asyncio.get_running_loop()
+    now = time.time()
+    session = sessions.get(session_id)
+    if session is not None:
+        if not session_store.shared or await loop.run_in_executor(ask_io_executor, session_store.exists, session_id):
+            session["last_access"] = now
+            if not session_store.shared:
+                session_store.touch(session_id, now)
+            elif now - session["touched"] > SESSION_TOUCH_INTERVAL:
+                # Other workers' reapers only see the stored time, so keep it roughly current
+                session["touched"] = now
+                await loop.run_in_executor(ask_io_executor, session_store.touch, session_id, now)
+            return session
+        # Cleared through another worker
+        unload_session(session_id, force=True)
+    elif session_store.shared:
+        record = await loop.run_in_executor(ask_io_executor, session_store.get, session_id)
+        if record is not None:
+            processor = await loop.run_in_executor(ask_cpu_executor, DocumentProcessor.from_record, record)
+            print(f"Loaded session {session_id} from the {SESSION_STORE} session store")
+            session = sessions[session_id] = {
+                "processor": processor,
+                "api_key": "",  # not shared between workers: questions bring their own
+                "timestamp": record.created_at,
+                "last_access": now,
+                "touched": now,
+                "asks": 0
+            }
+            await loop.run_in_executor(ask_io_executor, session_store.touch, session_id, now)
+            return session
+    raise HTTPException(status_code=404, detail="Session not found. Please upload a document first.")
+
+
+def question_api_key(session: dict, api_key: Optional[str]) -> str:
+    """The question's own API key, else the one the session was uploaded with on this worker"""
+    api_key = api_key or session["api_key"]
+    if not api_key:
+        # Session stores never keep API keys, so sessions loaded from one have none
+        raise HTTPException(status_code=422, detail="Missing form field: api_key.")
+    return api_key
+
+
+async def acquire_ask_slot():
+    """Wait for a free question slot so a burst can't exhaust the executors or the LLM quota"""
+    try:
+        await asyncio.wait_for(ask_semaphore.acquire(), ASK_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=503, detail="Server busy, please retry in a moment.")
+
+
+def parse_document_ids(processor: DocumentProcessor, document_ids: Optional[str]) -> Optional[list[str]]:
+    """Parse a comma-separated document filter; None searches every document of the session"""
+    if not document_ids or not document_ids.strip():
+        return None
+    ids = list(dict.fromkeys(document_id.strip() for document_id in document_ids.split(",") if document_id.strip()))
+    unknown = [document_id for document_id in ids if document_id not in processor.documents]
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"Unknown document ids: {', '.join(unknown)}")
+    return ids
+
+
+async def detect_question_language(question: str, fallback: str) -> str:
+    """Detect user's question language, or assume `fallback` if detection times out"""
+    try:
+        with timed("ask", "detect"):
+            return await run_stage(ask_cpu_executor, DETECT_TIMEOUT, detect_language, question)
+    except asyncio.TimeoutError:
+        print("Language detection timed out, assuming document language")
+        return fallback
+
+
+async def search_documents(processor: DocumentProcessor, question: str, document_ids: Optional[list[str]] = None,
+                           user_language: Optional[str] = None) -> tuple[str, list[tuple[str, str]]]:
+    """Detect the question language (unless known), translate it to each document language and search the documents.
+
+    In multilingual mode the question is searched as asked, while its language is detected.
+    Returns the user's language and the retrieved (chunk id, chunk) pairs.
+    """
+    document_languages = processor.languages(document_ids)
+    index_keys = processor.index_keys(document_ids)
+
+    async def detect() -> str:
+        return user_language or await detect_question_language(question, document_languages[0])
+
+    async def search(search_queries: dict[str, str]) -> list[tuple[str, str]]:
+        # Search for relevant chunks using translated queries
+        try:
+            return await run_stage(
+                ask_cpu_executor, SEARCH_TIMEOUT, processor.search_similar, search_queries, RETRIEVAL_TOP_K, document_ids
+            )
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail="Search timed out")
+
+    if index_keys == [MULTILINGUAL]:
+        # One embedding space for every language: no translation, and the language is only needed for the answer
+        user_language, hits = await asyncio.gather(detect(), search({MULTILINGUAL: question}))
+        print(f"User question language: {user_language}, searched the multilingual index")
+        return user_language, hits
+
+    user_language = await detect()
+    print(f"User question language: {user_language}, Document languages: {', '.join(document_languages)}")
+
+    async def translate(document_language: str) -> str:
+        """Translate question to document language if different"""
+        if user_language == document_language or document_language == MULTILINGUAL:
+            return question
+        print(f"Translating question from {user_language} to {document_language}")
+        try:
+            with timed("ask", "translate"):
+                search_query = await run_stage(
+                    ask_io_executor, TRANSLATE_TIMEOUT,
+                    translate_text, question, user_language, document_language
+                )
+            print(f"Translated query: {search_query}")
+            return search_query
+        except asyncio.TimeoutError:
+            # Same fallback as a failed translation: search with the original question
+            print("Translation timed out, searching with the original question")
+            return question
+
+    # One translation per document language, concurrently
+    search_queries = dict(zip(index_keys, await asyncio.gather(*(translate(key) for key in index_keys))))
+    return user_language, await search(search_queries)
+
+
+def embed_question(question: str, user_language: str) -> np.ndarray:
+    """Embedding of a question as asked, for near-duplicate answer cache lookups"""
+    return get_embedding_batcher(get_language_model(user_language).lang).encode([question])[0]
+
+
+async def retrieve_context(processor: DocumentProcessor, question: str, document_ids: Optional[list[str]] = None
+                           ) -> tuple[str, list[tuple[str, str]], Optional[CachedRetrieval]]:
+    """Retrieve the chunks for a question from the answer cache, or by searching the documents.
+
+    Returns the user's language, the retrieved (chunk id, chunk) pairs and the
+    cache entry to look up and store the answer with (None if the cache is off).
+    """
+    if answer_cache is None:
+        user_language, hits = await search_documents(processor, question, document_ids)
+        return user_language, hits, None
+
+    scope = processor.retrieval_scope(document_ids)
+    with timed("ask", "cache_lookup"):
+        retrieval = answer_cache.get_retrieval(scope, question, RETRIEVAL_TOP_K)
+
+    # Near-duplicate lookup: a cached question in the same language with a close embedding
+    user_language, embedding = None, None
+    if retrieval is None and ANSWER_CACHE_SIMILARITY > 0:
+        user_language = await detect_question_language(question, processor.languages(document_ids)[0])
+        try:
+            with timed("ask", "cache_embed"):
+                embedding = await run_stage(ask_cpu_executor, SEARCH_TIMEOUT, embed_question, question, user_language)
+            retrieval = answer_cache.find_similar(scope, RETRIEVAL_TOP_K, user_language, embedding)
+        except asyncio.TimeoutError:
+            print("Question embedding timed out, skipping the near-duplicate lookup")
+
+    if retrieval is not None:
+        hits = processor.resolve_chunks(retrieval.chunks, document_ids)
+        if hits is not None:
+            print(f"Answer cache hit: {len(hits)} chunks for a question in {retrieval.user_language}")
+            return retrieval.user_language, hits, retrieval
+
+    user_language, hits = await search_documents(processor, question, document_ids, user_language)
+    retrieval = answer_cache.put_retrieval(
+        scope, question, RETRIEVAL_TOP_K, user_language, processor.chunk_refs(hits), embedding
+    )
+    return user_language, hits, retrieval
+
+
+def context_token_counter(processor: DocumentProcessor, document_ids: Optional[list[str]] = None):
+    """Token counter of the embedding model of the documents, or an estimate if it is not loaded"""
+    key = processor.index_keys(document_ids)[0]
+    if model_manager.is_loaded(key):
+        tokenizer = getattr(model_manager.get(key).chunker, "tokenizer", None)
+        if tokenizer is not None:
+            return tokenizer.count_tokens
+    return estimate_tokens
+
+
+async def assemble_context(processor: DocumentProcessor, hits: list[tuple[str, str]],
+                           document_ids: Optional[list[str]] = None) -> tuple[list[str], int]:
+    """Context blocks of the prompt (the retrieved chunks packed into CONTEXT_TOKEN_BUDGET) and the tokens saved"""
+    if CONTEXT_TOKEN_BUDGET <= 0 or not hits:
+        return [chunk for _, chunk in hits], 0
+    try:
+        with timed("ask", "pack_context"):
+            packed: PackedContext = await run_stage(
+                ask_cpu_executor, SEARCH_TIMEOUT, pack_context,
+                hits, context_token_counter(processor, document_ids), CONTEXT_TOKEN_BUDGET
+            )
+    except asyncio.TimeoutError:
+        print("Context packing timed out, sending the chunks unchanged")
+        return [chunk for _, chunk in hits], 0
+    context_tokens_total.inc(packed.tokens, kind="sent")
+    context_tokens_total.inc(packed.saved_tokens, kind="saved")
+    print(f"Context: {len(packed.chunks)}/{len(hits)} chunks, {packed.tokens} tokens ({packed.saved_tokens} saved)")
+    return packed.chunks, packed.saved_tokens
+
+
 # API Endpoints
 
+def unload_session(session_id: str, force: bool = False) -> bool:
+    """Remove a session from this worker (on the event loop); False if it was kept
+
+    A session answering questions is only removed when forced, and its vector
+    stores are then left to the garbage collector instead of being closed under
+    the running search.
+    """
+    session = sessions.get(session_id)
+    if session is None:
+        return True
+    if session["asks"] and not force:
+        return False
+    del sessions[session_id]
+    if not session["asks"]:
+        session["processor"].close()
+    return True
+
+
+def delete_stored_sessions(session_ids: list[str]):
+    for session_id in session_ids:
+        session_store.delete(session_id)
+
+
+def remove_stale_uploads(now: float) -> int:
+    """Delete upload temp files left behind by a crash or a killed worker; returns how many"""
+    removed = 0
+    tmp_dir = tempfile.gettempdir()
+    for name in os.listdir(tmp_dir):
+        path = os.path.join(tmp_dir, name)
+        if not name.startswith(UPLOAD_TMP_PREFIX) or path in active_uploads:
+            continue
+        try:
+            if now - os.path.getmtime(path) > TEMP_FILE_TTL:
+                os.unlink(path)
+                removed += 1
+        except OSError:
+            pass  # Removed concurrently
+    return removed
+
+
+async def reap_sessions() -> dict:
+    """One reaper pass: expire idle sessions, enforce the session limits, remove orphaned channels and temp files
+
+    Store and file I/O runs on the ask I/O pool; sessions and progress channels are released on the event
+    loop, skipping sessions with a question in flight.
+    """
+    loop = asyncio.get_running_loop()
+    now = time.time()
+    reaped = {"expired": 0, "max_sessions": 0, "memory": 0, "unloaded": 0, "progress_channels": 0, "temp_files": 0}
+    stored_deletes = []
+
+    def drop(session_id: str, reason: str, delete_stored: bool = True):
+        if unload_session(session_id):
+            if delete_stored:
+                stored_deletes.append(session_id)
+            reaped[reason] += 1
+
+    # Sessions registered locally are always stored first, so a local one missing from the store was cleared elsewhere
+    local_ids = list(sessions)
+    access = await loop.run_in_executor(ask_io_executor, session_store.access_times)
+    for session_id in local_ids:
+        session = sessions.get(session_id)
+        if session is None:
+            continue
+        if session_id not in access:
+            drop(session_id, "unloaded", delete_stored=False)
+        else:
+            access[session_id] = max(access[session_id], session["last_access"])
+
+    # Idle expiry and the session count limit cover every stored session, least recently used first
+    by_last_access = sorted(access, key=access.get)
+    kept = []
+    for session_id in by_last_access:
+        if SESSION_TTL > 0 and now - access[session_id] > SESSION_TTL:
+            drop(session_id, "expired")
+        else:
+            kept.append(session_id)
+    if MAX_SESSIONS > 0:
+        for session_id in kept[:max(0, len(kept) - MAX_SESSIONS)]:
+            drop(session_id, "max_sessions")
+
+    # Memory budget for the vectors this worker holds; a shared store keeps the record so it can be reloaded
+    if SESSION_MEMORY_MB > 0:
+        budget = SESSION_MEMORY_MB * 1024 * 1024
+        local = sorted(list(sessions.items()), key=lambda item: item[1]["last_access"])
+        used = sum(session["processor"].memory_bytes for _, session in local)
+        for session_id, session in local:
+            if used <= budget:
+                break
+            if session["asks"]:
+                continue
+            used -= session["processor"].memory_bytes
+            drop(session_id, "memory", delete_stored=not session_store.shared)
+
+    if stored_deletes:
+        await loop.run_in_executor(ask_io_executor, delete_stored_sessions, stored_deletes)
+
+    # Progress channels of uploads whose stream was never opened or never finished
+    stale = await loop.run_in_executor(ask_io_executor, progress_bus.stale, now - PROGRESS_CHANNEL_TTL)
+    for channel in stale:
+        if ingestion_scheduler.get(channel) is None:
+            progress_bus.close(channel)
+            reaped["progress_channels"] += 1
+
+    reaped["temp_files"] = await loop.run_in_executor(ask_io_executor, remove_stale_uploads, now)
+
+    for reason, count in reaped.items():
+        if count:
+            sessions_reaped_total.inc(count, reason=reason)
+    if any(reaped.values()):
+        memory_mb = sum(session["processor"].memory_bytes for session in list(sessions.values())) / 1024 / 1024
+        summary = ", ".join(f"{reason}={count}" for reason, count in reaped.items() if count)
+        print(f"🧹 Reaped {summary} in {time.time() - now:.2f}s; {len(sessions)} sessions loaded ({memory_mb:.1f} MB)")
+    return reaped
+
+
+async def session_reaper():
+    """Run the reaper every REAPER_INTERVAL seconds"""
+    while True:
+        await asyncio.sleep(REAPER_INTERVAL)
+        try:
+            await reap_sessions()
+        except Exception as e:
+            print(f"Error in session reaper: {e}")
+
+
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    """Refuse uploads whose declared size is over the limit before the body is read"""
+    if request.method == "POST" and request.url.path.startswith("/upload"):
+        content_length = request.headers.get("content-length")
+        limit = MAX_UPLOAD_BYTES * (MAX_BULK_FILES if request.url.path == "/upload/bulk" else 1)
+        # Allow some room for the multipart envelope and the other form fields
+        if content_length and content_length.isdigit() and int(content_length) > limit + 64 * 1024:
+            return JSONResponse(
+                status_code=413,
+                content={"detail": f"File too large. Maximum allowed: {MAX_UPLOAD_MB} MB."}
+            )
+    return await call_next(request)
+
+
+reaper_task: Optional[asyncio.Task] = None
+
+
 @app.on_event("startup")
 async def startup_event():
     """Start background model loading on app startup"""
     print("🚀 Starting server...")
-    print("⏳ Models will load in background: FR → EN → PT")
+    if PRELOAD_LANGUAGES:
+        print(f"⏳ Models will load in background: {' → '.join(lang.upper() for lang in PRELOAD_LANGUAGES)}")
     # Run model loading in a separate thread to not block startup
     threading.Thread(target=preload_models_background, daemon=True).start()
+    threading.Thread(target=warm_up_conversion_engine, daemon=True).start()
+    await ingestion_scheduler.start()
+    global reaper_task
+    reaper_task = asyncio.create_task(session_reaper())
+    mark_startup("serving")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop conversion worker processes and pipeline executors"""
+    await ingestion_scheduler.stop()
+    if reaper_task:
+        reaper_task.cancel()
+    if conversion_engine:
+        conversion_engine.shutdown()
+    for executor in (ingestion_executor, ask_cpu_executor, ask_io_executor):
+        executor.shutdown(wait=False, cancel_futures=True)
 
 @app.get("/api/health")
 async def health():
     return {"message": "Docling RAG API is running!", "status": "healthy"}
 
+
+@app.get("/api/live")
+async def liveness():
+    """Liveness probe: the process is up and serving requests"""
+    return {"status": "alive"}
+
+
+@app.get("/api/ready")
+async def readiness():
+    """Readiness probe: preloaded models and conversion workers are up (503 until then)"""
+    ready = check_ready()
+    body = {
+        "status": "ready" if ready else "starting",
+        "checks": readiness_checks(),
+        "preload_languages": PRELOAD_LANGUAGES,
+        "startup_seconds": startup_timings,
+    }
+    if preload_errors:
+        body["errors"] = preload_errors
+    return body if ready else JSONResponse(status_code=503, content=body)
+
 @app.get("/api/model-status")
 async def model_status():
     """Return the loading status of all models"""
     return {
         "models": {
-            "fr": {"loaded": model_loading_status['fr'], "name": "French"},
-            "en": {"loaded": model_loading_status['en'], "name": "English"},
-            "pt": {"loaded": model_loading_status['pt'], "name": "Portuguese"}
+            key: {"name": SUPPORTED_LANGUAGES.get(key, "Multilingual"), **model_manager.status(key)}
+            for key in embedding_keys()
         },
-        "any_loaded": any(model_loading_status.values()),
-        "all_loaded": all(model_loading_status.values())
+        "any_loaded": any(model_manager.is_loaded(key) for key in embedding_keys()),
+        "all_loaded": all(model_manager.is_loaded(key) for key in embedding_keys()),
+        "embedding_mode": EMBEDDING_MODE,
+        "memory": {"backend": EMBEDDING_BACKEND, **model_manager.stats()},
+        "batching": {lang: batcher.stats() for lang, batcher in embedding_batchers.items()}
+    }
+
+
+@app.get("/api/cache-stats")
+async def cache_stats():
+    """Return hit/miss counters of the ingestion, translation and answer caches"""
+    return {
+        "ingestion": {"enabled": True, **ingestion_cache.stats()} if ingestion_cache else {"enabled": False},
+        "translation": translator.stats(),
+        "answers": {"enabled": True, **answer_cache.stats()} if answer_cache else {"enabled": False}
     }
 
 
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Stage latency histograms, counters and gauges in Prometheus text format"""
+    # Some gauges query the session store and the progress bus
+    output = await asyncio.get_running_loop().run_in_executor(ask_io_executor, metrics.render)
+    return PlainTextResponse(output, media_type="text/plain; version=0.0.4")
+
+
+@app.get("/api/scheduler")
+async def scheduler_stats():
+    """Return ingestion queue depth, wait times and job counters"""
+    return ingestion_scheduler.stats()
+
+
+async def cancel_unfollowed_upload(session_id: str):
+    """Cancel an upload once no stream, on any worker, has followed it for PROGRESS_RESUME_GRACE seconds"""
+    delay = PROGRESS_RESUME_GRACE
+    while True:
+        await asyncio.sleep(delay)
+        if ingestion_scheduler.get(session_id) is None or progress_hub.subscribers(session_id):
+            return  # Finished, or followed here again (the end of that stream checks again)
+        idle = time.time() - await progress_bus.followed_at(session_id)
+        if idle >= PROGRESS_RESUME_GRACE:
+            break
+        # Followed on another worker since: wait until that stream has been gone long enough
+        delay = PROGRESS_RESUME_GRACE - idle
+    if ingestion_scheduler.cancel(session_id):
+        print(f"Progress stream closed, cancelled ingestion of session {session_id}")
+
+
 @app.get("/api/progress/{session_id}")
-async def progress_stream(session_id: str):
-    """Server-Sent Events endpoint for real-time progress updates"""
+async def progress_stream(request: Request, session_id: str, last_event_id: Optional[str] = None):
+    """Server-Sent Events endpoint for real-time progress updates.
+
+    Any number of clients can follow an upload. A client reconnecting with the
+    Last-Event-ID header (or ?last_event_id=) only receives the events it missed.
+    The stream ends after the complete, error or cancelled event.
+    """
+    if not await progress_bus.exists(session_id):
+        raise HTTPException(status_code=404, detail="No upload in progress for this session")
+    last_event_id = request.headers.get("last-event-id") or last_event_id
+
     async def event_generator():
-        queue = progress_queues[session_id]
+        finished = False
         try:
-            while True:
-                # Wait for progress message with timeout
-                try:
-                    progress = await asyncio.wait_for(queue.get(), timeout=120.0)
-                    # Send SSE formatted message
-                    yield f"data: {json.dumps(progress)}\n\n"
-                    # If complete, stop streaming
-                    if progress.get('step') == 'complete':
-                        break
-                except asyncio.TimeoutError:
-                    # Send keepalive
+            # None means nothing arrived within PROGRESS_KEEPALIVE seconds
+            async for item in progress_hub.subscribe(session_id, last_event_id, PROGRESS_KEEPALIVE):
+                if item is None:
                     yield f": keepalive\n\n"
+                    continue
+                event_id, progress = item
+                yield f"id: {event_id}\ndata: {json.dumps(progress)}\n\n"
+                finished = progress.get('step') in TERMINAL_STEPS
         except Exception as e:
             print(f"Progress stream error: {e}")
         finally:
-            # Clean up queue
-            if session_id in progress_queues:
-                del progress_queues[session_id]
+            if not finished:
+                # Nobody may be waiting for this upload anymore, unless the client reconnects
+                check = asyncio.create_task(cancel_unfollowed_upload(session_id))
+                unfollowed_checks.add(check)
+                check.add_done_callback(unfollowed_checks.discard)
 
     return StreamingResponse(
         event_generator(),
@@ -463,169 +1761,440 @@ async def progress_stream(session_id: str):
     )
 
 
-@app.post("/upload")
-async def upload_document(
-    file: UploadFile = File(...),
-    api_key: str = Form(...)
-):
-    """Upload and process a document"""
+async def receive_uploads(request: Request, max_files: int) -> tuple[dict[str, str], list[dict]]:
+    """Stream the uploaded files to disk, then check the form fields and the page limit of PDFs
 
-    # Validate file type
-    file_extension = file.filename.split('.')[-1].lower()
-    allowed_extensions = ['pdf', 'docx', 'pptx', 'xlsx', 'html']
+    Returns the form fields and one dict per file.
+    """
+    form = UploadForm(max_files)
+    await form.parse(request)
+    uploads = form.files
+    for upload in uploads:
+        active_uploads.add(upload["path"])
 
-    if file_extension not in allowed_extensions:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Unsupported file type. Allowed: {', '.join(allowed_extensions)}"
-        )
+    try:
+        if not uploads:
+            raise HTTPException(status_code=422, detail="No file uploaded.")
+        if not form.fields.get("api_key"):
+            raise HTTPException(status_code=422, detail="Missing form field: api_key.")
+        if not form.fields.get("priority", "0").lstrip("-").isdigit():
+            raise HTTPException(status_code=422, detail="Form field priority must be an integer.")
+
+        # Reject over-limit PDFs before creating a session or a background task
+        for upload in uploads:
+            if upload["extension"] == "pdf":
+                with timed("ingest", "page_check"):
+                    upload["num_pages"] = await asyncio.get_running_loop().run_in_executor(
+                        ingestion_executor, validate_pdf_pages, upload["path"]
+                    )
+    except BaseException:
+        for upload in uploads:
+            remove_upload(upload["path"])
+        raise
+    return form.fields, uploads
 
-    # Clean up sessions older than 1 hour to support multiple concurrent users
-    current_time = time.time()
-    for sid in list(sessions.keys()):
-        session_age = current_time - sessions[sid].get("timestamp", 0)
-        if session_age > 3600:  # 1 hour = 3600 seconds
-            try:
-                processor = sessions[sid]["processor"]
-                collection_name = f"docs_{sid}"
-                processor.chroma_client.delete_collection(collection_name)
-                print(f"Cleaned up expired session {sid} (age: {session_age:.0f}s)")
-            except Exception as e:
-                print(f"Error cleaning up session {sid}: {e}")
-            del sessions[sid]
 
-    # Create session
-    session_id = str(uuid.uuid4())
+def remove_upload(tmp_file_path: str):
+    """Delete an upload's temp file"""
+    active_uploads.discard(tmp_file_path)
+    if os.path.exists(tmp_file_path):
+        os.unlink(tmp_file_path)
 
-    # Create progress queue for this session (must be in async context)
-    progress_queues[session_id] = asyncio.Queue()
 
-    # Save uploaded file temporarily
-    with tempfile.NamedTemporaryFile(delete=False, suffix=f".{file_extension}") as tmp_file:
-        content = await file.read()
-        tmp_file.write(content)
-        tmp_file_path = tmp_file.name
+def queue_ingestion(uploads: list[dict], api_key: str, priority: int) -> str:
+    """Queue the processing of uploaded files into one new session; returns the session id
 
-    # Process document in background
-    async def process_in_background():
-        # Wait a bit for EventSource to connect before sending first message
-        await asyncio.sleep(0.5)
+    Files are processed concurrently (up to BULK_CONCURRENCY) into the session's shared indexes.
+    The session is ready once every file is done; it fails only if no file could be processed.
+    """
+    # Create session
+    session_id = str(uuid.uuid4())
 
+    # Create progress channel for this session (must be in async context)
+    # Messages are buffered until the EventSource connects
+    progress_bus.open(session_id)
+
+    # Process documents in background
+    async def process_in_background(job: Job):
         send_progress(session_id, "⏳ Starting document processing...", "starting")
+        job_start = time.perf_counter()
+        unfinished = len(uploads)
 
         try:
-            processor = DocumentProcessor(session_id)
+            processor = DocumentProcessor(session_id, cancel_event=job.cancel_event, label_progress=len(uploads) > 1)
+            semaphore = asyncio.Semaphore(BULK_CONCURRENCY)
 
-            # Run blocking document processing in thread pool to avoid blocking event loop
+            # Run blocking document processing on the ingestion pool to avoid blocking event loop
+            # (Docling itself runs in the conversion worker processes)
             # This allows SSE messages to be sent while Docling downloads models
             loop = asyncio.get_running_loop()
-            result = await loop.run_in_executor(
-                None,  # Use default ThreadPoolExecutor
-                processor.process_document,
-                tmp_file_path,
-                file_extension
-            )
 
-            # Store session with timestamp
+            async def process(upload: dict) -> dict:
+                async with semaphore:
+                    return await loop.run_in_executor(
+                        ingestion_executor,
+                        processor.process_document,
+                        upload["path"],
+                        upload["extension"],
+                        upload["content_hash"],
+                        upload["num_pages"],
+                        upload["filename"]
+                    )
+
+            results = await asyncio.gather(*(process(upload) for upload in uploads), return_exceptions=True)
+            failures = [(upload, result) for upload, result in zip(uploads, results) if isinstance(result, Exception)]
+            if any(isinstance(error, JobCancelled) for _, error in failures):
+                raise JobCancelled(f"Processing of session {session_id} was cancelled")
+            for result in results:
+                if not isinstance(result, Exception):
+                    documents_total.inc(result="cached" if result.get("cached") else "success")
+            documents_total.inc(len(failures), result="error")
+            unfinished = 0
+            if len(failures) == len(uploads):
+                raise failures[0][1]
+            for upload, error in failures:
+                detail = error.detail if isinstance(error, HTTPException) else str(error)
+                send_progress(
+                    session_id, f"❌ {upload['filename']}: {detail}", "document_error", filename=upload["filename"]
+                )
+
+            job.check_cancelled()  # cancelled after the last document finished
+
+            # Store session with timestamp, and share it with the other workers
+            await loop.run_in_executor(ingestion_executor, session_store.put, processor.to_record())
+            if job.cancelled:
+                # Cleared while the session was being stored
+                await loop.run_in_executor(ingestion_executor, session_store.delete, session_id)
+                job.check_cancelled()
+            now = time.time()
             sessions[session_id] = {
                 "processor": processor,
                 "api_key": api_key,
-                "filename": file.filename,
-                "timestamp": time.time()
+                "timestamp": now,
+                "last_access": now,
+                "touched": now,
+                "asks": 0  # questions in flight, which the reaper leaves alone
             }
+            print(
+                f"💾 Session {session_id}: {processor.memory_bytes / 1024 / 1024:.1f} MB "
+                f"({processor.memory_saved_bytes / 1024 / 1024:.1f} MB saved by compact storage)"
+            )
+            # Only announce completion once the session can answer questions
+            send_progress(
+                session_id, "✅ Ready! Ask your questions below.", "complete",
+                documents=[{"document_id": document.document_id, "filename": document.filename}
+                           for document in processor.documents.values()]
+            )
+            mark_startup("first_document")
+            request_seconds.observe(time.perf_counter() - job_start, pipeline="ingest")
+        except (asyncio.CancelledError, JobCancelled):
+            documents_total.inc(unfinished, result="cancelled")
+            send_progress(session_id, "🛑 Processing cancelled", "cancelled")
+            raise
         except Exception as e:
+            documents_total.inc(unfinished, result="error")
             send_progress(session_id, f"❌ Error: {str(e)}", "error")
-        finally:
-            # Clean up temp file
-            if os.path.exists(tmp_file_path):
-                os.unlink(tmp_file_path)
+            raise
+
+    def remove_temp_files():
+        # Clean up temp files
+        for upload in uploads:
+            remove_upload(upload["path"])
+
+    # Queue processing; refuse the upload if too many are already waiting
+    try:
+        ingestion_scheduler.submit(session_id, process_in_background, priority=priority, cleanup=remove_temp_files)
+    except QueueFullError as e:
+        progress_bus.close(session_id)
+        remove_temp_files()
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
+    return session_id
 
-    # Start processing in background
-    asyncio.create_task(process_in_background())
+
+@app.post("/upload")
+async def upload_document(request: Request):
+    """Upload and process a document (multipart form: file, api_key, priority)"""
+    fields, uploads = await receive_uploads(request, 1)
+    upload = uploads[0]
+    session_id = queue_ingestion(uploads, fields["api_key"], int(fields.get("priority", "0")))
 
     # Return immediately with session_id so frontend can connect to SSE
+    upload_bytes, upload_seconds = upload["bytes"], upload["upload_seconds"]
+    return {
+        "session_id": session_id,
+        "filename": upload["filename"],
+        "status": "processing",
+        "queue_position": ingestion_scheduler.position(session_id),
+        "bytes": upload_bytes,
+        "upload_seconds": round(upload_seconds, 4),
+        "throughput_mb_s": round(upload_bytes / (1024 * 1024) / upload_seconds, 2) if upload_seconds > 0 else None,
+        "content_hash": upload["content_hash"]
+    }
+
+
+@app.post("/upload/bulk")
+async def upload_documents(request: Request):
+    """Upload several documents into one session, processed concurrently into shared indexes
+
+    Multipart form: files (repeated), api_key, priority. Every file is validated before any is queued.
+    """
+    fields, uploads = await receive_uploads(request, MAX_BULK_FILES)
+    session_id = queue_ingestion(uploads, fields["api_key"], int(fields.get("priority", "0")))
+
+    # Document ids are assigned during processing and reported on the progress stream
+    return {
+        "session_id": session_id,
+        "status": "processing",
+        "queue_position": ingestion_scheduler.position(session_id),
+        "files": [
+            {"filename": upload["filename"], "bytes": upload["bytes"], "content_hash": upload["content_hash"]}
+            for upload in uploads
+        ],
+        "bytes": sum(upload["bytes"] for upload in uploads),
+        "upload_seconds": round(sum(upload["upload_seconds"] for upload in uploads), 4)
+    }
+
+
+@app.get("/api/documents/{session_id}")
+async def list_documents(session_id: str):
+    """List the documents of a processed session"""
+    session = await get_session(session_id)
+    processor = session["processor"]
     return {
         "session_id": session_id,
-        "filename": file.filename,
-        "status": "processing"
+        "documents": [asdict(document) for document in processor.documents.values()],
+        "memory_bytes": processor.memory_bytes,
+        "memory_saved_bytes": processor.memory_saved_bytes
     }
 
 
 @app.post("/ask")
 async def ask_question(
     session_id: str = Form(...),
-    question: str = Form(...)
+    question: str = Form(...),
+    document_ids: Optional[str] = Form(None),
+    api_key: Optional[str] = Form(None)
 ):
-    """Ask a question about the uploaded document with multilingual support"""
+    """Ask a question about the uploaded documents (all, or the comma-separated document_ids) with multilingual support"""
 
     # Get session
-    if session_id not in sessions:
-        raise HTTPException(status_code=404, detail="Session not found. Please upload a document first.")
-
-    session = sessions[session_id]
+    session = await get_session(session_id)
     processor = session["processor"]
-    api_key = session["api_key"]
+    api_key = question_api_key(session, api_key)
+    document_ids = parse_document_ids(processor, document_ids)
 
+    # Counted from here, so the reaper can't unload the session while the question waits for a slot
+    session["asks"] += 1
     try:
-        # Detect user's question language
-        user_language = detect_language(question)
-        document_language = processor.document_language
-
-        print(f"User question language: {user_language}, Document language: {document_language}")
-
-        # Translate question to document language if different
-        search_query = question
-        if user_language != document_language:
-            print(f"Translating question from {user_language} to {document_language}")
-            search_query = translate_text(question, user_language, document_language)
-            print(f"Translated query: {search_query}")
-
-        # Search for relevant chunks using translated query
-        context_chunks = processor.search_similar(search_query, top_k=3)
+        await acquire_ask_slot()
+    except BaseException:
+        session["asks"] -= 1
+        raise
+    ask_start = time.perf_counter()
+    result = "error"
+    try:
+        user_language, hits, retrieval = await retrieve_context(processor, question, document_ids)
+        context_chunks = [chunk for _, chunk in hits]
+        document_language = processor.languages(document_ids)[0]
 
         if not context_chunks:
             # Return "no info found" message in user's language
-            no_info_messages = {
-                'en': "No relevant information found in the document.",
-                'fr': "Aucune information pertinente trouvée dans le document.",
-                'pt': "Nenhuma informação relevante encontrada no documento."
-            }
+            result = "no_context"
             return {
-                "answer": no_info_messages.get(user_language, no_info_messages['en']),
-                "sources": []
+                "answer": NO_INFO_MESSAGES.get(user_language, NO_INFO_MESSAGES['en']),
+                "sources": [],
+                "source_documents": []
             }
 
-        # Generate answer with Gemini in user's language
-        # Pass the original question (not translated) so Gemini sees the user's language
-        answer = generate_answer(question, context_chunks, api_key, user_language)
-
+        # Same question on the same chunks: reuse the answer
+        answer = answer_cache.get_answer(retrieval) if retrieval else None
+        cached = answer is not None
+        saved_tokens = 0
+        if not cached:
+            # Generate answer with Gemini in user's language
+            # Pass the original question (not translated) so Gemini sees the user's language
+            prompt_chunks, saved_tokens = await assemble_context(processor, hits, document_ids)
+            try:
+                with timed("ask", "generate"):
+                    answer = await asyncio.wait_for(
+                        generate_answer(question, prompt_chunks, api_key, user_language),
+                        GENERATE_TIMEOUT
+                    )
+            except asyncio.TimeoutError:
+                result = "timeout"
+                raise HTTPException(status_code=504, detail="Answer generation timed out")
+            if retrieval:
+                answer_cache.put_answer(retrieval, answer)
+
+        result = "cached" if cached else "success"
+        mark_startup("first_answer")
         return {
             "answer": answer,
+            "cached": cached,
+            "context_tokens_saved": saved_tokens,
             "sources": context_chunks,
+            "source_documents": [chunk_document_id(chunk_id) for chunk_id, _ in hits],
             "user_language": user_language,
             "document_language": document_language
         }
 
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        ask_semaphore.release()
+        session["asks"] -= 1
+        questions_total.inc(endpoint="ask", result=result)
+        request_seconds.observe(time.perf_counter() - ask_start, pipeline="ask")
+
+
+@app.post("/ask/stream")
+async def ask_question_stream(
+    request: Request,
+    session_id: str = Form(...),
+    question: str = Form(...),
+    document_ids: Optional[str] = Form(None),
+    api_key: Optional[str] = Form(None)
+):
+    """Ask a question and stream the answer over Server-Sent Events.
+
+    Sends the retrieved sources first, then answer tokens as the LLM produces
+    them. Generation stops as soon as the client disconnects.
+    """
+    session = await get_session(session_id)
+    processor = session["processor"]
+    api_key = question_api_key(session, api_key)
+    document_ids = parse_document_ids(processor, document_ids)
+
+    session["asks"] += 1
+    try:
+        await acquire_ask_slot()
+    except BaseException:
+        session["asks"] -= 1
+        raise
+    ask_start = time.perf_counter()
+    released = False
+
+    def release_slot():
+        # Called from the generator and as a background task, whichever comes first:
+        # the generator never runs its finally block if the client leaves before the first byte
+        nonlocal released
+        if not released:
+            released = True
+            ask_semaphore.release()
+            session["asks"] -= 1
+
+    try:
+        user_language, hits, retrieval = await retrieve_context(processor, question, document_ids)
+    except HTTPException:
+        release_slot()
+        questions_total.inc(endpoint="ask_stream", result="error")
+        raise
     except Exception as e:
+        release_slot()
+        questions_total.inc(endpoint="ask_stream", result="error")
         raise HTTPException(status_code=500, detail=str(e))
 
+    context_chunks = [chunk for _, chunk in hits]
+    sources_event = {
+        'type': 'sources',
+        'sources': context_chunks,
+        'source_documents': [chunk_document_id(chunk_id) for chunk_id, _ in hits],
+        'user_language': user_language,
+        'document_language': processor.languages(document_ids)[0]
+    }
+
+    async def event_generator():
+        tokens = None
+        result = "error"
+        try:
+            yield f"data: {json.dumps(sources_event)}\n\n"
+
+            if not context_chunks:
+                no_info = NO_INFO_MESSAGES.get(user_language, NO_INFO_MESSAGES['en'])
+                yield f"data: {json.dumps({'type': 'token', 'text': no_info})}\n\n"
+                yield f"data: {json.dumps({'type': 'done'})}\n\n"
+                result = "no_context"
+                return
+
+            # Same question on the same chunks: send the cached answer as a single token
+            answer = answer_cache.get_answer(retrieval) if retrieval else None
+            if answer is not None:
+                yield f"data: {json.dumps({'type': 'token', 'text': answer})}\n\n"
+                yield f"data: {json.dumps({'type': 'done', 'cached': True})}\n\n"
+                result = "cached"
+                return
+
+            prompt_chunks, saved_tokens = await assemble_context(processor, hits, document_ids)
+            prompt = build_prompt(question, prompt_chunks, user_language)
+            tokens = llm.stream(prompt, api_key).__aiter__()
+            answer_parts = []
+            while True:
+                try:
+                    # Timeout applies between tokens, so long answers aren't cut off
+                    token = await asyncio.wait_for(tokens.__anext__(), GENERATE_TIMEOUT)
+                except StopAsyncIteration:
+                    break
+                if await request.is_disconnected():
+                    print(f"Client disconnected, stopping generation for session {session_id}")
+                    result = "disconnected"
+                    return
+                answer_parts.append(token)
+                yield f"data: {json.dumps({'type': 'token', 'text': token})}\n\n"
+
+            if retrieval:
+                answer_cache.put_answer(retrieval, "".join(answer_parts))
+            yield f"data: {json.dumps({'type': 'done', 'context_tokens_saved': saved_tokens})}\n\n"
+            result = "success"
+            mark_startup("first_answer")
+        except asyncio.CancelledError:
+            result = "disconnected"
+            raise
+        except asyncio.TimeoutError:
+            result = "timeout"
+            yield f"data: {json.dumps({'type': 'error', 'message': 'Answer generation timed out'})}\n\n"
+        except Exception as e:
+            yield f"data: {json.dumps({'type': 'error', 'message': f'Error generating answer: {str(e)}'})}\n\n"
+        finally:
+            # Runs on normal completion and when the response task is cancelled on disconnect
+            if tokens is not None:
+                await tokens.aclose()
+            release_slot()
+            questions_total.inc(endpoint="ask_stream", result=result)
+            request_seconds.observe(time.perf_counter() - ask_start, pipeline="ask_stream")
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+        },
+        background=BackgroundTask(release_slot)
+    )
+
 
 @app.post("/clear")
 async def clear_session(session_id: str = Form(...)):
     """Clear a session"""
-    if session_id in sessions:
-        # Get the processor to access ChromaDB collection
-        processor = sessions[session_id]["processor"]
+    # Stop the upload if it is still queued or being processed
+    cancelled = ingestion_scheduler.cancel(session_id)
+
+    # Remove the shared copy so no worker serves the session anymore (a cancelled upload
+    # may have stored it already)
+    stored = await asyncio.get_running_loop().run_in_executor(ask_io_executor, session_store.delete, session_id)
 
-        # Delete ChromaDB collection to prevent memory leak
+    loaded = session_id in sessions
+    if loaded:
+        # Release the vector store to prevent memory leak
         try:
-            collection_name = f"docs_{session_id}"
-            processor.chroma_client.delete_collection(collection_name)
+            unload_session(session_id, force=True)
         except Exception:
-            pass  # Collection might not exist if document wasn't processed
-
-        # Delete session
-        del sessions[session_id]
+            pass  # Store might not exist if document wasn't processed
+    if cancelled:
+        return {"status": "success", "message": "Processing cancelled"}
+    elif loaded or stored:
         return {"status": "success", "message": "Session cleared"}
     else:
         raise HTTPException(status_code=404, detail="Session not found")
@@ -634,6 +2203,8 @@ async def clear_session(session_id: str = Form(...)):
 # Mount static files (frontend)
 app.mount("/", StaticFiles(directory="../frontend", html=True), name="static")
 
+mark_startup("imported")
+
 
 if __name__ == "__main__":
     import uvicorn
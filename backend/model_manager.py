@@ -0,0 +1,252 @@
+"""Memory-budgeted registry of per-language embedding models.
+
+Models are loaded on first use and kept in LRU order. When the estimated
+memory of the loaded models exceeds the budget, or a model has not been used
+for `idle_ttl` seconds, the least recently used models are dropped and
+reloaded transparently the next time they are needed. Concurrent requests
+for a model that is still loading wait for that single load instead of
+starting their own.
+
+Embedding models can run as plain PyTorch, dynamically quantized int8
+PyTorch, or ONNX Runtime (needs `optimum[onnxruntime]`).
+"""
+import gc
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Callable
+
+import numpy as np
+
+from metrics import process_rss_bytes
+
+EMBEDDING_BACKENDS = ("torch", "int8", "onnx")
+
+
+@dataclass
+class LoadedModel:
+    lang: str
+    model_id: str
+    backend: str
+    model: object  # exposes encode(texts, batch_size=..., convert_to_numpy=True)
+    chunker: object
+    nbytes: int = 0
+    load_seconds: float = 0.0
+    loaded_at: float = field(default_factory=time.time)
+    last_used: float = field(default_factory=time.monotonic)
+    uses: int = 0
+
+
+class OnnxSentenceEncoder:
+    """Mean-pooled sentence embeddings from an ONNX Runtime export of a transformer"""
+
+    def __init__(self, model_id: str):
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+        from transformers import AutoTokenizer
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_id)
+        self.model = ORTModelForFeatureExtraction.from_pretrained(model_id, export=True)
+        self.max_length = min(self.tokenizer.model_max_length, 512)
+
+    def encode(self, texts: list[str], batch_size: int = 32, convert_to_numpy: bool = True, **kwargs) -> np.ndarray:
+        batches = []
+        for start in range(0, len(texts), batch_size):
+            inputs = self.tokenizer(
+                texts[start:start + batch_size], padding=True, truncation=True,
+                max_length=self.max_length, return_tensors="np"
+            )
+            hidden = self.model(**inputs).last_hidden_state
+            mask = inputs["attention_mask"][..., None].astype(np.float32)
+            batches.append((hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None))
+        return np.vstack(batches).astype(np.float32) if batches else np.zeros((0, 0), dtype=np.float32)
+
+
+def load_sentence_encoder(model_id: str, backend: str) -> tuple[object, str]:
+    """Load an embedding model with the requested backend; returns (model, backend actually used)"""
+    from sentence_transformers import SentenceTransformer
+
+    if backend == "onnx":
+        try:
+            return OnnxSentenceEncoder(model_id), "onnx"
+        except Exception as e:
+            print(f"✗ ONNX backend unavailable for {model_id} ({e}), falling back to torch")
+    model = SentenceTransformer(model_id, device="cpu")
+    if backend == "int8":
+        try:
+            import torch
+
+            # Linear layers hold nearly all the weights: int8 storage, ~4x smaller than float32
+            torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+            return model, "int8"
+        except Exception as e:
+            print(f"✗ int8 quantization failed for {model_id} ({e}), using float32 weights")
+    return model, "torch"
+
+
+def _tensor_bytes(value) -> int:
+    if isinstance(value, (tuple, list)):
+        return sum(_tensor_bytes(item) for item in value)
+    if hasattr(value, "numel") and hasattr(value, "element_size"):
+        return value.numel() * value.element_size()
+    return 0
+
+
+def estimate_model_bytes(model) -> int:
+    """Size of a PyTorch model's weights (including quantized packed weights), 0 if unknown"""
+    try:
+        return sum(_tensor_bytes(value) for value in model.state_dict().values())
+    except Exception:
+        return 0
+
+
+class ModelManager:
+    """Loads language models on demand and evicts idle ones to stay within a memory budget"""
+
+    def __init__(self, loader: Callable[[str], LoadedModel], budget_bytes: int = 0, idle_ttl: float = 0):
+        self.loader = loader
+        self.budget_bytes = budget_bytes  # 0 = unlimited
+        self.idle_ttl = idle_ttl  # 0 = never evict idle models
+        self._models: "OrderedDict[str, LoadedModel]" = OrderedDict()
+        self._loading: dict[str, Future] = {}
+        self._lock = threading.Lock()
+        # One load at a time keeps the RSS-based size estimate meaningful and caps peak memory
+        self._load_lock = threading.Lock()
+
+        self.loads = 0
+        self.evictions = 0
+        self.load_failures = 0
+
+        if idle_ttl > 0:
+            threading.Thread(target=self._reap_idle, name="model-reaper", daemon=True).start()
+
+    def is_loaded(self, lang: str) -> bool:
+        return lang in self._models
+
+    @property
+    def used_bytes(self) -> int:
+        return sum(entry.nbytes for entry in self._models.values())
+
+    def get(self, lang: str) -> LoadedModel:
+        """Return the loaded model for a language, loading it (once) if needed"""
+        with self._lock:
+            entry = self._models.get(lang)
+            if entry is not None:
+                self._touch(entry)
+                return entry
+            flight = self._loading.get(lang)
+            leader = flight is None
+            if leader:
+                flight = self._loading[lang] = Future()
+
+        if not leader:
+            entry = flight.result()
+            with self._lock:
+                self._touch(entry)
+            return entry
+
+        try:
+            entry = self._load(lang)
+        except BaseException as e:
+            with self._lock:
+                del self._loading[lang]
+                self.load_failures += 1
+            flight.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._loading[lang]
+            self._models[lang] = entry
+            self._touch(entry)
+            evicted = self._evict_over_budget(keep=lang)
+        flight.set_result(entry)
+        if evicted:
+            gc.collect()
+        return entry
+
+    def preload(self, lang: str) -> bool:
+        """Load a model ahead of time unless that would exceed the budget; returns whether it is loaded"""
+        if self.budget_bytes and self.used_bytes >= self.budget_bytes and not self.is_loaded(lang):
+            print(f"Skipping preload of {lang} model: memory budget in use")
+            return False
+        self.get(lang)
+        return True
+
+    def evict(self, lang: str) -> bool:
+        with self._lock:
+            evicted = self._evict(lang)
+        if evicted:
+            gc.collect()
+        return evicted
+
+    def _load(self, lang: str) -> LoadedModel:
+        with self._load_lock:
+            rss_before = process_rss_bytes()
+            start = time.perf_counter()
+            entry = self.loader(lang)
+            entry.load_seconds = time.perf_counter() - start
+            # Weight size when it can be measured, otherwise the resident memory the load added
+            entry.nbytes = estimate_model_bytes(entry.model) or max(0, process_rss_bytes() - rss_before)
+        self.loads += 1
+        return entry
+
+    def _touch(self, entry: LoadedModel):
+        entry.last_used = time.monotonic()
+        entry.uses += 1
+        if self._models.get(entry.lang) is entry:
+            self._models.move_to_end(entry.lang)
+
+    def _evict(self, lang: str) -> bool:
+        entry = self._models.pop(lang, None)
+        if entry is None:
+            return False
+        self.evictions += 1
+        print(f"♻️ Evicted {lang} model ({entry.nbytes / 1024 / 1024:.0f} MB, idle {time.monotonic() - entry.last_used:.0f}s)")
+        return True
+
+    def _evict_over_budget(self, keep: str) -> int:
+        evicted = 0
+        while self.budget_bytes and self.used_bytes > self.budget_bytes:
+            victim = next((lang for lang in self._models if lang != keep), None)
+            if victim is None:
+                break  # a single model larger than the budget stays loaded
+            self._evict(victim)
+            evicted += 1
+        return evicted
+
+    def _reap_idle(self):
+        while True:
+            time.sleep(max(1.0, self.idle_ttl / 4))
+            now = time.monotonic()
+            with self._lock:
+                idle = [lang for lang, entry in self._models.items() if now - entry.last_used > self.idle_ttl]
+                for lang in idle:
+                    self._evict(lang)
+            if idle:
+                gc.collect()
+
+    def status(self, lang: str) -> dict:
+        entry = self._models.get(lang)
+        if entry is None:
+            return {"loaded": False, "loading": lang in self._loading}
+        return {
+            "loaded": True,
+            "model_id": entry.model_id,
+            "backend": entry.backend,
+            "memory_bytes": entry.nbytes,
+            "load_seconds": round(entry.load_seconds, 3),
+            "idle_seconds": round(time.monotonic() - entry.last_used, 1),
+            "uses": entry.uses,
+        }
+
+    def stats(self) -> dict:
+        return {
+            "budget_bytes": self.budget_bytes,
+            "used_bytes": self.used_bytes,
+            "idle_ttl_seconds": self.idle_ttl,
+            "loaded": list(self._models),
+            "loads": self.loads,
+            "load_failures": self.load_failures,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,495 @@
+"""Progress channels between ingestion jobs and /api/progress streams.
+
+Every upload opens a channel named after its session. The ingestion job
+publishes events to it, from any thread. SSE streams follow it, possibly in
+a different worker process than the one running the job. Each channel keeps
+its latest `buffer_size` events, with ids, so streams that connect late or
+reconnect replay what they missed; consecutive updates of a high-frequency
+step (e.g. embedding progress) replace each other instead of piling up.
+
+Backends follow the session store:
+  - "memory": a ring buffer per channel in this process
+  - "sqlite": an event table polled by listeners, shared by workers on one host
+  - "redis": Redis streams (blocking XREAD, no polling)
+
+The SQLite and Redis backends never block the event loop or an ingestion
+thread: writes (open, publish, close) are queued on one bus thread, which
+applies them in order, and reads wait for that thread (or use the async
+Redis client), so they see every write queued before them.
+
+`ProgressHub` fans a channel out to any number of streams in one worker:
+one reader follows the bus per channel, and each stream only keeps its
+position in the reader's buffer. While a worker has streams on a channel it
+records that on the bus every few seconds, so any worker can tell whether
+an upload is still followed somewhere.
+"""
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Optional
+
+# Steps after which a channel gets no more events
+TERMINAL_STEPS = frozenset({"complete", "error", "cancelled"})
+# Steps published many times in a row; only the latest event of a run is kept
+COALESCED_STEPS = frozenset({"queued", "converting", "embedding"})
+
+
+def coalesces(previous: dict, event: dict) -> bool:
+    """Whether `event` supersedes `previous`, the last event of its channel"""
+    return (
+        event.get("step") in COALESCED_STEPS
+        and previous.get("step") == event.get("step")
+        and previous.get("document_id") == event.get("document_id")
+    )
+
+
+def event_key(event_id: Optional[str]) -> tuple[int, ...]:
+    """Sort key of an event id ("12", or "1700000000000-3" for Redis); () sorts before every event"""
+    try:
+        return tuple(int(part) for part in event_id.split("-")) if event_id else ()
+    except ValueError:
+        return ()
+
+
+def _report_error(future: Future):
+    if future.exception() is not None:
+        print(f"Error writing progress: {future.exception()}")
+
+
+class ProgressBus:
+    """Interface shared by all progress bus backends"""
+
+    def open(self, channel: str):
+        """Create a channel; events are buffered until they are read"""
+        raise NotImplementedError
+
+    def publish(self, channel: str, event: dict):
+        """Append an event to an open channel (safe to call from any thread, never blocks);
+        unknown channels are ignored"""
+        raise NotImplementedError
+
+    async def exists(self, channel: str) -> bool:
+        raise NotImplementedError
+
+    def mark_followed(self, channel: str):
+        """Record that a stream follows the channel now"""
+        raise NotImplementedError
+
+    async def followed_at(self, channel: str) -> float:
+        """Unix time a stream last followed the channel, on any worker (0 if never)"""
+        raise NotImplementedError
+
+    async def listen(self, channel: str, timeout: float) -> AsyncIterator[Optional[tuple[str, dict]]]:
+        """Yield the buffered and new (event id, event) pairs in order, and None whenever
+        `timeout` seconds pass without one. Stops once the channel has been closed."""
+        raise NotImplementedError
+        yield
+
+    def close(self, channel: str):
+        """Delete a channel and its buffered events"""
+        raise NotImplementedError
+
+    def stale(self, opened_before: float) -> list[str]:
+        """Channels opened before the given unix time (uploads nobody followed to the end)"""
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+
+class _ThreadedProgressBus(ProgressBus):
+    """Base of the backends doing blocking I/O, which runs on a single bus thread"""
+
+    def __init__(self):
+        # One thread, so the events of a channel are written in order
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="progress-bus")
+
+    def _submit(self, func: Callable, *args):
+        """Queue a write and return at once"""
+        self._executor.submit(func, *args).add_done_callback(_report_error)
+
+    async def _run(self, func: Callable, *args):
+        """Wait for a read, after the writes queued before it"""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+
+class _LocalChannel:
+    __slots__ = ("events", "last_id", "opened", "followed", "changed")
+
+    def __init__(self, buffer_size: int):
+        self.events: deque[tuple[int, dict]] = deque(maxlen=buffer_size)
+        self.last_id = 0
+        self.opened = time.time()
+        self.followed = 0.0
+        self.changed = asyncio.Event()  # replaced by a new one after every event
+
+
+class LocalProgressBus(ProgressBus):
+    """A ring buffer of events per channel, for a single worker process"""
+
+    def __init__(self, buffer_size: int = 256):
+        self.buffer_size = buffer_size
+        self._channels: dict[str, _LocalChannel] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def open(self, channel: str):
+        self._loop = asyncio.get_running_loop()
+        self._channels[channel] = _LocalChannel(self.buffer_size)
+
+    def publish(self, channel: str, event: dict):
+        if channel not in self._channels:
+            return
+        try:
+            on_loop = asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            on_loop = False
+        if on_loop:
+            self._append(channel, event)
+        else:
+            # asyncio events are not thread-safe: hand the event over to the event loop
+            self._loop.call_soon_threadsafe(self._append, channel, event)
+
+    def _append(self, channel: str, event: dict):
+        state = self._channels.get(channel)
+        if state is None:
+            return
+        if state.events and coalesces(state.events[-1][1], event):
+            state.events.pop()
+        state.last_id += 1
+        state.events.append((state.last_id, event))
+        state.changed.set()
+        state.changed = asyncio.Event()
+
+    async def exists(self, channel: str) -> bool:
+        return channel in self._channels
+
+    def mark_followed(self, channel: str):
+        state = self._channels.get(channel)
+        if state is not None:
+            state.followed = time.time()
+
+    async def followed_at(self, channel: str) -> float:
+        state = self._channels.get(channel)
+        return state.followed if state else 0.0
+
+    async def listen(self, channel: str, timeout: float) -> AsyncIterator[Optional[tuple[str, dict]]]:
+        cursor = 0
+        while True:
+            state = self._channels.get(channel)
+            if state is None:
+                return
+            newer = [(event_id, event) for event_id, event in state.events if event_id > cursor]
+            for cursor, event in newer:
+                yield str(cursor), event
+            if newer:
+                continue
+            try:
+                await asyncio.wait_for(state.changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                if channel not in self._channels:
+                    return
+                yield None
+
+    def close(self, channel: str):
+        state = self._channels.pop(channel, None)
+        if state is not None:
+            state.changed.set()  # wake up listeners so they stop
+
+    def stale(self, opened_before: float) -> list[str]:
+        return [channel for channel, state in list(self._channels.items()) if state.opened < opened_before]
+
+    def __len__(self) -> int:
+        return len(self._channels)
+
+
+class SQLiteProgressBus(_ThreadedProgressBus):
+    """Events in a SQLite table; listeners poll for rows newer than the last one they saw"""
+
+    def __init__(self, path: str, poll_interval: float = 0.1, buffer_size: int = 256):
+        super().__init__()
+        self.poll_interval = poll_interval
+        self.buffer_size = buffer_size
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS progress_channels (channel TEXT PRIMARY KEY, opened_at REAL)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS progress_events ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, channel TEXT, event TEXT)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS progress_events_channel ON progress_events (channel, id)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS progress_followers (channel TEXT PRIMARY KEY, followed_at REAL)"
+        )
+        self._db.commit()
+
+    def _execute(self, sql: str, params: tuple = ()) -> list:
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+            self._db.commit()
+        return rows
+
+    def open(self, channel: str):
+        self._submit(
+            self._execute, "INSERT OR IGNORE INTO progress_channels VALUES (?, ?)", (channel, time.time())
+        )
+
+    def publish(self, channel: str, event: dict):
+        self._submit(self._publish, channel, event)
+
+    def _publish(self, channel: str, event: dict):
+        with self._lock:
+            if not self._db.execute("SELECT 1 FROM progress_channels WHERE channel = ?", (channel,)).fetchone():
+                return
+            last = self._db.execute(
+                "SELECT id, event FROM progress_events WHERE channel = ? ORDER BY id DESC LIMIT 1", (channel,)
+            ).fetchone()
+            if last and coalesces(json.loads(last[1]), event):
+                self._db.execute("DELETE FROM progress_events WHERE id = ?", (last[0],))
+            self._db.execute("INSERT INTO progress_events (channel, event) VALUES (?, ?)", (channel, json.dumps(event)))
+            # Keep the latest buffer_size events of the channel
+            self._db.execute(
+                "DELETE FROM progress_events WHERE channel = ? AND id < ("
+                "SELECT id FROM progress_events WHERE channel = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                (channel, channel, self.buffer_size - 1)
+            )
+            self._db.commit()
+
+    def _exists(self, channel: str) -> bool:
+        return bool(self._execute("SELECT 1 FROM progress_channels WHERE channel = ?", (channel,)))
+
+    async def exists(self, channel: str) -> bool:
+        return await self._run(self._exists, channel)
+
+    def mark_followed(self, channel: str):
+        self._submit(
+            self._execute, "INSERT OR REPLACE INTO progress_followers VALUES (?, ?)", (channel, time.time())
+        )
+
+    async def followed_at(self, channel: str) -> float:
+        rows = await self._run(
+            self._execute, "SELECT followed_at FROM progress_followers WHERE channel = ?", (channel,)
+        )
+        return rows[0][0] if rows else 0.0
+
+    async def listen(self, channel: str, timeout: float) -> AsyncIterator[Optional[tuple[str, dict]]]:
+        last_id = 0
+        idle = 0.0
+        while True:
+            rows = await self._run(
+                self._execute,
+                "SELECT id, event FROM progress_events WHERE channel = ? AND id > ? ORDER BY id",
+                (channel, last_id)
+            )
+            for last_id, event in rows:
+                yield str(last_id), json.loads(event)
+            if rows:
+                idle = 0.0
+                continue
+            await asyncio.sleep(self.poll_interval)
+            idle += self.poll_interval
+            if idle >= timeout:
+                idle = 0.0
+                if not await self.exists(channel):
+                    return
+                yield None
+
+    def close(self, channel: str):
+        self._submit(self._close, channel)
+
+    def _close(self, channel: str):
+        self._execute("DELETE FROM progress_events WHERE channel = ?", (channel,))
+        self._execute("DELETE FROM progress_channels WHERE channel = ?", (channel,))
+        self._execute("DELETE FROM progress_followers WHERE channel = ?", (channel,))
+
+    def stale(self, opened_before: float) -> list[str]:
+        return [row[0] for row in self._execute(
+            "SELECT channel FROM progress_channels WHERE opened_at < ?", (opened_before,)
+        )]
+
+    def __len__(self) -> int:
+        return self._execute("SELECT COUNT(*) FROM progress_channels")[0][0]
+
+
+class RedisProgressBus(_ThreadedProgressBus):
+    """One Redis stream per channel, read with blocking XREAD"""
+
+    def __init__(self, url: str, prefix: str = "docling-rag:progress:", ttl: int = 3600, buffer_size: int = 256):
+        super().__init__()
+        import redis
+        import redis.asyncio
+
+        self.prefix = prefix
+        self.ttl = ttl  # channels of abandoned uploads expire on their own
+        self.buffer_size = buffer_size
+        self._redis = redis.Redis.from_url(url)
+        self._async_redis = redis.asyncio.Redis.from_url(url)
+
+    def _keys(self, channel: str) -> tuple[str, str, str]:
+        return self.prefix + channel + ":open", self.prefix + channel, self.prefix + channel + ":followed"
+
+    def open(self, channel: str):
+        marker, _, _ = self._keys(channel)
+        self._submit(lambda: self._redis.set(marker, 1, ex=self.ttl))
+
+    def publish(self, channel: str, event: dict):
+        self._submit(self._publish, channel, event)
+
+    def _publish(self, channel: str, event: dict):
+        marker, stream, _ = self._keys(channel)
+        if not self._redis.exists(marker):
+            return
+        last = self._redis.xrevrange(stream, count=1)
+        pipe = self._redis.pipeline()
+        if last and coalesces(json.loads(last[0][1][b"event"]), event):
+            pipe.xdel(stream, last[0][0])
+        pipe.xadd(stream, {"event": json.dumps(event)}, maxlen=self.buffer_size, approximate=True)
+        pipe.expire(stream, self.ttl)
+        pipe.execute()
+
+    async def exists(self, channel: str) -> bool:
+        marker, _, _ = self._keys(channel)
+        # On the bus thread, after an open still queued there
+        return bool(await self._run(self._redis.exists, marker))
+
+    def mark_followed(self, channel: str):
+        _, _, followed = self._keys(channel)
+        self._submit(lambda: self._redis.set(followed, time.time(), ex=self.ttl))
+
+    async def followed_at(self, channel: str) -> float:
+        _, _, followed = self._keys(channel)
+        value = await self._async_redis.get(followed)
+        return float(value) if value else 0.0
+
+    async def listen(self, channel: str, timeout: float) -> AsyncIterator[Optional[tuple[str, dict]]]:
+        _, stream, _ = self._keys(channel)
+        last_id = "0-0"
+        while True:
+            response = await self._async_redis.xread({stream: last_id}, count=100, block=int(timeout * 1000))
+            if not response:
+                if not await self._async_redis.exists(self._keys(channel)[0]):
+                    return
+                yield None
+                continue
+            for last_id, fields in response[0][1]:
+                yield last_id.decode(), json.loads(fields[b"event"])
+
+    def close(self, channel: str):
+        self._submit(self._redis.delete, *self._keys(channel))
+
+    def stale(self, opened_before: float) -> list[str]:
+        return []  # channels expire on their own after `ttl` seconds
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self._redis.scan_iter(match=self.prefix + "*:open"))
+
+
+class _Feed:
+    """Events of one channel read by a ProgressHub, and the streams following them"""
+    __slots__ = ("events", "changed", "subscribers", "done", "task", "heartbeat")
+
+    def __init__(self, buffer_size: int):
+        self.events: deque[tuple[tuple[int, ...], str, dict]] = deque(maxlen=buffer_size)  # (key, id, event)
+        self.changed = asyncio.Event()  # replaced by a new one after every event
+        self.subscribers = 0
+        self.done = False  # the channel ended (terminal event) or was closed
+        self.task: Optional[asyncio.Task] = None
+        self.heartbeat: Optional[asyncio.Task] = None
+
+    def notify(self):
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+
+class ProgressHub:
+    """Fans each channel of a bus out to any number of streams in this worker"""
+
+    def __init__(self, bus: ProgressBus, buffer_size: int = 256, heartbeat: float = 10.0):
+        self.bus = bus
+        self.buffer_size = buffer_size
+        self.heartbeat = heartbeat  # seconds between the marks of a followed channel on the bus
+        self._feeds: dict[str, _Feed] = {}
+
+    def subscribers(self, channel: Optional[str] = None) -> int:
+        """Streams following a channel (all channels by default)"""
+        if channel is not None:
+            feed = self._feeds.get(channel)
+            return feed.subscribers if feed else 0
+        return sum(feed.subscribers for feed in list(self._feeds.values()))
+
+    async def subscribe(self, channel: str, last_event_id: Optional[str] = None,
+                        keepalive: float = 15.0) -> AsyncIterator[Optional[tuple[str, dict]]]:
+        """Yield the (event id, event) pairs after `last_event_id`, and None every `keepalive` seconds
+        without one. Stops after a terminal event, or once the channel is closed."""
+        feed = self._feeds.get(channel)
+        if feed is None:
+            feed = self._feeds[channel] = _Feed(self.buffer_size)
+            feed.task = asyncio.create_task(self._read(channel, feed))
+            feed.heartbeat = asyncio.create_task(self._mark_followed(channel))
+        feed.subscribers += 1
+        cursor = event_key(last_event_id)
+        try:
+            while True:
+                changed = feed.changed
+                newer = [(key, event_id, event) for key, event_id, event in feed.events if key > cursor]
+                for cursor, event_id, event in newer:
+                    yield event_id, event
+                    if event.get("step") in TERMINAL_STEPS:
+                        return
+                if newer:
+                    continue
+                if feed.done:
+                    return
+                try:
+                    await asyncio.wait_for(changed.wait(), keepalive)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            feed.subscribers -= 1
+            if feed.subscribers == 0 and self._feeds.get(channel) is feed:
+                # Nobody follows the channel here anymore; a new stream starts over from the bus buffer
+                del self._feeds[channel]
+                feed.task.cancel()
+                feed.heartbeat.cancel()
+                self.bus.mark_followed(channel)  # the time the last stream here left
+
+    async def _mark_followed(self, channel: str):
+        while True:
+            self.bus.mark_followed(channel)
+            await asyncio.sleep(self.heartbeat)
+
+    async def _read(self, channel: str, feed: _Feed):
+        """Follow a channel on the bus until its terminal event, or until it is closed"""
+        try:
+            async for item in self.bus.listen(channel, timeout=60.0):
+                if item is None:
+                    continue
+                event_id, event = item
+                if feed.events and coalesces(feed.events[-1][2], event):
+                    feed.events.pop()
+                feed.events.append((event_key(event_id), event_id, event))
+                feed.notify()
+                if event.get("step") in TERMINAL_STEPS:
+                    break
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Error reading progress channel {channel}: {e}")
+        finally:
+            feed.done = True
+            feed.notify()
+
+
+def create_progress_bus(backend: str, path: str = "", url: str = "", buffer_size: int = 256) -> ProgressBus:
+    """Progress bus matching a session store backend"""
+    if backend == "memory":
+        return LocalProgressBus(buffer_size)
+    if backend in ("sqlite", "disk"):
+        return SQLiteProgressBus(path, buffer_size=buffer_size)
+    if backend == "redis":
+        return RedisProgressBus(url, buffer_size=buffer_size)
+    raise ValueError(f"Unknown progress bus backend: {backend}")
@@ -0,0 +1,232 @@
+"""Bounded scheduler for document ingestion jobs.
+
+A fixed number of worker slots run ingestion jobs; everything else waits in
+a bounded priority queue. When the queue is full new jobs are refused, so a
+burst of uploads turns into 429 responses instead of unbounded parallel
+Docling conversions. Queued jobs are told their position and estimated wait
+through a callback every time the queue moves.
+"""
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from typing import Awaitable, Callable, Optional
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity"""
+
+
+class JobCancelled(Exception):
+    """Raised inside a job that noticed its cancellation flag"""
+
+
+class Job:
+    """One queued or running ingestion job"""
+
+    def __init__(self, job_id: str, func: Callable[["Job"], Awaitable], priority: int,
+                 cleanup: Optional[Callable[[], None]]):
+        self.id = job_id
+        self.func = func
+        self.priority = priority
+        self.cleanup = cleanup
+        # Checked by blocking code running in threads, which can't be interrupted by task.cancel()
+        self.cancel_event = threading.Event()
+        self.enqueued_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def check_cancelled(self):
+        if self.cancel_event.is_set():
+            raise JobCancelled(f"Job {self.id} was cancelled")
+
+
+class IngestionScheduler:
+    """Runs at most `workers` jobs at once with a bounded priority queue behind them"""
+
+    def __init__(self, workers: int, max_queue: int,
+                 on_queue_update: Optional[Callable[[Job, int, float], None]] = None,
+                 on_cancel: Optional[Callable[[Job], None]] = None):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.on_queue_update = on_queue_update
+        # Queued jobs never run, so they can't report their own cancellation
+        self.on_cancel = on_cancel
+        self._heap: list[tuple[int, int, Job]] = []
+        self._seq = itertools.count()
+        self._jobs: dict[str, Job] = {}
+        self._wakeup: Optional[asyncio.Condition] = None
+        self._worker_tasks: list[asyncio.Task] = []
+        self._wake_tasks: set[asyncio.Task] = set()  # held so they aren't garbage collected mid-flight
+
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self._wait_times: list[float] = []  # most recent queue waits, seconds
+        self._avg_duration: Optional[float] = None  # moving average of job run time
+
+    async def start(self):
+        if self._worker_tasks:
+            return
+        self._wakeup = asyncio.Condition()
+        self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._worker_tasks + list(self._wake_tasks):
+            task.cancel()
+        self._worker_tasks = []
+
+    @property
+    def queued(self) -> int:
+        return len(self._heap)
+
+    @property
+    def running(self) -> int:
+        return sum(1 for job in self._jobs.values() if job.started_at is not None)
+
+    def submit(self, job_id: str, func: Callable[[Job], Awaitable], priority: int = 0,
+               cleanup: Optional[Callable[[], None]] = None) -> Job:
+        """Queue a job; higher priority runs first. Raises QueueFullError when at capacity."""
+        if len(self._heap) >= self.max_queue:
+            self.rejected += 1
+            raise QueueFullError(f"Ingestion queue is full ({self.max_queue} jobs waiting)")
+
+        job = Job(job_id, func, priority, cleanup)
+        self._jobs[job_id] = job
+        heapq.heappush(self._heap, (-priority, next(self._seq), job))
+        self.submitted += 1
+        self._notify_positions()
+        wake = asyncio.create_task(self._wake())
+        self._wake_tasks.add(wake)
+        wake.add_done_callback(self._wake_tasks.discard)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def position(self, job_id: str) -> int:
+        """1-based queue position of a waiting job, 0 if it is running, about to start or unknown"""
+        for job, position in self._waiting():
+            if job.id == job_id:
+                return position
+        return 0
+
+    def _waiting(self) -> list[tuple[Job, int]]:
+        """Queued jobs that have to wait for a busy worker, with their 1-based position"""
+        # The first jobs of the heap are taken by idle workers as soon as they wake up
+        idle = max(0, self.workers - self.running)
+        return [(job, position) for position, (_, _, job) in enumerate(sorted(self._heap)[idle:], start=1)]
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job. Returns False if the job is unknown or finished.
+
+        A running job only stops at its next check of the cancellation flag, and keeps
+        its worker slot until then, so the work it left in threads or processes still
+        counts against `workers`.
+        """
+        job = self._jobs.get(job_id)
+        if job is None:
+            return False
+        job.cancel_event.set()
+        if job.started_at is None:
+            # Still queued: drop it from the heap and release its resources now
+            self._heap = [entry for entry in self._heap if entry[2] is not job]
+            heapq.heapify(self._heap)
+            self._finish(job)
+            self.cancelled += 1
+            if self.on_cancel:
+                self.on_cancel(job)
+            self._notify_positions()
+        return True
+
+    def estimated_wait(self, position: int) -> float:
+        """Seconds until the job at `position` (1-based) should start"""
+        if self._avg_duration is None:
+            return 0.0
+        rounds = (position - 1) // self.workers + (1 if self.running >= self.workers else 0)
+        return rounds * self._avg_duration
+
+    async def _wake(self):
+        async with self._wakeup:
+            self._wakeup.notify()
+
+    async def _worker(self):
+        while True:
+            async with self._wakeup:
+                await self._wakeup.wait_for(lambda: self._heap)
+                _, _, job = heapq.heappop(self._heap)
+
+            if job.cancelled:
+                continue
+            job.started_at = time.monotonic()
+            self._record_wait(job.started_at - job.enqueued_at)
+            self._notify_positions()
+
+            job.task = asyncio.create_task(job.func(job))
+            try:
+                await job.task
+                self.completed += 1
+            except JobCancelled:
+                self.cancelled += 1
+            except asyncio.CancelledError:
+                self.cancelled += 1
+                raise  # the scheduler is stopping
+            except Exception as e:
+                self.failed += 1
+                print(f"Ingestion job {job.id} failed: {e}")
+            finally:
+                self._record_duration(time.monotonic() - job.started_at)
+                self._finish(job)
+
+    def _finish(self, job: Job):
+        self._jobs.pop(job.id, None)
+        if job.cleanup:
+            try:
+                job.cleanup()
+            except Exception as e:
+                print(f"Error cleaning up ingestion job {job.id}: {e}")
+
+    def _notify_positions(self):
+        if not self.on_queue_update:
+            return
+        for job, position in self._waiting():
+            self.on_queue_update(job, position, self.estimated_wait(position))
+
+    def _record_wait(self, seconds: float):
+        self._wait_times.append(seconds)
+        del self._wait_times[:-1000]
+
+    def _record_duration(self, seconds: float):
+        if self._avg_duration is None:
+            self._avg_duration = seconds
+        else:
+            self._avg_duration = 0.8 * self._avg_duration + 0.2 * seconds
+
+    def stats(self) -> dict:
+        waits = sorted(self._wait_times)
+
+        def pct(p: float) -> float:
+            return waits[min(len(waits) - 1, int(p * len(waits)))] if waits else 0.0
+
+        return {
+            "workers": self.workers,
+            "running": self.running,
+            "queued": self.queued,
+            "max_queue": self.max_queue,
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            "completed": self.completed,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "wait_seconds_avg": sum(waits) / len(waits) if waits else 0.0,
+            "wait_seconds_p50": pct(0.5),
+            "wait_seconds_p95": pct(0.95),
+            "job_seconds_avg": self._avg_duration or 0.0,
+        }
@@ -0,0 +1,455 @@
+"""Session state that can be shared between API worker processes.
+
+A `SessionRecord` holds everything needed to answer questions about the
+documents uploaded to a session: their metadata, and the chunk texts and
+embeddings of each language index (one per embedding model). Each worker
+keeps live `DocumentProcessor`s in its own memory. With a shared store, a
+worker that receives a request for a session it has never seen rebuilds
+the processor from the stored record.
+
+Backends:
+  - "memory": records live in this process only (single worker)
+  - "sqlite": one SQLite file, shared by every worker on the host
+  - "redis": any Redis-compatible server (needs the `redis` package)
+  - "disk": one snapshot directory per session, shared by every worker on
+    the host and kept across restarts; arrays are memory-mapped when a
+    session is first used, so nothing is read at startup
+"""
+import io
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from typing import Optional, Sequence
+
+import numpy as np
+
+from vector_store import ChunkTexts
+
+
+@dataclass(slots=True)
+class SessionDocument:
+    """One file uploaded to a session"""
+    document_id: str
+    filename: str
+    language: str = "en"
+    content_hash: Optional[str] = None
+    embedding_model_id: Optional[str] = None
+    num_chunks: int = 0
+    content_length: int = 0
+
+
+@dataclass
+class SessionRecord:
+    # No API key: records are shared in plain text, so clients send theirs with every question
+    session_id: str
+    documents: list[SessionDocument]
+    # Per language index, in the same order: chunk ids, their source document ids, texts and embeddings
+    # (in the vector store dtype; texts and rows may share their memory with the live vector store)
+    chunk_ids: dict[str, list[str]]
+    chunk_documents: dict[str, list[str]]
+    chunks: dict[str, Sequence[str]]
+    embeddings: dict[str, np.ndarray]
+    created_at: float = field(default_factory=time.time)
+    last_access: float = field(default_factory=time.time)
+    # Per language index, BM25Index.state() so it need not be rebuilt (only the disk backend keeps it)
+    lexical: dict[str, dict] = field(default_factory=dict)
+    # Per language index with int8 embeddings: their per-row scales, and the rows kept for rescoring
+    scales: dict[str, np.ndarray] = field(default_factory=dict)
+    rescore: dict[str, np.ndarray] = field(default_factory=dict)
+
+    def meta(self) -> dict:
+        return {
+            "documents": [asdict(document) for document in self.documents],
+            "chunk_ids": self.chunk_ids,
+            "chunk_documents": self.chunk_documents,
+            "created_at": self.created_at,
+            "last_access": self.last_access,
+        }
+
+    def texts(self) -> dict[str, list[str]]:
+        """Chunk texts as JSON-able lists"""
+        return {index: list(chunks) for index, chunks in self.chunks.items()}
+
+    @classmethod
+    def from_parts(cls, session_id: str, meta: dict, chunks: dict[str, Sequence[str]],
+                   embeddings: dict[str, np.ndarray], lexical: Optional[dict[str, dict]] = None,
+                   scales: Optional[dict[str, np.ndarray]] = None,
+                   rescore: Optional[dict[str, np.ndarray]] = None) -> "SessionRecord":
+        meta = {**meta, "documents": [SessionDocument(**document) for document in meta["documents"]]}
+        meta.pop("api_key", None)  # written by older versions
+        return cls(
+            session_id=session_id, chunks=chunks, embeddings=embeddings, lexical=lexical or {},
+            scales=scales or {}, rescore=rescore or {}, **meta
+        )
+
+
+def _arrays_to_bytes(record: SessionRecord) -> bytes:
+    """Embeddings, int8 scales and rescoring rows of every index, in one .npz"""
+    arrays = {**record.embeddings}
+    arrays.update((f"{index}.scales", scales) for index, scales in record.scales.items())
+    arrays.update((f"{index}.rescore", rows) for index, rows in record.rescore.items())
+    buffer = io.BytesIO()
+    np.savez(buffer, **{name: np.ascontiguousarray(array) for name, array in arrays.items()})
+    return buffer.getvalue()
+
+
+def _arrays_from_bytes(data: bytes) -> tuple[dict[str, np.ndarray], dict[str, np.ndarray], dict[str, np.ndarray]]:
+    """(embeddings, scales, rescoring rows) by index"""
+    embeddings, scales, rescore = {}, {}, {}
+    with np.load(io.BytesIO(data), allow_pickle=False) as arrays:
+        for name in arrays.files:
+            index, _, kind = name.rpartition(".")
+            if kind == "scales":
+                scales[index] = arrays[name]
+            elif kind == "rescore":
+                rescore[index] = arrays[name]
+            else:
+                embeddings[name] = arrays[name]
+    return embeddings, scales, rescore
+
+
+class SessionStore:
+    """Interface shared by all session store backends"""
+
+    # Whether other processes see the records (if not, only this worker can serve its sessions)
+    shared = False
+
+    def put(self, record: SessionRecord):
+        raise NotImplementedError
+
+    def get(self, session_id: str) -> Optional[SessionRecord]:
+        raise NotImplementedError
+
+    def exists(self, session_id: str) -> bool:
+        raise NotImplementedError
+
+    def delete(self, session_id: str) -> bool:
+        """Remove a session; returns whether it existed"""
+        raise NotImplementedError
+
+    def ids(self) -> list[str]:
+        raise NotImplementedError
+
+    def touch(self, session_id: str, when: Optional[float] = None):
+        """Record that a session was used (for TTL and LRU expiry)"""
+        raise NotImplementedError
+
+    def access_times(self) -> dict[str, float]:
+        """Last access time of every stored session"""
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        return len(self.ids())
+
+
+class MemorySessionStore(SessionStore):
+    """Records kept in this process; they share their arrays and packed texts with the live processors"""
+
+    def __init__(self):
+        self._records: dict[str, SessionRecord] = {}
+
+    def put(self, record: SessionRecord):
+        self._records[record.session_id] = record
+
+    def get(self, session_id: str) -> Optional[SessionRecord]:
+        return self._records.get(session_id)
+
+    def exists(self, session_id: str) -> bool:
+        return session_id in self._records
+
+    def delete(self, session_id: str) -> bool:
+        return self._records.pop(session_id, None) is not None
+
+    def ids(self) -> list[str]:
+        return list(self._records)
+
+    def touch(self, session_id: str, when: Optional[float] = None):
+        record = self._records.get(session_id)
+        if record is not None:
+            record.last_access = when or time.time()
+
+    def access_times(self) -> dict[str, float]:
+        return {session_id: record.last_access for session_id, record in list(self._records.items())}
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+
+class SQLiteSessionStore(SessionStore):
+    """Sessions in a SQLite database file (WAL mode, safe for several processes)"""
+
+    shared = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, meta TEXT, chunks TEXT, embeddings BLOB, created_at REAL, last_access REAL)"
+        )
+        self._db.commit()
+
+    def put(self, record: SessionRecord):
+        row = (
+            record.session_id,
+            json.dumps(record.meta()),
+            json.dumps(record.texts()),
+            _arrays_to_bytes(record),
+            record.created_at,
+            record.last_access,
+        )
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?, ?)", row)
+            self._db.commit()
+
+    def get(self, session_id: str) -> Optional[SessionRecord]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT meta, chunks, embeddings, last_access FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        meta, chunks, embeddings, last_access = row
+        meta = {**json.loads(meta), "last_access": last_access}
+        embeddings, scales, rescore = _arrays_from_bytes(embeddings)
+        return SessionRecord.from_parts(session_id, meta, json.loads(chunks), embeddings, scales=scales, rescore=rescore)
+
+    def exists(self, session_id: str) -> bool:
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM sessions WHERE session_id = ?", (session_id,)).fetchone() is not None
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            cursor = self._db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            self._db.commit()
+        return cursor.rowcount > 0
+
+    def ids(self) -> list[str]:
+        with self._lock:
+            return [row[0] for row in self._db.execute("SELECT session_id FROM sessions")]
+
+    def touch(self, session_id: str, when: Optional[float] = None):
+        with self._lock:
+            self._db.execute(
+                "UPDATE sessions SET last_access = MAX(last_access, ?) WHERE session_id = ?",
+                (when or time.time(), session_id)
+            )
+            self._db.commit()
+
+    def access_times(self) -> dict[str, float]:
+        with self._lock:
+            return dict(self._db.execute("SELECT session_id, last_access FROM sessions").fetchall())
+
+
+class RedisSessionStore(SessionStore):
+    """Sessions as Redis hashes: meta, chunks and embeddings fields under one key"""
+
+    shared = True
+
+    def __init__(self, url: str, prefix: str = "docling-rag:session:"):
+        import redis
+
+        self.prefix = prefix
+        self._redis = redis.Redis.from_url(url)
+
+    def _key(self, session_id: str) -> str:
+        return self.prefix + session_id
+
+    def put(self, record: SessionRecord):
+        self._redis.hset(self._key(record.session_id), mapping={
+            "meta": json.dumps(record.meta()),
+            "chunks": json.dumps(record.texts()),
+            "embeddings": _arrays_to_bytes(record),
+            "last_access": record.last_access,
+        })
+
+    def get(self, session_id: str) -> Optional[SessionRecord]:
+        fields = self._redis.hgetall(self._key(session_id))
+        if not fields:
+            return None
+        embeddings, scales, rescore = _arrays_from_bytes(fields[b"embeddings"])
+        return SessionRecord.from_parts(
+            session_id,
+            {**json.loads(fields[b"meta"]), "last_access": float(fields[b"last_access"])},
+            json.loads(fields[b"chunks"]),
+            embeddings,
+            scales=scales,
+            rescore=rescore,
+        )
+
+    def exists(self, session_id: str) -> bool:
+        return bool(self._redis.exists(self._key(session_id)))
+
+    def delete(self, session_id: str) -> bool:
+        return bool(self._redis.delete(self._key(session_id)))
+
+    def ids(self) -> list[str]:
+        return [key.decode()[len(self.prefix):] for key in self._redis.scan_iter(match=self.prefix + "*")]
+
+    def touch(self, session_id: str, when: Optional[float] = None):
+        key = self._key(session_id)
+        if self._redis.exists(key):
+            self._redis.hset(key, "last_access", when or time.time())
+
+    def access_times(self) -> dict[str, float]:
+        keys = list(self._redis.scan_iter(match=self.prefix + "*"))
+        pipe = self._redis.pipeline()
+        for key in keys:
+            pipe.hget(key, "last_access")
+        return {
+            key.decode()[len(self.prefix):]: float(value)
+            for key, value in zip(keys, pipe.execute()) if value is not None
+        }
+
+
+class DiskSessionStore(SessionStore):
+    """Session snapshots on disk, one directory each:
+
+        meta.json                        documents, chunk ids and owners, BM25 vocabularies
+        <index>.embeddings.npy           normalized embedding matrix, in the vector store dtype
+        <index>.scales.npy               per-row scales of an int8 matrix
+        <index>.rescore.npy              float16/float32 rows an int8 index rescores its candidates with
+        <index>.texts.npy                chunk texts back to back (UTF-8 bytes)
+        <index>.offsets.npy              start of each text in the blob, plus the end
+        <index>.bm25.<array>.npy         BM25 postings and statistics
+
+    Snapshots are written to a temporary directory and renamed into place.
+    get() memory-maps the arrays, so pages are read when a session is queried;
+    the mtime of meta.json is the session's last access time.
+    """
+
+    shared = True
+
+    def __init__(self, directory: str, leftover_ttl: float = 3600):
+        self.directory = directory
+        self.leftover_ttl = leftover_ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, session_id: str, name: str = "") -> str:
+        return os.path.join(self.directory, session_id, name)
+
+    def put(self, record: SessionRecord):
+        tmp_dir = os.path.join(self.directory, f".tmp-{uuid.uuid4().hex}")
+        os.makedirs(tmp_dir)
+        try:
+            meta = {**record.meta(), "lexical": {}}
+            for index, chunks in record.chunks.items():
+                texts = chunks if isinstance(chunks, ChunkTexts) else ChunkTexts.pack(chunks)
+                np.save(os.path.join(tmp_dir, f"{index}.embeddings.npy"), np.ascontiguousarray(record.embeddings[index]))
+                np.save(os.path.join(tmp_dir, f"{index}.texts.npy"), texts.blob)
+                np.save(os.path.join(tmp_dir, f"{index}.offsets.npy"), texts.offsets)
+                for kind, arrays in (("scales", record.scales), ("rescore", record.rescore)):
+                    if index in arrays:
+                        np.save(os.path.join(tmp_dir, f"{index}.{kind}.npy"), np.ascontiguousarray(arrays[index]))
+            for index, state in record.lexical.items():
+                meta["lexical"][index] = {name: value for name, value in state.items() if name != "arrays"}
+                for name, array in state["arrays"].items():
+                    np.save(os.path.join(tmp_dir, f"{index}.bm25.{name}.npy"), np.ascontiguousarray(array))
+            with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+                json.dump(meta, f)
+            os.utime(os.path.join(tmp_dir, "meta.json"), (record.last_access, record.last_access))
+            # Replace an older snapshot of the same session, if any
+            target = self._path(record.session_id)
+            if os.path.exists(target):
+                old = os.path.join(self.directory, f".tmp-{uuid.uuid4().hex}")
+                os.rename(target, old)
+                shutil.rmtree(old, ignore_errors=True)
+            os.rename(tmp_dir, target)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+    def _load(self, path: str) -> np.ndarray:
+        try:
+            return np.load(path, mmap_mode="r")
+        except ValueError:
+            return np.load(path)  # Empty arrays cannot be memory-mapped
+
+    def get(self, session_id: str) -> Optional[SessionRecord]:
+        try:
+            with open(self._path(session_id, "meta.json")) as f:
+                meta = json.load(f)
+            last_access = os.path.getmtime(self._path(session_id, "meta.json"))
+            chunks, embeddings, lexical, scales, rescore = {}, {}, {}, {}, {}
+            names = set(os.listdir(self._path(session_id)))
+            for index in meta["chunk_ids"]:
+                embeddings[index] = self._load(self._path(session_id, f"{index}.embeddings.npy"))
+                for kind, arrays in (("scales", scales), ("rescore", rescore)):
+                    if f"{index}.{kind}.npy" in names:
+                        arrays[index] = self._load(self._path(session_id, f"{index}.{kind}.npy"))
+                chunks[index] = ChunkTexts(
+                    self._load(self._path(session_id, f"{index}.texts.npy")),
+                    self._load(self._path(session_id, f"{index}.offsets.npy"))
+                )
+            for index, state in meta.pop("lexical").items():
+                prefix = f"{index}.bm25."
+                arrays = {
+                    name[len(prefix):-len(".npy")]: self._load(self._path(session_id, name))
+                    for name in names if name.startswith(prefix)
+                }
+                lexical[index] = {**state, "arrays": arrays}
+        except FileNotFoundError:
+            return None  # Never stored, or deleted concurrently
+        return SessionRecord.from_parts(
+            session_id, {**meta, "last_access": last_access}, chunks, embeddings, lexical, scales, rescore
+        )
+
+    def exists(self, session_id: str) -> bool:
+        return os.path.exists(self._path(session_id, "meta.json"))
+
+    def delete(self, session_id: str) -> bool:
+        target = self._path(session_id)
+        if not os.path.exists(target):
+            return False
+        # Rename first so readers never see a half-deleted snapshot; open memory maps stay valid
+        old = os.path.join(self.directory, f".tmp-{uuid.uuid4().hex}")
+        try:
+            os.rename(target, old)
+        except FileNotFoundError:
+            return False
+        shutil.rmtree(old, ignore_errors=True)
+        return True
+
+    def ids(self) -> list[str]:
+        return [name for name in os.listdir(self.directory) if not name.startswith(".")]
+
+    def touch(self, session_id: str, when: Optional[float] = None):
+        when = when or time.time()
+        try:
+            if os.path.getmtime(self._path(session_id, "meta.json")) < when:
+                os.utime(self._path(session_id, "meta.json"), (when, when))
+        except FileNotFoundError:
+            pass
+
+    def access_times(self) -> dict[str, float]:
+        times = {}
+        now = time.time()
+        for name in os.listdir(self.directory):
+            try:
+                if not name.startswith("."):
+                    times[name] = os.path.getmtime(self._path(name, "meta.json"))
+                elif now - os.path.getmtime(os.path.join(self.directory, name)) > self.leftover_ttl:
+                    # Snapshot of a worker that died while writing it
+                    shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+            except FileNotFoundError:
+                pass  # Being written or deleted
+        return times
+
+
+def create_session_store(backend: str, path: str = "", url: str = "", directory: str = "") -> SessionStore:
+    if backend == "memory":
+        return MemorySessionStore()
+    if backend == "sqlite":
+        return SQLiteSessionStore(path)
+    if backend == "redis":
+        return RedisSessionStore(url)
+    if backend == "disk":
+        return DiskSessionStore(directory)
+    raise ValueError(f"Unknown session store backend: {backend}")
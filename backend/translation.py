@@ -0,0 +1,224 @@
+"""Query translation and language identification with caching.
+
+Questions are normalized (Unicode form, case, whitespace, trailing
+punctuation) before lookup, so repeated and near-identical questions hit the
+cache instead of making a network round trip. Translations are kept in an
+in-memory LRU backed by an optional SQLite file shared across restarts.
+The translation backend is pluggable: Google (network), Argos (offline,
+optional dependency) or identity (no-op, for tests and benchmarks).
+"""
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Optional
+
+from langdetect import DetectorFactory, LangDetectException, detect
+
+# langdetect is random unless seeded; a fixed seed makes detection deterministic
+DetectorFactory.seed = 0
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form of a question used as cache key"""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return _WHITESPACE.sub(" ", text).strip().rstrip("?!.;: ").strip()
+
+
+class GoogleBackend:
+    """Google Translate through deep-translator (network)"""
+
+    def translate_batch(self, texts: list[str], source: str, target: str) -> list[str]:
+        from deep_translator import GoogleTranslator
+
+        translator = GoogleTranslator(source=source, target=target)
+        if len(texts) == 1:
+            return [translator.translate(texts[0])]
+        return translator.translate_batch(texts)
+
+
+class ArgosBackend:
+    """Offline translation with Argos Translate (requires the argostranslate package and language packs)"""
+
+    def __init__(self):
+        import argostranslate.translate  # noqa: F401  fail early if not installed
+
+    def translate_batch(self, texts: list[str], source: str, target: str) -> list[str]:
+        import argostranslate.translate
+
+        return [argostranslate.translate.translate(text, source, target) for text in texts]
+
+
+class IdentityBackend:
+    """Returns texts unchanged; stands in for a translator in tests and benchmarks"""
+
+    def translate_batch(self, texts: list[str], source: str, target: str) -> list[str]:
+        return list(texts)
+
+
+def create_translation_backend(name: str):
+    if name == "google":
+        return GoogleBackend()
+    if name == "argos":
+        return ArgosBackend()
+    if name == "identity":
+        return IdentityBackend()
+    raise ValueError(f"Unknown translator backend: {name}")
+
+
+class TranslationCache:
+    """LRU of translations with optional SQLite persistence"""
+
+    def __init__(self, max_entries: int, path: Optional[str] = None):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple[str, str, str], str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS translations ("
+                "source TEXT, target TEXT, text TEXT, translation TEXT, "
+                "PRIMARY KEY (source, target, text))"
+            )
+            self._db.commit()
+
+    def get(self, key: tuple[str, str, str]) -> Optional[str]:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            if self._db is None:
+                return None
+            row = self._db.execute(
+                "SELECT translation FROM translations WHERE source = ? AND target = ? AND text = ?", key
+            ).fetchone()
+            if row is None:
+                return None
+            self._remember(key, row[0])
+            return row[0]
+
+    def put_many(self, items: list[tuple[tuple[str, str, str], str]]):
+        with self._lock:
+            for key, translation in items:
+                self._remember(key, translation)
+            if self._db is not None and items:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?)",
+                    [(*key, translation) for key, translation in items]
+                )
+                self._db.commit()
+
+    def _remember(self, key: tuple[str, str, str], translation: str):
+        self._entries[key] = translation
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class Translator:
+    """Cached, batched translation on top of a pluggable backend"""
+
+    def __init__(self, backend, cache: TranslationCache):
+        self.backend = backend
+        self.cache = cache
+        self.hits = 0
+        self.misses = 0
+        self.backend_calls = 0
+
+    def translate(self, text: str, source: str, target: str) -> str:
+        return self.translate_batch([text], source, target)[0]
+
+    def translate_batch(self, texts: list[str], source: str, target: str) -> list[str]:
+        """Translate many strings, sending only uncached ones to the backend in a single call"""
+        if source == target:
+            return list(texts)
+
+        results: list[Optional[str]] = [None] * len(texts)
+        pending: dict[str, list[int]] = {}  # normalized text -> positions still to translate
+        for i, text in enumerate(texts):
+            normalized = normalize_text(text)
+            if not normalized:
+                results[i] = text
+                continue
+            cached = self.cache.get((source, target, normalized))
+            if cached is not None:
+                self.hits += 1
+                results[i] = cached
+            else:
+                self.misses += 1
+                pending.setdefault(normalized, []).append(i)
+
+        if pending:
+            # Translate the first original spelling of each normalized text
+            originals = [texts[positions[0]].strip() for positions in pending.values()]
+            try:
+                self.backend_calls += 1
+                translations = self.backend.translate_batch(originals, source, target)
+            except Exception as e:
+                print(f"Translation error: {e}")
+                translations = None  # Fall back to original texts, and don't cache the failure
+
+            if translations is not None:
+                self.cache.put_many([
+                    ((source, target, normalized), translation)
+                    for normalized, translation in zip(pending, translations)
+                    if translation
+                ])
+            for n, positions in enumerate(pending.values()):
+                translated = translations[n] if translations is not None else None
+                for i in positions:
+                    results[i] = translated or texts[i]
+
+        return results
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "backend_calls": self.backend_calls,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "cached_entries": len(self.cache),
+        }
+
+
+class LanguageIdentifier:
+    """Deterministic langdetect wrapper with an LRU cache on normalized text"""
+
+    def __init__(self, supported: set[str], default: str = "en", max_entries: int = 10000):
+        self.supported = supported
+        self.default = default
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def detect(self, text: str) -> str:
+        """Return the ISO 639-1 code of a supported language, or the default"""
+        key = normalize_text(text)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        try:
+            lang = detect(text)
+            # If detected language not supported, use the default
+            if lang not in self.supported:
+                lang = self.default
+        except LangDetectException:
+            # If detection fails, use the default
+            lang = self.default
+
+        with self._lock:
+            self._entries[key] = lang
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return lang
@@ -0,0 +1,440 @@
+"""Vector stores holding the chunk embeddings of a session.
+
+Documents are capped at a few hundred chunks, so an exact search over one
+contiguous matrix is both faster and lighter than building an HNSW index.
+`NumpyVectorStore` is the default; `ChromaVectorStore` keeps the previous
+ChromaDB behaviour available as a selectable backend.
+
+Chunks carry metadata naming their source document (and its language), so a
+session holding several documents can search all of them or a subset.
+
+To keep many sessions per node, `NumpyVectorStore` stores rows as float32,
+float16 or int8 (scalar-quantized per row, queried with a float32 query), and
+chunk texts as UTF-8 in one contiguous buffer instead of a list of strings.
+An int8 store can also keep float16 (or float32) copies of its rows, which
+may stay memory-mapped on disk, to re-rank its best candidates exactly.
+"""
+import threading
+from typing import Collection, Optional, Sequence
+
+import numpy as np
+
+# Memory of a Python str beyond its characters, plus its pointer in a list (for memory_saved reports)
+STR_OVERHEAD_BYTES = 57
+# Rows converted to float32 at a time when scoring a float16 or int8 matrix
+SCORE_BLOCK_ROWS = 8192
+
+
+class ChunkTexts(Sequence[str]):
+    """Texts stored back to back in one UTF-8 buffer; each one is decoded when it is read.
+
+    The buffer and offsets may be read-only memory maps; appending copies them into
+    growable arrays first.
+    """
+
+    __slots__ = ("_blob", "_offsets", "_count", "_used")
+
+    def __init__(self, blob: Optional[np.ndarray] = None, offsets: Optional[np.ndarray] = None):
+        self._blob = blob if blob is not None else np.zeros(0, dtype=np.uint8)
+        self._offsets = offsets if offsets is not None else np.zeros(1, dtype=np.int64)
+        self._count = len(self._offsets) - 1  # texts stored
+        self._used = int(self._offsets[self._count])  # bytes of the buffer in use
+
+    @classmethod
+    def pack(cls, texts: Sequence[str]) -> "ChunkTexts":
+        packed = cls()
+        packed.extend(texts)
+        return packed
+
+    def extend(self, texts: Sequence[str]):
+        encoded = [text.encode("utf-8") for text in texts]
+        size = sum(len(data) for data in encoded)
+        if self._used + size > len(self._blob) or not self._blob.flags.writeable:
+            blob = np.empty(max(self._used + size, 2 * len(self._blob)), dtype=np.uint8)
+            blob[:self._used] = self._blob[:self._used]
+            self._blob = blob
+        if self._count + len(encoded) + 1 > len(self._offsets) or not self._offsets.flags.writeable:
+            offsets = np.empty(max(self._count + len(encoded) + 1, 2 * len(self._offsets)), dtype=np.int64)
+            offsets[:self._count + 1] = self._offsets[:self._count + 1]
+            self._offsets = offsets
+        for data in encoded:
+            self._blob[self._used:self._used + len(data)] = np.frombuffer(data, dtype=np.uint8)
+            self._used += len(data)
+            self._count += 1
+            self._offsets[self._count] = self._used
+
+    @property
+    def blob(self) -> np.ndarray:
+        return self._blob[:self._used]
+
+    @property
+    def offsets(self) -> np.ndarray:
+        """Start of each text in the blob, followed by the end of the last one"""
+        return self._offsets[:self._count + 1]
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._count))]
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError("chunk text index out of range")
+        return self._blob[self._offsets[i]:self._offsets[i + 1]].tobytes().decode("utf-8")
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def nbytes(self) -> int:
+        return self._blob.nbytes + self._offsets.nbytes
+
+
+class VectorStore:
+    """Interface shared by all vector store backends"""
+
+    def add(self, ids: list[str], embeddings: np.ndarray, documents: list[str], metadata: Optional[dict] = None):
+        """Append embeddings and their chunk texts; `metadata` (e.g. the source document_id) applies to all of them"""
+        raise NotImplementedError
+
+    def query(self, embedding: np.ndarray, top_k: int,
+              document_ids: Optional[Collection[str]] = None) -> list[tuple[str, str, float]]:
+        """Return (id, document, cosine similarity) for the top_k closest chunks, best first,
+        only among chunks whose metadata document_id is in `document_ids` if given"""
+        raise NotImplementedError
+
+    def get_documents(self, ids: list[str]) -> list[str]:
+        """Return the chunk texts of the given ids, in the same order"""
+        raise NotImplementedError
+
+    def export(self) -> tuple[list[str], np.ndarray, Sequence[str], list[dict]]:
+        """Return (ids, embeddings, documents, metadatas) so the store can be persisted and rebuilt elsewhere"""
+        raise NotImplementedError
+
+    def vectors(self) -> np.ndarray:
+        """The stored embeddings as float32, in export() order"""
+        return np.asarray(self.export()[1], dtype=np.float32)
+
+    def delete(self):
+        """Release all data held by the store"""
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory used by the stored vectors and chunk texts"""
+        return 0
+
+    @property
+    def baseline_nbytes(self) -> int:
+        """Memory the same chunks would use as float32 vectors and a list of str"""
+        return self.nbytes
+
+
+class NumpyVectorStore(VectorStore):
+    """Exact cosine search over one contiguous matrix of L2-normalized embeddings
+
+    With dtype int8 each row is scaled so its largest component maps to 127 and
+    keeps that scale; the query stays float32 and scores are rescaled per row,
+    so ranking only loses the rounding of the stored rows. With a `rescore_dtype`
+    an int8 store also keeps the rows in that dtype, and re-ranks the best
+    top_k * `oversample` int8 candidates of a query with them.
+    """
+
+    def __init__(self, dtype=np.float32, rescore_dtype=None, oversample: int = 4):
+        self.dtype = np.dtype(dtype)
+        self.rescore_dtype = np.dtype(rescore_dtype) if rescore_dtype and self.dtype == np.int8 else None
+        self.oversample = max(1, oversample)
+        self._matrix: Optional[np.ndarray] = None  # capacity x dim, first _size rows used
+        self._scales = np.zeros(0, dtype=np.float32)  # int8 only: per-row dequantization factor
+        self._rescore: Optional[np.ndarray] = None  # same rows in rescore_dtype, when kept
+        self._size = 0
+        self.ids: list[str] = []
+        self.documents = ChunkTexts()
+        self._positions: dict[str, int] = {}
+        # Metadata is stored once per document run; each row keeps the index of its run's metadata
+        self._metadatas: list[dict] = []
+        self._groups = np.zeros(0, dtype=np.int32)
+
+    def _encode(self, vectors: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Rows in the store dtype, and their int8 scales"""
+        if self.dtype != np.int8:
+            return vectors.astype(self.dtype, copy=False), np.ones(len(vectors), dtype=np.float32)
+        scales = np.abs(vectors).max(axis=1) / 127
+        scales[scales == 0] = 1.0
+        return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+    def add(self, ids: list[str], embeddings: np.ndarray, documents: list[str], metadata: Optional[dict] = None):
+        vectors = _normalize(np.asarray(embeddings, dtype=np.float32))
+        if len(vectors) == 0:
+            return
+        rows, scales = self._encode(vectors)
+        self._reserve(self._size + len(rows), rows.shape[1])
+        self._matrix[self._size:self._size + len(rows)] = rows
+        self._scales[self._size:self._size + len(rows)] = scales
+        if self._rescore is not None:
+            self._rescore[self._size:self._size + len(rows)] = vectors
+        # Batches of the same document share one metadata entry
+        if not self._metadatas or self._metadatas[-1] != (metadata or {}):
+            self._metadatas.append(metadata or {})
+        self._groups[self._size:self._size + len(rows)] = len(self._metadatas) - 1
+        self._positions.update((chunk_id, self._size + i) for i, chunk_id in enumerate(ids))
+        self._size += len(rows)
+        self.ids.extend(ids)
+        self.documents.extend(documents)
+
+    def attach(self, ids: list[str], matrix: np.ndarray, documents: Sequence[str],
+               metadatas: list[dict], groups: np.ndarray, scales: Optional[np.ndarray] = None,
+               rescore: Optional[np.ndarray] = None):
+        """Use exported rows as they are, without copying: `matrix`, its int8 `scales` and the
+        `rescore` rows may be read-only memory maps, and `documents` a ChunkTexts over memory-mapped
+        arrays. Each row's metadata is metadatas[groups[row]].
+
+        Only valid on an empty store; a later add() copies the rows into new, writable arrays.
+        Rows are copied right away if they must be converted to the store dtype.
+        """
+        if matrix.dtype == self.dtype and (self.dtype != np.int8 or scales is not None):
+            self._matrix = matrix
+            self._scales = scales if scales is not None else np.ones(len(matrix), dtype=np.float32)
+        else:
+            vectors = np.asarray(matrix, dtype=np.float32)
+            if matrix.dtype == np.int8 and scales is not None:
+                vectors = vectors * scales[:, None]
+            self._matrix, self._scales = self._encode(_normalize(vectors))
+        self._rescore = None
+        if self.rescore_dtype is not None:
+            if rescore is not None:
+                self._rescore = rescore if rescore.dtype == self.rescore_dtype else rescore.astype(self.rescore_dtype)
+            elif matrix.dtype != np.int8:
+                self._rescore = matrix.astype(self.rescore_dtype)
+            # int8 rows alone have nothing more precise to rescore with
+        self._size = len(matrix)
+        self._groups = np.asarray(groups, dtype=np.int32)
+        self._metadatas = list(metadatas)
+        self.ids = list(ids)
+        self.documents = documents if isinstance(documents, ChunkTexts) else ChunkTexts.pack(documents)
+        self._positions = {chunk_id: i for i, chunk_id in enumerate(ids)}
+
+    def _reserve(self, rows: int, dim: int):
+        """Grow the matrix geometrically so incremental adds stay amortized O(1)"""
+        if self._matrix is None:
+            self._matrix = np.empty((rows, dim), dtype=self.dtype)
+            self._scales = np.empty(rows, dtype=np.float32)
+            self._groups = np.empty(rows, dtype=np.int32)
+            if self.rescore_dtype is not None:
+                self._rescore = np.empty((rows, dim), dtype=self.rescore_dtype)
+        elif rows > len(self._matrix):
+            capacity = max(rows, 2 * len(self._matrix))
+            grown = np.empty((capacity, dim), dtype=self.dtype)
+            grown[:self._size] = self._matrix[:self._size]
+            self._matrix = grown
+            if self._rescore is not None:
+                rescore = np.empty((capacity, dim), dtype=self.rescore_dtype)
+                rescore[:self._size] = self._rescore[:self._size]
+                self._rescore = rescore
+            for name, dtype in (("_scales", np.float32), ("_groups", np.int32)):
+                column = np.empty(capacity, dtype=dtype)
+                column[:self._size] = getattr(self, name)[:self._size]
+                setattr(self, name, column)
+
+    @property
+    def matrix(self) -> np.ndarray:
+        if self._matrix is None:
+            return np.zeros((0, 0), dtype=self.dtype)
+        return self._matrix[:self._size]
+
+    @property
+    def scales(self) -> Optional[np.ndarray]:
+        """Per-row dequantization factors of an int8 matrix"""
+        return self._scales[:self._size] if self.dtype == np.int8 and self._matrix is not None else None
+
+    @property
+    def rescore_rows(self) -> Optional[np.ndarray]:
+        """The rows in rescore_dtype, if the store keeps them"""
+        return self._rescore[:self._size] if self._rescore is not None else None
+
+    def vectors(self) -> np.ndarray:
+        """The rows as float32: the rescoring rows if kept, else the stored rows (dequantized for int8)"""
+        if self._rescore is not None:
+            return self.rescore_rows.astype(np.float32)
+        if self.dtype != np.int8:
+            return self.matrix.astype(np.float32, copy=False)
+        return self.matrix.astype(np.float32) * self._scales[:self._size, None]
+
+    def _scores(self, query: np.ndarray) -> np.ndarray:
+        if self.dtype == np.float32:
+            return self.matrix @ query
+        # Convert a block at a time so a query never holds a float32 copy of the whole matrix
+        scores = np.empty(self._size, dtype=np.float32)
+        for start in range(0, self._size, SCORE_BLOCK_ROWS):
+            end = min(start + SCORE_BLOCK_ROWS, self._size)
+            scores[start:end] = self._matrix[start:end].astype(np.float32) @ query
+        if self.dtype == np.int8:
+            scores *= self._scales[:self._size]
+        return scores
+
+    def query(self, embedding: np.ndarray, top_k: int,
+              document_ids: Optional[Collection[str]] = None) -> list[tuple[str, str, float]]:
+        if self._size == 0 or top_k <= 0:
+            return []
+        query = _normalize(np.asarray(embedding, dtype=np.float32).reshape(1, -1))[0]
+        scores = self._scores(query)
+
+        if document_ids is not None:
+            candidates = np.flatnonzero(np.isin(self._groups[:self._size], self._groups_of(document_ids)))
+        else:
+            candidates = np.arange(self._size)
+        if self._rescore is not None:
+            # Re-rank the best int8 candidates with the more precise rows (only those rows are read)
+            pool = top_k * self.oversample
+            if pool < len(candidates):
+                candidates = candidates[np.argpartition(-scores[candidates], pool)[:pool]]
+            scores[candidates] = self._rescore[candidates].astype(np.float32) @ query
+        if top_k < len(candidates):
+            candidates = candidates[np.argpartition(-scores[candidates], top_k)[:top_k]]
+        top = candidates[np.argsort(-scores[candidates])]
+        return [(self.ids[i], self.documents[i], float(scores[i])) for i in top]
+
+    def _groups_of(self, document_ids: Collection[str]) -> list[int]:
+        return [group for group, metadata in enumerate(self._metadatas) if metadata.get("document_id") in document_ids]
+
+    def get_documents(self, ids: list[str]) -> list[str]:
+        return [self.documents[self._positions[chunk_id]] for chunk_id in ids]
+
+    def export(self) -> tuple[list[str], np.ndarray, Sequence[str], list[dict]]:
+        """Rows in the store dtype (see `scales` and `rescore_rows`) and the packed chunk texts,
+        sharing their memory with the store; attach() takes them back as they are"""
+        metadatas = [self._metadatas[group] for group in self._groups[:self._size]]
+        # A view over the same buffers: the store can still append to its own texts
+        documents = ChunkTexts(self.documents.blob, self.documents.offsets)
+        return list(self.ids), self.matrix, documents, metadatas
+
+    def delete(self):
+        self._matrix = None
+        self._scales = np.zeros(0, dtype=np.float32)
+        self._rescore = None
+        self._size = 0
+        self.ids = []
+        self.documents = ChunkTexts()
+        self._positions = {}
+        self._metadatas = []
+        self._groups = np.zeros(0, dtype=np.int32)
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def nbytes(self) -> int:
+        if self._matrix is None:
+            return 0
+        nbytes = self._matrix.nbytes + self._scales.nbytes + self._groups.nbytes + self.documents.nbytes
+        # Memory-mapped rescoring rows stay on disk: a query only reads those of its candidates
+        if self._rescore is not None and not isinstance(self._rescore, np.memmap):
+            nbytes += self._rescore.nbytes
+        return nbytes
+
+    @property
+    def baseline_nbytes(self) -> int:
+        if self._matrix is None:
+            return 0
+        vectors = self._size * self._matrix.shape[1] * 4
+        texts = len(self.documents.blob) + STR_OVERHEAD_BYTES * len(self.documents)
+        return vectors + self._groups.nbytes + texts
+
+
+# One ChromaDB client shared by every session instead of one client per upload
+_chroma_client = None
+_chroma_lock = threading.Lock()
+
+
+def _get_chroma_client():
+    global _chroma_client
+    with _chroma_lock:
+        if _chroma_client is None:
+            import chromadb
+            from chromadb.config import Settings
+
+            _chroma_client = chromadb.Client(Settings(
+                anonymized_telemetry=False,
+                allow_reset=True
+            ))
+        return _chroma_client
+
+
+class ChromaVectorStore(VectorStore):
+    """Per-session collection in an in-memory ChromaDB (HNSW index)"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._nbytes = 0  # float32 vectors and texts added, as an estimate of the collection's memory
+        self.collection = _get_chroma_client().create_collection(
+            name=name,
+            metadata={"hnsw:space": "cosine"}
+        )
+
+    def add(self, ids: list[str], embeddings: np.ndarray, documents: list[str], metadata: Optional[dict] = None):
+        self.collection.add(
+            embeddings=np.asarray(embeddings, dtype=np.float32).tolist(),
+            documents=documents,
+            metadatas=[metadata] * len(ids) if metadata else None,
+            ids=ids
+        )
+        self._nbytes += np.asarray(embeddings, dtype=np.float32).nbytes + sum(len(text) for text in documents)
+
+    def query(self, embedding: np.ndarray, top_k: int,
+              document_ids: Optional[Collection[str]] = None) -> list[tuple[str, str, float]]:
+        results = self.collection.query(
+            query_embeddings=[np.asarray(embedding, dtype=np.float32).tolist()],
+            n_results=top_k,
+            where={"document_id": {"$in": list(document_ids)}} if document_ids is not None else None
+        )
+        if not results['documents']:
+            return []
+        return [
+            (chunk_id, document, 1.0 - distance)
+            for chunk_id, document, distance in zip(
+                results['ids'][0], results['documents'][0], results['distances'][0]
+            )
+        ]
+
+    def get_documents(self, ids: list[str]) -> list[str]:
+        results = self.collection.get(ids=ids, include=["documents"])
+        documents = dict(zip(results["ids"], results["documents"]))
+        return [documents[chunk_id] for chunk_id in ids]
+
+    def export(self) -> tuple[list[str], np.ndarray, list[str], list[dict]]:
+        results = self.collection.get(include=["embeddings", "documents", "metadatas"])
+        metadatas = [metadata or {} for metadata in results["metadatas"]]
+        return results["ids"], np.asarray(results["embeddings"], dtype=np.float32), results["documents"], metadatas
+
+    def delete(self):
+        try:
+            _get_chroma_client().delete_collection(self.name)
+        except Exception:
+            pass  # Collection already gone
+        self._nbytes = 0
+
+    def __len__(self) -> int:
+        return self.collection.count()
+
+    @property
+    def nbytes(self) -> int:
+        return self._nbytes
+
+
+def create_vector_store(backend: str, name: str, dtype: str = "float32", rescore_dtype: Optional[str] = None,
+                        oversample: int = 4) -> VectorStore:
+    """Build a vector store for a session; rescoring rows ("none" = off) only apply to int8 numpy stores"""
+    if backend == "numpy":
+        rescore_dtype = None if rescore_dtype in (None, "", "none") else np.dtype(rescore_dtype)
+        return NumpyVectorStore(dtype=np.dtype(dtype), rescore_dtype=rescore_dtype, oversample=oversample)
+    if backend == "chroma":
+        return ChromaVectorStore(name)
+    raise ValueError(f"Unknown vector store backend: {backend}")
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
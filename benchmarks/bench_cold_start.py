@@ -0,0 +1,139 @@
+"""Cold-start benchmark: time to first healthy, ready and answered request.
+
+Usage (from the repository root):
+    python benchmarks/bench_cold_start.py --runs 3 --env PRELOAD_LANGUAGES=en
+
+Each run starts a fresh `uvicorn main:app` process (fake LLM, identity
+translator, caches off) and measures from the moment it is spawned:
+  - time_to_live: first 200 from /api/live
+  - time_to_first_answer: an upload sent as soon as the server is live,
+    followed by a question, answered (this includes any lazy model loading)
+  - time_to_ready: first 200 from /api/ready
+The server's own milestones (seconds since its process started, from
+/api/ready) are included for comparison. Output is JSON.
+Requires httpx (`pip install -r benchmarks/requirements.txt`).
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(BENCH_DIR, "..", "backend")
+
+sys.path.insert(0, BENCH_DIR)
+from synthetic_docs import generate_document  # noqa: E402
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for(client, path: str, start: float, timeout: float) -> float:
+    """Poll an endpoint until it returns 200; seconds since `start`"""
+    import httpx
+
+    while time.perf_counter() - start < timeout:
+        try:
+            if client.get(path).status_code == 200:
+                return time.perf_counter() - start
+        except httpx.TransportError:
+            pass
+        time.sleep(0.02)
+    raise TimeoutError(f"{path} not healthy after {timeout}s")
+
+
+def first_answer(client, start: float, args) -> float:
+    """Upload a document, wait for it to be processed and ask one question"""
+    doc = generate_document(args.format, args.language, args.pages)
+    response = client.post("/upload", files={"file": (doc.filename, doc.content)}, data={"api_key": "benchmark"})
+    response.raise_for_status()
+    session_id = response.json()["session_id"]
+    with client.stream("GET", f"/api/progress/{session_id}") as stream:
+        for line in stream.iter_lines():
+            if line.startswith("data: ") and json.loads(line[6:]).get("step") in ("complete", "error", "cancelled"):
+                break
+    data = {"session_id": session_id, "question": doc.questions[0], "api_key": "benchmark"}
+    response = client.post("/ask", data=data)
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+
+def run_once(args, extra_env: dict) -> dict:
+    import httpx
+
+    port = free_port()
+    env = {
+        **os.environ,
+        "LLM_BACKEND": "fake",
+        "TRANSLATOR_BACKEND": "identity",
+        "INGESTION_CACHE_MAX_MB": "0",
+        "TRANSLATION_CACHE_PATH": "",
+        **extra_env,
+    }
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=args.timeout) as client:
+            time_to_live = wait_for(client, "/api/live", start, args.timeout)
+            time_to_first_answer = first_answer(client, start, args)
+            time_to_ready = wait_for(client, "/api/ready", start, args.timeout)
+            server_milestones = client.get("/api/ready").json()["startup_seconds"]
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+    return {
+        "time_to_live": time_to_live,
+        "time_to_first_answer": time_to_first_answer,
+        "time_to_ready": time_to_ready,
+        "server_milestones": server_milestones,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start benchmark of the RAG API")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--format", default="html", choices=["html", "docx", "pdf"])
+    parser.add_argument("--language", default="en", choices=["en", "fr", "pt"])
+    parser.add_argument("--pages", type=int, default=2)
+    parser.add_argument("--env", action="append", default=[], help="KEY=VALUE passed to the server (repeatable)")
+    parser.add_argument("--timeout", type=float, default=600.0)
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    extra_env = dict(item.split("=", 1) for item in args.env)
+    runs = []
+    for i in range(args.runs):
+        print(f"Run {i + 1}/{args.runs}...", file=sys.stderr)
+        runs.append(run_once(args, extra_env))
+
+    def median(key: str) -> float:
+        values = sorted(run[key] for run in runs)
+        return values[len(values) // 2]
+
+    report = {
+        "config": {**vars(args), "env": extra_env},
+        "median": {key: median(key) for key in ("time_to_live", "time_to_first_answer", "time_to_ready")},
+        "runs": runs,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
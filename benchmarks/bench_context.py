@@ -0,0 +1,132 @@
+"""Prompt context benchmark: retrieved chunks as they are vs packed by context_packer.
+
+Usage (from the repository root):
+    python benchmarks/bench_context.py --languages en,fr,pt --top-k 6 --budget 1536
+
+Every question about the synthetic documents (synthetic_docs.py) retrieves
+--top-k chunks with hybrid search (rrf) like /ask. The chunks are then put in
+the prompt unchanged and packed into --budget tokens. The report has, for
+both, the prompt tokens (counted with the embedding model's tokenizer, p50
+and mean), how often the chunk that answers the question is still in the
+context, and the packing latency. With --gemini-model and GEMINI_API_KEY set
+each prompt is also sent to Gemini and the generation latency is reported;
+otherwise nothing goes over the network. Output is JSON.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from bench_retrieval import EMBEDDING_MODEL_IDS, build_chunks, percentile  # also puts backend/ on sys.path
+from synthetic_docs import question_for
+from context_packer import pack_context
+from lexical_index import BM25Index, fuse
+from vector_store import NumpyVectorStore
+
+
+def build_prompt(question: str, context: list[str]) -> str:
+    """Same layout as main.build_prompt (without importing the app)"""
+    blocks = "\n\n".join(f"Context {i + 1}:\n{chunk}" for i, chunk in enumerate(context))
+    return f"Use the following context to answer the question.\n\n{blocks}\n\nQuestion: {question}\n\nAnswer:"
+
+
+def summarize(tokens: list[int], kept: list[bool], llm_seconds: list[float]) -> dict:
+    report = {
+        "prompt_tokens_p50": percentile(tokens, 50),
+        "prompt_tokens_mean": float(np.mean(tokens)),
+        "answer_kept_rate": sum(kept) / len(kept),
+    }
+    if llm_seconds:
+        report["generate_ms_p50"] = percentile([s * 1000 for s in llm_seconds], 50)
+        report["generate_ms_p95"] = percentile([s * 1000 for s in llm_seconds], 95)
+    return report
+
+
+def evaluate(language: str, model, count_tokens, llm, args) -> dict:
+    chunks, invoice_ids, answers = build_chunks(language, args.pages, args.seed)
+    ids = [f"doc:{i}" for i in range(len(chunks))]
+    store = NumpyVectorStore()
+    store.add(ids, np.asarray(model.encode(chunks, batch_size=64, convert_to_numpy=True)), chunks)
+    index = BM25Index()
+    index.add(ids, chunks)
+
+    results = {"unchanged": ([], [], []), "packed": ([], [], [])}
+    pack_latencies = []
+    for invoice_id, answer in zip(invoice_ids, answers):
+        question = question_for(invoice_id, language)
+        embedding = np.asarray(model.encode([question], convert_to_numpy=True))[0]
+        dense = [(chunk_id, score) for chunk_id, _, score in store.query(embedding, args.candidates)]
+        ranked = fuse([dense, index.search(question, args.candidates)], "rrf", None, args.rrf_k)[:args.top_k]
+        hits = [(chunk_id, chunks[ids.index(chunk_id)]) for chunk_id, _ in ranked]
+
+        start = time.perf_counter()
+        packed = pack_context(hits, count_tokens, args.budget)
+        pack_latencies.append((time.perf_counter() - start) * 1000)
+
+        contexts = (
+            ("unchanged", [chunk_id for chunk_id, _ in hits], [text for _, text in hits]),
+            ("packed", packed.chunk_ids, packed.chunks),
+        )
+        for name, context_ids, context in contexts:
+            prompt = build_prompt(question, context)
+            tokens, kept, llm_seconds = results[name]
+            tokens.append(count_tokens(prompt))
+            kept.append(ids[answer] in context_ids)
+            if llm is not None:
+                start = time.perf_counter()
+                asyncio.run(llm.generate(prompt, args.api_key))
+                llm_seconds.append(time.perf_counter() - start)
+
+    report = {name: summarize(*values) for name, values in results.items()}
+    report["questions"] = len(invoice_ids)
+    report["tokens_saved_mean"] = report["unchanged"]["prompt_tokens_mean"] - report["packed"]["prompt_tokens_mean"]
+    report["pack_ms_p50"] = percentile(pack_latencies, 50)
+    report["pack_ms_p95"] = percentile(pack_latencies, 95)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prompt tokens with and without context packing")
+    parser.add_argument("--languages", default="en", help="comma-separated document languages (en,fr,pt)")
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--top-k", type=int, default=6)
+    parser.add_argument("--candidates", type=int, default=20)
+    parser.add_argument("--rrf-k", type=float, default=60.0)
+    parser.add_argument("--budget", type=int, default=1536, help="context token budget (0 = no limit)")
+    parser.add_argument("--embedding-backend", default="torch", choices=["torch", "int8", "onnx"])
+    parser.add_argument("--gemini-model", help="also time generation with this Gemini model (needs GEMINI_API_KEY)")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+    args.api_key = os.getenv("GEMINI_API_KEY", "")
+
+    from transformers import AutoTokenizer
+    from llm import create_llm
+    from model_manager import load_sentence_encoder
+
+    llm = create_llm("gemini", args.gemini_model) if args.gemini_model and args.api_key else None
+    report = {"config": {k: v for k, v in vars(args).items() if k != "api_key"}, "languages": {}}
+    for language in args.languages.split(","):
+        print(f"Evaluating {language}...", file=sys.stderr)
+        model, _ = load_sentence_encoder(EMBEDDING_MODEL_IDS[language], args.embedding_backend)
+        tokenizer = AutoTokenizer.from_pretrained(EMBEDDING_MODEL_IDS[language])
+
+        def count_tokens(text: str) -> int:
+            return len(tokenizer.tokenize(text))
+
+        report["languages"][language] = evaluate(language, model, count_tokens, llm, args)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Offline cross-lingual benchmark: translate-then-search vs one multilingual index.
+
+Usage (from the repository root):
+    python benchmarks/bench_crosslingual.py --languages en,fr,pt --question-languages en,fr,pt
+
+For every pair of document and question language, questions about the
+synthetic documents (synthetic_docs.py) are answered two ways, as /ask does
+with EMBEDDING_MODE=per_language and EMBEDDING_MODE=multilingual:
+
+- translate: the question is translated to the document language with
+  --translator (skipped when the languages match), embedded with that
+  language's model and searched in the document's index;
+- multilingual: the question is embedded as asked with --multilingual-model,
+  in which the document was indexed too.
+
+Both are reported dense only and fused with BM25 like the API (rrf). For each
+the report has the hit rate at --top-k, the mean reciprocal rank, and the
+per-question latency of the serial chain (translate + embed + search, p50/p95
+in milliseconds) with its parts. --translator google calls the network like
+production; identity measures the untranslated baseline offline. Output is JSON.
+"""
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from bench_retrieval import EMBEDDING_MODEL_IDS, build_chunks, percentile  # also puts backend/ on sys.path
+from synthetic_docs import question_for
+from lexical_index import BM25Index, fuse
+from vector_store import NumpyVectorStore
+
+MULTILINGUAL_MODEL_ID = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+
+
+def build_index(model, chunks: list[str]) -> tuple[list[str], NumpyVectorStore, BM25Index]:
+    ids = [f"chunk_{i}" for i in range(len(chunks))]
+    store = NumpyVectorStore()
+    store.add(ids, np.asarray(model.encode(chunks, batch_size=64, convert_to_numpy=True)), chunks)
+    index = BM25Index()
+    index.add(ids, chunks)
+    return ids, store, index
+
+
+def evaluate(path: str, questions: list[str], expected: list[str], model, store, index, translate, args) -> dict:
+    """Answer every question along one path; `translate` maps a question to the text to search with"""
+    timings = {"translate": [], "embed": [], "search": [], "total": []}
+    rankings = {"dense": [], "hybrid": []}
+    for question in questions:
+        start = time.perf_counter()
+        query = translate(question)
+        translated = time.perf_counter()
+        embedding = np.asarray(model.encode([query], convert_to_numpy=True))[0]
+        embedded = time.perf_counter()
+        dense = [(chunk_id, score) for chunk_id, _, score in store.query(embedding, args.candidates)]
+        hybrid = fuse([dense, index.search(query, args.candidates)], "rrf", None, args.rrf_k)
+        searched = time.perf_counter()
+        for stage, seconds in (("translate", translated - start), ("embed", embedded - translated),
+                               ("search", searched - embedded), ("total", searched - start)):
+            timings[stage].append(seconds * 1000)
+        rankings["dense"].append([chunk_id for chunk_id, _ in dense])
+        rankings["hybrid"].append([chunk_id for chunk_id, _ in hybrid])
+
+    report = {"path": path}
+    for mode, ranked in rankings.items():
+        ranks = [ranking.index(answer) + 1 if answer in ranking else 0 for ranking, answer in zip(ranked, expected)]
+        report[mode] = {
+            f"hit_rate_at_{args.top_k}": sum(0 < rank <= args.top_k for rank in ranks) / len(ranks),
+            "mrr": float(np.mean([1 / rank if rank else 0.0 for rank in ranks])),
+        }
+    for stage, values in timings.items():
+        report[f"{stage}_ms_p50"] = percentile(values, 50)
+        report[f"{stage}_ms_p95"] = percentile(values, 95)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Translate-then-search vs multilingual embeddings")
+    parser.add_argument("--languages", default="en,fr,pt", help="comma-separated document languages")
+    parser.add_argument("--question-languages", default="en,fr,pt", help="comma-separated question languages")
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--candidates", type=int, default=20)
+    parser.add_argument("--rrf-k", type=float, default=60.0)
+    parser.add_argument("--embedding-backend", default="torch", choices=["torch", "int8", "onnx"])
+    parser.add_argument("--multilingual-model", default=MULTILINGUAL_MODEL_ID)
+    parser.add_argument("--translator", default="google", choices=["google", "argos", "identity"])
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    from model_manager import load_sentence_encoder
+    from translation import create_translation_backend
+
+    translator = create_translation_backend(args.translator)
+    print(f"Loading {args.multilingual_model}...", file=sys.stderr)
+    multilingual_model, _ = load_sentence_encoder(args.multilingual_model, args.embedding_backend)
+
+    report = {"config": vars(args), "pairs": []}
+    for language in args.languages.split(","):
+        print(f"Indexing {language} documents...", file=sys.stderr)
+        model, _ = load_sentence_encoder(EMBEDDING_MODEL_IDS[language], args.embedding_backend)
+        chunks, invoice_ids, answers = build_chunks(language, args.pages, args.seed)
+        ids, store, index = build_index(model, chunks)
+        _, multilingual_store, multilingual_index = build_index(multilingual_model, chunks)
+        expected = [ids[answer] for answer in answers]
+
+        for question_language in args.question_languages.split(","):
+            print(f"  {question_language} questions...", file=sys.stderr)
+            questions = [question_for(invoice_id, question_language) for invoice_id in invoice_ids]
+
+            def translate(question: str) -> str:
+                if question_language == language:
+                    return question
+                return translator.translate_batch([question], question_language, language)[0]
+
+            report["pairs"].append({
+                "document_language": language,
+                "question_language": question_language,
+                "questions": len(questions),
+                "results": [
+                    evaluate("translate", questions, expected, model, store, index, translate, args),
+                    evaluate("multilingual", questions, expected, multilingual_model,
+                             multilingual_store, multilingual_index, lambda question: question, args),
+                ],
+            })
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
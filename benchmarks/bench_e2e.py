@@ -0,0 +1,330 @@
+"""End-to-end benchmark: /upload, /api/progress and /ask through the real app.
+
+Usage (from the repository root):
+    python benchmarks/bench_e2e.py --concurrency 1,2,4 --pages 5 --output results.json
+
+The app runs in-process under uvicorn with the real ingestion pipeline
+(Docling, HybridChunker, embedding models), but with local stand-ins for
+the remote services: the fake LLM (LLM_BACKEND=fake) and the identity
+translator (TRANSLATOR_BACKEND=identity). Caches (ingestion, translation
+and answers) are disabled by default so every upload pays the full pipeline
+and every question reaches retrieval and the LLM. Synthetic PDF/DOCX/HTML documents in
+en/fr/pt come from synthetic_docs.py.
+
+For each concurrency level the report has ingestion and question
+throughput, p50/p95/p99 latency, streaming time-to-first-token, and the
+mean duration of every pipeline stage (from the /metrics histograms).
+Output is JSON, so runs on different commits can be diffed directly.
+Requires httpx (`pip install -r benchmarks/requirements.txt`).
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import re
+import resource
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(BENCH_DIR, "..", "backend")
+
+sys.path.insert(0, BENCH_DIR)
+from synthetic_docs import VOCABULARY, generate_document, question_for  # noqa: E402
+
+STAGE_METRIC = re.compile(r'^rag_stage_duration_seconds_(sum|count)\{pipeline="([^"]+)",stage="([^"]+)"\} (\S+)$')
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(values: list[float]) -> dict:
+    return {
+        "count": len(values),
+        "p50_ms": percentile(values, 50) * 1000,
+        "p95_ms": percentile(values, 95) * 1000,
+        "p99_ms": percentile(values, 99) * 1000,
+        "mean_ms": sum(values) / len(values) * 1000 if values else 0.0,
+    }
+
+
+def peak_rss_bytes(who=resource.RUSAGE_SELF) -> int:
+    peak = resource.getrusage(who).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port: int):
+    """Run the app under uvicorn in a background thread"""
+    import uvicorn
+
+    os.chdir(BACKEND_DIR)  # the app mounts ../frontend relative to the backend directory
+    sys.path.insert(0, BACKEND_DIR)
+    import main
+
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+
+def parse_stage_metrics(text: str) -> dict:
+    """{(pipeline, stage): [sum, count]} from the /metrics output"""
+    stages = {}
+    for line in text.splitlines():
+        match = STAGE_METRIC.match(line)
+        if match:
+            kind, pipeline, stage, value = match.groups()
+            entry = stages.setdefault((pipeline, stage), [0.0, 0.0])
+            entry[0 if kind == "sum" else 1] = float(value)
+    return stages
+
+
+def stage_means(before: dict, after: dict) -> dict:
+    """Mean duration of each stage between two /metrics scrapes"""
+    result = {}
+    for key, (total, count) in sorted(after.items()):
+        prev_total, prev_count = before.get(key, (0.0, 0.0))
+        if count > prev_count:
+            result[f"{key[0]}.{key[1]}"] = {
+                "count": int(count - prev_count),
+                "mean_ms": (total - prev_total) / (count - prev_count) * 1000,
+            }
+    return result
+
+
+async def ingest(client, doc, timeout: float) -> dict:
+    """Upload a document and follow its progress stream until it is ready"""
+    start = time.perf_counter()
+    response = await client.post(
+        "/upload",
+        files={"file": (doc.filename, doc.content)},
+        data={"api_key": "benchmark"},
+    )
+    response.raise_for_status()
+    upload_done = time.perf_counter()
+    session_id = response.json()["session_id"]
+
+    async def wait_ready():
+        async with client.stream("GET", f"/api/progress/{session_id}") as stream:
+            async for line in stream.aiter_lines():
+                if not line.startswith("data: "):
+                    continue
+                event = json.loads(line[6:])
+                if event.get("step") == "complete":
+                    return
+                if event.get("step") in ("error", "cancelled"):
+                    raise RuntimeError(event.get("message"))
+        raise RuntimeError("Progress stream ended before completion")
+
+    await asyncio.wait_for(wait_ready(), timeout)
+    return {
+        "doc": doc,
+        "session_id": session_id,
+        "upload_s": upload_done - start,
+        "ready_s": time.perf_counter() - start,
+    }
+
+
+async def ask(client, session_id: str, question: str) -> float:
+    start = time.perf_counter()
+    response = await client.post("/ask", data={"session_id": session_id, "question": question, "api_key": "benchmark"})
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+
+async def ask_stream(client, session_id: str, question: str) -> tuple[float, float]:
+    """Return (time to first token, total time)"""
+    start = time.perf_counter()
+    first_token = None
+    data = {"session_id": session_id, "question": question, "api_key": "benchmark"}
+    async with client.stream("POST", "/ask/stream", data=data) as stream:
+        stream.raise_for_status()
+        async for line in stream.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            event = json.loads(line[6:])
+            if event["type"] == "token" and first_token is None:
+                first_token = time.perf_counter() - start
+            elif event["type"] == "error":
+                raise RuntimeError(event["message"])
+    total = time.perf_counter() - start
+    return first_token if first_token is not None else total, total
+
+
+async def bounded(concurrency: int, coroutines) -> tuple[list, int]:
+    """Run coroutines with at most `concurrency` in flight; return (results, errors)"""
+    semaphore = asyncio.Semaphore(concurrency)
+    errors = 0
+
+    async def run(coro):
+        nonlocal errors
+        async with semaphore:
+            try:
+                return await coro
+            except Exception as e:
+                errors += 1
+                print(f"  error: {e}", file=sys.stderr)
+                return None
+
+    results = await asyncio.gather(*(run(coro) for coro in coroutines))
+    return [r for r in results if r is not None], errors
+
+
+async def run_level(client, concurrency: int, args, seed_base: int) -> dict:
+    formats = args.formats.split(",")
+    languages = args.languages.split(",")
+    docs = [
+        generate_document(formats[i % len(formats)], languages[i % len(languages)], args.pages, seed=seed_base + i)
+        for i in range(args.docs_per_level or concurrency * 2)
+    ]
+    metrics_before = parse_stage_metrics((await client.get("/metrics")).text)
+
+    start = time.perf_counter()
+    ingested, ingest_errors = await bounded(concurrency, [ingest(client, doc, args.timeout) for doc in docs])
+    ingest_wall = time.perf_counter() - start
+
+    # Questions cycle through documents and question languages (cross-lingual ones exercise translation)
+    question_languages = list(VOCABULARY)
+    jobs = []
+    for i in range(args.questions if ingested else 0):
+        entry = ingested[i % len(ingested)]
+        invoice_id = entry["doc"].invoice_ids[i % len(entry["doc"].invoice_ids)]
+        jobs.append((entry["session_id"], question_for(invoice_id, question_languages[i % len(question_languages)])))
+
+    start = time.perf_counter()
+    ask_latencies, ask_errors = await bounded(concurrency, [ask(client, sid, q) for sid, q in jobs])
+    ask_wall = time.perf_counter() - start
+
+    start = time.perf_counter()
+    stream_results, stream_errors = await bounded(concurrency, [ask_stream(client, sid, q) for sid, q in jobs])
+    stream_wall = time.perf_counter() - start
+
+    metrics_after = parse_stage_metrics((await client.get("/metrics")).text)
+
+    for entry in ingested:
+        await client.post("/clear", data={"session_id": entry["session_id"]})
+
+    return {
+        "concurrency": concurrency,
+        "ingest": {
+            "documents": len(docs),
+            "errors": ingest_errors,
+            "throughput_docs_per_s": len(ingested) / ingest_wall if ingest_wall else 0.0,
+            "pages_per_s": len(ingested) * args.pages / ingest_wall if ingest_wall else 0.0,
+            "upload": summarize([entry["upload_s"] for entry in ingested]),
+            "time_to_ready": summarize([entry["ready_s"] for entry in ingested]),
+        },
+        "ask": {
+            "errors": ask_errors,
+            "throughput_qps": len(ask_latencies) / ask_wall if ask_wall else 0.0,
+            "latency": summarize(ask_latencies),
+        },
+        "ask_stream": {
+            "errors": stream_errors,
+            "throughput_qps": len(stream_results) / stream_wall if stream_wall else 0.0,
+            "time_to_first_token": summarize([ttft for ttft, _ in stream_results]),
+            "latency": summarize([total for _, total in stream_results]),
+        },
+        "stages": stage_means(metrics_before, metrics_after),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return "unknown"
+
+
+async def run(args) -> dict:
+    import httpx
+
+    port = free_port()
+    server, thread = start_server(port)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=args.timeout) as client:
+            # Wait until the embedding models needed by the benchmark are loaded
+            deadline = time.perf_counter() + args.timeout
+            while time.perf_counter() < deadline:
+                status = (await client.get("/api/model-status")).json()
+                if all(status["models"][lang]["loaded"] for lang in args.languages.split(",")):
+                    break
+                await asyncio.sleep(0.5)
+
+            levels = []
+            for n, concurrency in enumerate(int(c) for c in args.concurrency.split(",")):
+                print(f"Concurrency {concurrency}...", file=sys.stderr)
+                levels.append(await run_level(client, concurrency, args, seed_base=args.seed + 1000 * n))
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+
+    return {
+        "config": vars(args),
+        "environment": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "levels": levels,
+        "peak_rss_bytes": peak_rss_bytes(),
+        "peak_rss_children_bytes": peak_rss_bytes(resource.RUSAGE_CHILDREN),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end benchmark of the RAG API")
+    parser.add_argument("--concurrency", default="1,2,4", help="comma-separated concurrency levels")
+    parser.add_argument("--formats", default="html,docx,pdf")
+    parser.add_argument("--languages", default="en,fr,pt")
+    parser.add_argument("--pages", type=int, default=5, help="pages per synthetic document")
+    parser.add_argument("--docs-per-level", type=int, default=0, help="documents per level (default: 2x concurrency)")
+    parser.add_argument("--questions", type=int, default=30, help="questions per level and endpoint")
+    parser.add_argument("--fake-token-delay-ms", type=float, default=5.0)
+    parser.add_argument("--enable-caches", action="store_true", help="keep the ingestion, translation and answer caches on")
+    parser.add_argument("--timeout", type=float, default=600.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    # Configure the app before it is imported
+    os.environ["LLM_BACKEND"] = "fake"
+    os.environ["TRANSLATOR_BACKEND"] = "identity"
+    os.environ["FAKE_LLM_TOKEN_DELAY_MS"] = str(args.fake_token_delay_ms)
+    if not args.enable_caches:
+        os.environ["INGESTION_CACHE_MAX_MB"] = "0"
+        os.environ["TRANSLATION_CACHE_PATH"] = ""
+        os.environ["TRANSLATION_CACHE_SIZE"] = "0"
+        os.environ["ANSWER_CACHE_SIZE"] = "0"
+
+    report = asyncio.run(run(args))
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
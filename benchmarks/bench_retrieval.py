@@ -0,0 +1,148 @@
+"""Offline retrieval benchmark: dense vs BM25 vs hybrid (rank and score fusion).
+
+Usage (from the repository root):
+    python benchmarks/bench_retrieval.py --pages 20 --languages en,fr,pt
+
+Synthetic documents (synthetic_docs.py) are chunked one paragraph per chunk,
+prefixed with their section heading like HybridChunker output. Each page has
+one fact about an invoice id, and its question must retrieve the chunk that
+states it. For every mode the report has the hit rate at --top-k, the mean
+reciprocal rank within --candidates, and the retrieval latency (p50/p95 in
+milliseconds, query embedding excluded and reported separately). Nothing is
+sent over the network; the embedding model is loaded the same way the API
+loads it, so the first run may download it. Output is JSON.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(BENCH_DIR, "..", "backend")
+
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, BACKEND_DIR)
+from synthetic_docs import generate_sections, question_for  # noqa: E402
+from lexical_index import BM25Index, fuse  # noqa: E402
+from vector_store import NumpyVectorStore  # noqa: E402
+
+EMBEDDING_MODEL_IDS = {
+    "en": "sentence-transformers/all-MiniLM-L6-v2",
+    "fr": "dangvantuan/sentence-camembert-large",
+    "pt": "rufimelo/bert-large-portuguese-cased-sts",
+}
+
+
+def percentile(values: list[float], q: float) -> float:
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def build_chunks(language: str, pages: int, seed: int) -> tuple[list[str], list[str], list[int]]:
+    """Return (chunks, invoice ids, index of the chunk stating each invoice)"""
+    sections, invoice_ids = generate_sections(language, pages, seed)
+    chunks, answers = [], []
+    for (heading, paragraphs), invoice_id in zip(sections, invoice_ids):
+        for paragraph in paragraphs:
+            if invoice_id in paragraph:
+                answers.append(len(chunks))
+            chunks.append(f"{heading}\n{paragraph}")
+    return chunks, invoice_ids, answers
+
+
+def evaluate(language: str, model, args) -> dict:
+    chunks, invoice_ids, answers = build_chunks(language, args.pages, args.seed)
+    ids = [f"chunk_{i}" for i in range(len(chunks))]
+    questions = [question_for(invoice_id, args.question_language or language) for invoice_id in invoice_ids]
+
+    start = time.perf_counter()
+    store = NumpyVectorStore()
+    store.add(ids, np.asarray(model.encode(chunks, batch_size=64, convert_to_numpy=True)), chunks)
+    embed_chunks_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    index = BM25Index()
+    index.add(ids, chunks)
+    index.search("warm up", 1)  # builds the posting arrays
+    index_seconds = time.perf_counter() - start
+
+    embed_latencies = []
+    query_embeddings = []
+    for question in questions:
+        start = time.perf_counter()
+        query_embeddings.append(np.asarray(model.encode([question], convert_to_numpy=True))[0])
+        embed_latencies.append((time.perf_counter() - start) * 1000)
+
+    def dense(i):
+        return [(chunk_id, score) for chunk_id, _, score in store.query(query_embeddings[i], args.candidates)]
+
+    def lexical(i):
+        return index.search(questions[i], args.candidates)
+
+    def hybrid(method):
+        weights = [args.dense_weight, args.lexical_weight]
+        return lambda i: fuse([dense(i), lexical(i)], method, weights, args.rrf_k)
+
+    modes = (("dense", dense), ("lexical", lexical), ("hybrid_rrf", hybrid("rrf")), ("hybrid_score", hybrid("score")))
+    results = {}
+    for mode, retrieve in modes:
+        hits, reciprocal_ranks, latencies = 0, [], []
+        for i in range(len(questions)):
+            start = time.perf_counter()
+            ranking = [chunk_id for chunk_id, _ in retrieve(i)]
+            latencies.append((time.perf_counter() - start) * 1000)
+            expected = ids[answers[i]]
+            rank = ranking.index(expected) + 1 if expected in ranking else 0
+            hits += 0 < rank <= args.top_k
+            reciprocal_ranks.append(1 / rank if rank else 0.0)
+        results[mode] = {
+            f"hit_rate_at_{args.top_k}": hits / len(questions),
+            "mrr": float(np.mean(reciprocal_ranks)),
+            "latency_ms_p50": percentile(latencies, 50),
+            "latency_ms_p95": percentile(latencies, 95),
+        }
+    return {
+        "chunks": len(chunks),
+        "questions": len(questions),
+        "embed_chunks_seconds": embed_chunks_seconds,
+        "lexical_index_seconds": index_seconds,
+        "lexical_index_bytes": index.nbytes,
+        "query_embed_ms_p50": percentile(embed_latencies, 50),
+        "modes": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline relevance and latency benchmark of retrieval modes")
+    parser.add_argument("--languages", default="en", help="comma-separated document languages (en,fr,pt)")
+    parser.add_argument("--question-language", help="ask every question in this language (cross-lingual)")
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--candidates", type=int, default=20)
+    parser.add_argument("--dense-weight", type=float, default=1.0)
+    parser.add_argument("--lexical-weight", type=float, default=1.0)
+    parser.add_argument("--rrf-k", type=float, default=60.0)
+    parser.add_argument("--embedding-backend", default="torch", choices=["torch", "int8", "onnx"])
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    from model_manager import load_sentence_encoder
+
+    report = {"config": vars(args), "languages": {}}
+    for language in args.languages.split(","):
+        print(f"Evaluating {language}...", file=sys.stderr)
+        model, _ = load_sentence_encoder(EMBEDDING_MODEL_IDS[language], args.embedding_backend)
+        report["languages"][language] = evaluate(language, model, args)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
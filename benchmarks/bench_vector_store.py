@@ -0,0 +1,118 @@
+"""Compare vector store backends: build time, query latency and memory per session.
+
+Usage (from the repository root):
+    python benchmarks/bench_vector_store.py --sessions 20 --chunks 300 --dim 1024
+
+Random unit vectors stand in for chunk embeddings, so no embedding model is
+needed. Recall is the overlap of each store's top-k with the exact float32
+top-k (float16 and int8 rows lose a little precision). "numpy:int8+float16"
+is an int8 store that rescores its best top-k * --oversample candidates with
+float16 rows; compare it with "numpy:int8" for recall with and without
+rescoring. Results are printed as JSON.
+"""
+import argparse
+import gc
+import json
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from vector_store import create_vector_store  # noqa: E402
+
+
+def rss_bytes() -> int:
+    """Current resident set size of this process"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def bench_backend(backend: str, dtype: str, rescore_dtype: str, args) -> dict:
+    rng = np.random.default_rng(args.seed)
+    documents = [f"chunk text {i} " * 40 for i in range(args.chunks)]
+    ids = [f"chunk_{i}" for i in range(args.chunks)]
+    corpora = [rng.standard_normal((args.chunks, args.dim)).astype(np.float32) for _ in range(args.sessions)]
+    queries = rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+
+    gc.collect()
+    rss_before = rss_bytes()
+    build_times = []
+    stores = []
+    for i, embeddings in enumerate(corpora):
+        start = time.perf_counter()
+        store = create_vector_store(backend, f"bench_{backend}_{dtype}_{i}", dtype, rescore_dtype, args.oversample)
+        store.add(ids, embeddings, documents)
+        build_times.append(time.perf_counter() - start)
+        stores.append(store)
+    gc.collect()
+    rss_after = rss_bytes()
+
+    latencies = []
+    found = 0
+    for i, query in enumerate(queries):
+        store = stores[i % len(stores)]
+        start = time.perf_counter()
+        results = store.query(query, args.top_k)
+        latencies.append(time.perf_counter() - start)
+        embeddings = corpora[i % len(stores)]
+        exact = np.argsort(-(embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)) @ query)[:args.top_k]
+        found += len({ids[j] for j in exact} & {chunk_id for chunk_id, _, _ in results})
+    store_bytes = statistics.mean(store.nbytes for store in stores)
+
+    for store in stores:
+        store.delete()
+
+    return {
+        "backend": backend,
+        "dtype": dtype if backend == "numpy" else "float32",
+        "rescore_dtype": rescore_dtype if backend == "numpy" and dtype == "int8" and rescore_dtype != "none" else None,
+        "build_ms_mean": statistics.mean(build_times) * 1000,
+        "query_ms_p50": percentile(latencies, 50) * 1000,
+        "query_ms_p95": percentile(latencies, 95) * 1000,
+        "query_ms_p99": percentile(latencies, 99) * 1000,
+        "recall_at_k": found / (len(queries) * args.top_k),
+        "rss_per_session_kb": (rss_after - rss_before) / len(stores) / 1024,
+        "store_kb_per_session": store_bytes / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--chunks", type=int, default=300)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--oversample", type=int, default=4, help="int8 candidates rescored per result")
+    parser.add_argument("--backends", default="numpy:float32,numpy:float16,numpy:int8,numpy:int8+float16,chroma")
+    args = parser.parse_args()
+
+    results = []
+    for spec in args.backends.split(","):
+        backend, _, dtype = spec.partition(":")
+        dtype, _, rescore_dtype = dtype.partition("+")
+        try:
+            results.append(bench_backend(backend, dtype or "float32", rescore_dtype or "none", args))
+        except ImportError as e:
+            results.append({"backend": backend, "skipped": str(e)})
+
+    print(json.dumps({"config": vars(args), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""Synthetic documents of controlled size and language for benchmarks.
+
+Documents are generated from a seeded RNG, so the same arguments always give
+byte-identical files. Every section states a few "facts" (an invoice id, an
+amount, a month) that benchmark questions can ask about.
+
+Formats are written without third-party libraries: HTML as plain markup,
+DOCX as a minimal OOXML package, PDF as a hand-built file with one text
+page per requested page.
+"""
+import io
+import random
+import zipfile
+from dataclasses import dataclass
+from xml.sax.saxutils import escape
+
+VOCABULARY = {
+    "en": {
+        "words": "report team budget project customer market growth quarter result service product "
+                 "analysis strategy revenue contract supplier delivery quality review plan data".split(),
+        "heading": "Section",
+        "fact": "Invoice {id} for {amount} euros was paid in {month}.",
+        "question": "When was invoice {id} paid?",
+        "months": ["January", "February", "March", "April", "May", "June"],
+    },
+    "fr": {
+        "words": "rapport équipe budget projet client marché croissance trimestre résultat service produit "
+                 "analyse stratégie revenu contrat fournisseur livraison qualité revue plan données".split(),
+        "heading": "Section",
+        "fact": "La facture {id} de {amount} euros a été payée en {month}.",
+        "question": "Quand la facture {id} a-t-elle été payée ?",
+        "months": ["janvier", "février", "mars", "avril", "mai", "juin"],
+    },
+    "pt": {
+        "words": "relatório equipe orçamento projeto cliente mercado crescimento trimestre resultado serviço "
+                 "produto análise estratégia receita contrato fornecedor entrega qualidade revisão plano".split(),
+        "heading": "Secção",
+        "fact": "A fatura {id} de {amount} euros foi paga em {month}.",
+        "question": "Quando foi paga a fatura {id}?",
+        "months": ["janeiro", "fevereiro", "março", "abril", "maio", "junho"],
+    },
+}
+
+PARAGRAPHS_PER_PAGE = 4
+SENTENCES_PER_PARAGRAPH = 5
+
+
+@dataclass
+class SyntheticDocument:
+    filename: str
+    language: str
+    pages: int
+    content: bytes
+    invoice_ids: list[str]
+
+    @property
+    def questions(self) -> list[str]:
+        """One question per page, in the document language"""
+        return [question_for(invoice_id, self.language) for invoice_id in self.invoice_ids]
+
+
+def question_for(invoice_id: str, language: str) -> str:
+    """Question about one of the document's facts, in any supported language"""
+    return VOCABULARY[language]["question"].format(id=invoice_id)
+
+
+def generate_sections(language: str, pages: int, seed: int) -> tuple[list[tuple[str, list[str]]], list[str]]:
+    """Return ([(heading, paragraphs)], invoice ids): one section per page"""
+    vocab = VOCABULARY[language]
+    rng = random.Random(f"{language}-{pages}-{seed}")
+    sections, invoice_ids = [], []
+    for page in range(pages):
+        invoice_id = f"INV-{seed:03d}{page:04d}"
+        paragraphs = []
+        for p in range(PARAGRAPHS_PER_PAGE):
+            sentences = []
+            for _ in range(SENTENCES_PER_PARAGRAPH):
+                words = rng.choices(vocab["words"], k=rng.randint(8, 14))
+                sentences.append(" ".join(words).capitalize() + ".")
+            if p == 0:
+                sentences.insert(rng.randint(0, len(sentences)), vocab["fact"].format(
+                    id=invoice_id, amount=rng.randint(100, 99999), month=rng.choice(vocab["months"])
+                ))
+            paragraphs.append(" ".join(sentences))
+        sections.append((f"{vocab['heading']} {page + 1}", paragraphs))
+        invoice_ids.append(invoice_id)
+    return sections, invoice_ids
+
+
+def to_html(sections: list[tuple[str, list[str]]], language: str) -> bytes:
+    body = []
+    for heading, paragraphs in sections:
+        body.append(f"<h2>{escape(heading)}</h2>")
+        body.extend(f"<p>{escape(paragraph)}</p>" for paragraph in paragraphs)
+    html = (f'<!DOCTYPE html><html lang="{language}"><head><meta charset="utf-8"><title>Benchmark</title></head>'
+            f"<body><h1>Benchmark</h1>{''.join(body)}</body></html>")
+    return html.encode("utf-8")
+
+
+def to_docx(sections: list[tuple[str, list[str]]], language: str) -> bytes:
+    def paragraph(text: str, style: str = "") -> str:
+        props = f'<w:pPr><w:pStyle w:val="{style}"/></w:pPr>' if style else ""
+        return f'<w:p>{props}<w:r><w:t xml:space="preserve">{escape(text)}</w:t></w:r></w:p>'
+
+    body = []
+    for heading, paragraphs in sections:
+        body.append(paragraph(heading, "Heading1"))
+        body.extend(paragraph(text) for text in paragraphs)
+
+    document = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+        f"<w:body>{''.join(body)}</w:body></w:document>"
+    )
+    content_types = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/word/document.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+        '<Override PartName="/word/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.styles+xml"/>'
+        "</Types>"
+    )
+    # Heading style so Docling sees the section structure
+    styles = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<w:styles xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+        '<w:style w:type="paragraph" w:default="1" w:styleId="Normal"><w:name w:val="Normal"/></w:style>'
+        '<w:style w:type="paragraph" w:styleId="Heading1"><w:name w:val="heading 1"/>'
+        '<w:basedOn w:val="Normal"/><w:pPr><w:outlineLvl w:val="0"/></w:pPr></w:style>'
+        "</w:styles>"
+    )
+    document_rels = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+        'Target="styles.xml"/></Relationships>'
+    )
+    rels = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="word/document.xml"/></Relationships>'
+    )
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as docx:
+        docx.writestr("[Content_Types].xml", content_types)
+        docx.writestr("_rels/.rels", rels)
+        docx.writestr("word/document.xml", document)
+        docx.writestr("word/styles.xml", styles)
+        docx.writestr("word/_rels/document.xml.rels", document_rels)
+    return buffer.getvalue()
+
+
+def _wrap(text: str, width: int = 90) -> list[str]:
+    lines, line = [], ""
+    for word in text.split():
+        if line and len(line) + 1 + len(word) > width:
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    if line:
+        lines.append(line)
+    return lines
+
+
+def _pdf_string(text: str) -> bytes:
+    # WinAnsiEncoding covers the accented characters used by fr/pt
+    raw = text.encode("cp1252", errors="replace")
+    return b"(" + raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+def to_pdf(sections: list[tuple[str, list[str]]], language: str) -> bytes:
+    """One page per section, Helvetica text on A4"""
+    objects: list[bytes] = []
+
+    def add(obj: bytes) -> int:
+        objects.append(obj)
+        return len(objects)
+
+    catalog_id = add(b"")  # filled in once the page tree exists
+    pages_id = add(b"")
+    font_id = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+
+    page_ids = []
+    for heading, paragraphs in sections:
+        stream = [b"BT", b"/F1 16 Tf", b"50 790 Td", b"18 TL", _pdf_string(heading) + b" Tj", b"/F1 10 Tf", b"14 TL", b"T*"]
+        for text in paragraphs:
+            for line in _wrap(text):
+                stream.append(_pdf_string(line) + b" '")
+            stream.append(b"T*")
+        stream.append(b"ET")
+        data = b"\n".join(stream)
+        content_id = add(b"<< /Length %d >>\nstream\n" % len(data) + data + b"\nendstream")
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] " % pages_id
+            + b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (font_id, content_id)
+        ))
+
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    objects[pages_id - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+    objects[catalog_id - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % number + obj + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog_id, xref))
+    return out.getvalue()
+
+
+WRITERS = {"html": to_html, "docx": to_docx, "pdf": to_pdf}
+
+
+def generate_document(fmt: str, language: str, pages: int, seed: int = 0) -> SyntheticDocument:
+    """Build one synthetic document; different seeds give different content (and content hashes)"""
+    sections, invoice_ids = generate_sections(language, pages, seed)
+    return SyntheticDocument(
+        filename=f"bench_{language}_{pages}p_{seed}.{fmt}",
+        language=language,
+        pages=pages,
+        content=WRITERS[fmt](sections, language),
+        invoice_ids=invoice_ids,
+    )
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+
+    parser = argparse.ArgumentParser(description="Write synthetic benchmark documents to a directory")
+    parser.add_argument("output_dir")
+    parser.add_argument("--formats", default="html,docx,pdf")
+    parser.add_argument("--languages", default="en,fr,pt")
+    parser.add_argument("--pages", type=int, default=5)
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    for fmt in args.formats.split(","):
+        for language in args.languages.split(","):
+            doc = generate_document(fmt, language, args.pages)
+            with open(os.path.join(args.output_dir, doc.filename), "wb") as f:
+                f.write(doc.content)
+            print(doc.filename)
@@ -532,6 +532,10 @@ async function handleUpload() {
                     chatOverlay.classList.add('active');
                     hideLoading();
                     eventSource.close();
+                } else if (progress.step === 'error' || progress.step === 'cancelled') {
+                    showStatus(progress.message, 'error');
+                    hideLoading();
+                    eventSource.close();
                 }
             } catch (e) {
                 console.error('Progress parse error:', e);
@@ -539,8 +543,11 @@ async function handleUpload() {
         };
 
         eventSource.onerror = (error) => {
+            // While connecting, the browser retries and resumes after the last event it received
+            if (eventSource.readyState !== EventSource.CLOSED) {
+                return;
+            }
             console.error('Progress stream error:', error);
-            eventSource.close();
             // If error but response was OK, show success anyway
             if (data.session_id) {
                 sessionId = data.session_id;
@@ -585,21 +592,54 @@ async function handleSendQuestion() {
         const formData = new FormData();
         formData.append('session_id', sessionId);
         formData.append('question', question);
+        formData.append('api_key', apiKey);
 
-        // Ask question
-        const response = await fetch(`${API_BASE}/ask`, {
+        // Ask question, streaming the answer as it is generated
+        const response = await fetch(`${API_BASE}/ask/stream`, {
             method: 'POST',
             body: formData
         });
 
-        const data = await response.json();
-
         if (!response.ok) {
+            const data = await response.json();
             throw new Error(data.detail || 'Failed to get answer');
         }
 
-        // Add assistant message to chat
-        addMessage('assistant', data.answer, data.sources);
+        // Parse Server-Sent Events: sources first, then answer tokens
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let sources = [];
+        let messageContent = null;
+
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) break;
+
+            buffer += decoder.decode(value, { stream: true });
+            const events = buffer.split('\n\n');
+            buffer = events.pop();
+
+            for (const event of events) {
+                const dataLine = event.split('\n').find(line => line.startsWith('data: '));
+                if (!dataLine) continue;
+
+                const payload = JSON.parse(dataLine.slice(6));
+                if (payload.type === 'sources') {
+                    sources = payload.sources;
+                } else if (payload.type === 'token') {
+                    // Add assistant message to chat on the first token
+                    if (!messageContent) messageContent = addMessage('assistant', '');
+                    messageContent.textContent += payload.text;
+                    messagesContainer.scrollTop = messagesContainer.scrollHeight;
+                } else if (payload.type === 'error') {
+                    throw new Error(payload.message);
+                }
+            }
+        }
+
+        if (!messageContent) messageContent = addMessage('assistant', '');
+        addSources(messageContent.parentElement, sources);
 
     } catch (error) {
         console.error('Question error:', error);
@@ -650,6 +690,18 @@ function addMessage(role, content, sources = null) {
     messageDiv.appendChild(header);
     messageDiv.appendChild(messageContent);
 
+    addSources(messageDiv, sources);
+
+    messagesContainer.appendChild(messageDiv);
+
+    // Scroll to bottom
+    messagesContainer.scrollTop = messagesContainer.scrollHeight;
+
+    return messageContent;
+}
+
+// Add source citations below a message
+function addSources(messageDiv, sources) {
     // Add sources if available
     if (sources && sources.length > 0) {
         const sourcesDiv = document.createElement('div');
@@ -674,12 +726,8 @@ function addMessage(role, content, sources = null) {
         });
 
         messageDiv.appendChild(sourcesDiv);
+        messagesContainer.scrollTop = messagesContainer.scrollHeight;
     }
-
-    messagesContainer.appendChild(messageDiv);
-
-    // Scroll to bottom
-    messagesContainer.scrollTop = messagesContainer.scrollHeight;
 }
 
 // Handle clear
@@ -0,0 +1,104 @@
+"""Tests for the ingestion scheduler's cancellation paths.
+
+Run from the repository root:
+    python -m pytest -q tests
+"""
+import asyncio
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from progress_bus import LocalProgressBus, ProgressHub  # noqa: E402
+from scheduler import IngestionScheduler, Job  # noqa: E402
+
+
+def test_queued_cancel_ends_progress_stream():
+    async def scenario():
+        bus = LocalProgressBus()
+        hub = ProgressHub(bus)
+
+        def send_queue_position(job: Job, position: int, estimated_wait: float):
+            bus.publish(job.id, {"message": "queued", "step": "queued", "position": position})
+
+        def send_cancelled(job: Job):
+            bus.publish(job.id, {"message": "cancelled", "step": "cancelled"})
+
+        scheduler = IngestionScheduler(1, 10, on_queue_update=send_queue_position, on_cancel=send_cancelled)
+        await scheduler.start()
+        release = asyncio.Event()
+
+        async def hold(job: Job):
+            await release.wait()
+
+        bus.open("running")
+        bus.open("queued")
+        scheduler.submit("running", hold)
+        await asyncio.sleep(0)
+        scheduler.submit("queued", hold)
+        await asyncio.sleep(0)
+        assert scheduler.position("queued") == 1
+
+        async def follow() -> list[str]:
+            steps = []
+            async for item in hub.subscribe("queued", keepalive=0.1):
+                if item is not None:
+                    steps.append(item[1]["step"])
+            return steps
+
+        stream = asyncio.create_task(follow())
+        await asyncio.sleep(0.05)
+        assert scheduler.cancel("queued")
+        steps = await asyncio.wait_for(stream, 2)
+
+        release.set()
+        while scheduler.running:
+            await asyncio.sleep(0.01)
+        await scheduler.stop()
+        return steps, scheduler.stats()
+
+    steps, stats = asyncio.run(scenario())
+    assert steps[-1] == "cancelled"
+    assert stats["cancelled"] == 1
+
+
+def test_running_cancel_keeps_slot_until_job_returns():
+    async def scenario():
+        scheduler = IngestionScheduler(1, 10)
+        await scheduler.start()
+        started = threading.Event()
+        release = threading.Event()
+        order = []
+
+        def convert(job: Job):
+            # Blocking work that only looks at the cancellation flag once it is done
+            started.set()
+            release.wait(5)
+            job.check_cancelled()
+
+        async def slow(job: Job):
+            order.append(job.id)
+            await asyncio.get_running_loop().run_in_executor(None, convert, job)
+
+        async def fast(job: Job):
+            order.append(job.id)
+
+        scheduler.submit("slow", slow)
+        while not started.is_set():
+            await asyncio.sleep(0.01)
+        assert scheduler.cancel("slow")
+        scheduler.submit("next", fast)
+        await asyncio.sleep(0.1)
+        busy = (scheduler.running, list(order))
+
+        release.set()
+        while scheduler.get("next") is not None:
+            await asyncio.sleep(0.01)
+        await scheduler.stop()
+        return busy, order, scheduler.stats()
+
+    busy, order, stats = asyncio.run(scenario())
+    assert busy == (1, ["slow"])  # the cancelled job still held the only slot
+    assert order == ["slow", "next"]
+    assert stats["cancelled"] == 1 and stats["completed"] == 1